@@ -0,0 +1,121 @@
+"""
+The images and sounds of the game, each loaded from disk once.
+
+Every button, icon, sprite and tile used to load its picture when made.
+The Assets registry loads and converts an image the first time it is
+asked for, and hands out the same frames (subsurfaces of the image) to
+everything that shows it. The frames are shared, so must not be drawn
+on.
+
+A level lists the assets it uses, and these can be loaded in a
+background thread while the player is still in the menu:
+
+    assets = Assets()
+    assets.preload(level.assets)
+    ...
+    frames = assets.image('coal.png', (1, 1))
+    sound = assets.sound('blip.wav')
+"""
+import os
+import threading
+
+import pygame
+
+__all__ = ['Assets']
+
+# the files loaded as sounds, anything else is an image.
+SOUND_TYPES = ('.wav', '.ogg')
+
+class Assets(object):
+    """Borg registry of the loaded images and sounds."""
+    _shared_state = {}
+    # filename -> the whole image.
+    _sheets = {}
+    # (filename, num_pics) -> list of frames.
+    _frames = {}
+    # filename -> sound.
+    _sounds = {}
+    # held while loading, so a file being preloaded is not loaded twice.
+    _mutex = threading.RLock()
+    def __init__(self):
+        self.__dict__ = self._shared_state
+
+    def image(self, filename, num_pics=(1,1)):
+        """Return the frames of the image, cut num_pics across and down,
+        in column order. Raises pygame.error if it can't be loaded."""
+        try:
+            return self._frames[(filename, num_pics)]
+        except KeyError:
+            pass
+        self._mutex.acquire()
+        try:
+            sheet = self.__sheet(filename)
+            w, h = sheet.get_size()
+            x_step = float(w) / num_pics[0] #width of each sub image
+            y_step = float(h) / num_pics[1] #height of each sub image
+
+            frames = []
+            for x in range(num_pics[0]):
+                for y in range(num_pics[1]):
+                    frames.append(sheet.subsurface(
+                                (x_step*x, y_step*y, x_step, y_step)))
+            self._frames[(filename, num_pics)] = frames
+            return frames
+        finally:
+            self._mutex.release()
+
+    def __sheet(self, filename):
+        """Return the whole image, loading it if needs be."""
+        try:
+            return self._sheets[filename]
+        except KeyError:
+            pass
+        image = pygame.image.load(filename)
+        colorkey = image.get_at((0,0))
+        if pygame.display.get_surface() is not None:
+            # in the format of the screen, for fast blits.
+            if image.get_flags() & pygame.SRCALPHA:
+                image = image.convert_alpha()
+            else:
+                image = image.convert()
+        image.set_colorkey(colorkey)
+        self._sheets[filename] = image
+        return image
+
+    def sound(self, filename):
+        """Return the sound. Raises pygame.error if it can't be loaded."""
+        try:
+            return self._sounds[filename]
+        except KeyError:
+            pass
+        self._mutex.acquire()
+        try:
+            if filename not in self._sounds:
+                self._sounds[filename] = pygame.mixer.Sound(filename)
+            return self._sounds[filename]
+        finally:
+            self._mutex.release()
+
+    def load(self, filenames):
+        """Load the images and sounds named in filenames, skipping those
+        that are loaded or that fail to load."""
+        for filename in filenames:
+            try:
+                if os.path.splitext(filename)[1] in SOUND_TYPES:
+                    self.sound(filename)
+                else:
+                    self._mutex.acquire()
+                    try:
+                        self.__sheet(filename)
+                    finally:
+                        self._mutex.release()
+            except pygame.error, msg:
+                print "Error in Load Asset: ", msg
+
+    def preload(self, filenames):
+        """Load filenames in a background thread. Returns the thread,
+        anything asking for an asset meanwhile waits for it to load."""
+        loader = threading.Thread(target=self.load, args=(list(filenames),))
+        loader.setDaemon(True)
+        loader.start()
+        return loader
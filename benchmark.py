@@ -0,0 +1,161 @@
+"""
+A headless benchmark of the game's frame times.
+
+Master and Game are run under SDL's dummy video and audio drivers, on a
+map of a given size with a share of its cells built on. The mouse is
+moved about the map and clicks every few frames, and each frame is
+timed in three parts, on the one thread:
+
+    - events: the Master passing the events to the game, and the game's
+      loop handling them (and its game state tick).
+    - update: the game's sprites updating.
+    - redraw: the game drawing its dirty sprites, and the Master putting
+      them on the (dummy) screen.
+
+The percentiles of each are reported, as a regression number for the
+rendering without a display:
+
+    python benchmark.py --size 100x100 --built 0.05 --frames 500
+
+or from code:
+
+    results = run(size=(100, 100), built=0.05)
+    results['redraw']['p99']
+"""
+import os
+import random
+import time
+
+import pygame
+from pygame.locals import *
+
+__all__ = ['run', 'report']
+
+# the types of tile built on the map.
+BUILT_TYPES = ('Coal', 'Line', 'Load', 'Windfarm', 'Sync')
+
+# the parts of a frame, in the order they run.
+PHASES = ('events', 'update', 'redraw')
+
+# the percentiles reported.
+PERCENTILES = (50, 99)
+
+def run(size=(20, 12), built=0.0, frames=300, click_every=10, step=15,
+            seed=0):
+    """Run the game headless for frames, returns a dict of phase to the
+    summary of its frame times (seconds), and the time to build the map.
+    size - the map's size in tiles.
+    built - the share of the map's cells with a tile built on them.
+    click_every - frames between clicks.
+    step - the furthest the mouse moves in a frame, in pixels."""
+    # the drivers are read when the display is initialised.
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+    import controller
+    import level
+    import master
+    import powersim
+    from constants import MESH_POS, MESH_VIEW
+    from metrics import Histogram
+    from tiletypes import Tiledict
+
+    # the dummy display is 8 bit unless asked otherwise.
+    m = master.Master(depth=32)
+    c = controller.Controller()
+    # the level's messages are delivered on this thread.
+    c.synchronous = True
+
+    game_level = level.Level3(c)
+    game_level.mapsize = size
+
+    started = time.time()
+    game = powersim.Game(parent=m, controller=c, level=game_level, prev=None)
+    game.resume()
+
+    # build on a random share of the cells, all at once.
+    rand = random.Random(seed)
+    xdim, ydim = size
+    count = int(built * xdim * ydim)
+    cells = rand.sample(xrange(xdim * ydim), count)
+    game.mesh.addtiles(dict(
+                    ((cell % xdim, cell // xdim),
+                        Tiledict[rand.choice(BUILT_TYPES)]())
+                    for cell in cells))
+    build = time.time() - started
+
+    # draw the first frame, everything is new.
+    m.publish(game, game._draw())
+    pygame.display.update()
+
+    histograms = dict((phase, Histogram()) for phase in PHASES)
+    area = pygame.Rect(MESH_POS, MESH_VIEW)
+    x, y = area.center
+    for frame in xrange(frames):
+        # move the mouse within the map, and now and then click.
+        x = min(max(x + rand.randint(-step, step), area.left), area.right - 1)
+        y = min(max(y + rand.randint(-step, step), area.top), area.bottom - 1)
+        pygame.mouse.set_pos((x, y))
+        if frame % click_every == click_every - 1:
+            for kind in (MOUSEBUTTONDOWN, MOUSEBUTTONUP):
+                pygame.event.post(pygame.event.Event(kind, pos=(x, y),
+                                                        button=1))
+
+        started = time.time()
+        m.events()
+        events = []
+        while not game.events.empty():
+            events.append(game.events.get())
+        game._loop(events)
+        updating = time.time()
+        game._update()
+        drawing = time.time()
+        pygame.display.update(m.publish(game, game._paint()))
+        finished = time.time()
+
+        histograms['events'].record(updating - started)
+        histograms['update'].record(drawing - updating)
+        histograms['redraw'].record(finished - drawing)
+
+    results = dict((phase, histograms[phase].snapshot()) for phase in PHASES)
+    results['build'] = build
+    return results
+
+def report(results):
+    """Return the results as lines of text, times in milliseconds."""
+    columns = ['p%s' % percent for percent in PERCENTILES] + ['max']
+    lines = ['build %.3f s' % results['build'],
+                '%-8s' % 'ms' + ''.join('%10s' % name for name in columns)]
+    for phase in PHASES:
+        summary = results[phase]
+        lines.append('%-8s' % phase + ''.join('%10.3f' % (1000 * summary[name])
+                                                for name in columns))
+    return lines
+
+if __name__ == '__main__':
+    import json
+    from optparse import OptionParser
+
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option('--size', default='20x12',
+                        help="map size in tiles, XxY [%default]")
+    parser.add_option('--built', type='float', default=0.0,
+                        help="share of the cells built on [%default]")
+    parser.add_option('--frames', type='int', default=300,
+                        help="frames timed [%default]")
+    parser.add_option('--click-every', type='int', default=10,
+                        help="frames between clicks [%default]")
+    parser.add_option('--seed', type='int', default=0,
+                        help="seed of the map and mouse [%default]")
+    parser.add_option('--json', action='store_true', default=False,
+                        help="print the results as JSON")
+    options, args = parser.parse_args()
+
+    xdim, ydim = [int(value) for value in options.size.split('x')]
+    results = run(size=(xdim, ydim), built=options.built,
+                    frames=options.frames, click_every=options.click_every,
+                    seed=options.seed)
+    if options.json:
+        print json.dumps(results, sort_keys=True)
+    else:
+        print '\n'.join(report(results))
@@ -2,31 +2,24 @@ import pygame
 
 from constants import *
 from font import small_font
+from assets import Assets
 
 
 __all__ = ['Button', 'load_img', 'Exit_button']
 
 def load_img(filename, num_pics=(1,1)):
+    """Return the frames of the image, shared with everything else that
+    shows it."""
     try:
-        image = pygame.image.load(filename)
-        colorkey = image.get_at((0,0))
-        image.set_colorkey(colorkey)
-        image.convert_alpha()
-        w, h = image.get_size()
-        x_step = float(w) / num_pics[0] #width of each sub image
-        y_step = float(h) / num_pics[1] #height of each sub image
-
-        images = []
-        for x in range(num_pics[0]):
-            for y in range(num_pics[1]):
-                images.append(image.subsurface((x_step*x, y_step*y, x_step, y_step)))
-
+        images = Assets().image(filename, num_pics)
     except Exception, msg:
         print "Error in Load Image: ", msg
         images = None
     return images
 
-class Button(pygame.sprite.Sprite):
+class Button(pygame.sprite.DirtySprite):
+    # drawn above popups and text entries.
+    _layer = 3
     def __init__(self, pos, containers, obj=None, 
                     padding=(10,10), num_pics=(1,1)):
         txt = None
@@ -36,7 +29,7 @@ class Button(pygame.sprite.Sprite):
         else:
             txt = obj
 
-        pygame.sprite.Sprite.__init__(self, containers)
+        pygame.sprite.DirtySprite.__init__(self, containers)
 
         self.pos = pos
         self.containers = containers
@@ -98,6 +91,7 @@ class Button(pygame.sprite.Sprite):
         self.rect.topleft = self.pos #absolute position
         self.__render_content()
         self.shown = True
+        self.dirty = 1
 
     def __render_content(self):
         if self.text:
@@ -137,7 +131,8 @@ class Button(pygame.sprite.Sprite):
     def set_pos(self, pos):
         self.pos = pos
         self.rect.topleft = pos
-        
+        self.dirty = 1
+
     def get_state(self):
         return self.current_state == BUTTON_ON
 
@@ -1,6 +1,14 @@
 from elem import ElemError
 class _Command(object):
     """Base class to issue commands."""
+    # the time the command was posted to the power system.
+    posted = None
+    # the ids of the traces the command is part of.
+    traces = ()
+    # True for a command that changes nothing in the network, it is not
+    #  counted as a command arriving or solved for.
+    marker = False
+
     def __init__(self, **kwargs):
         # save the parameters to be used later.
         self.attributes = kwargs
@@ -9,28 +17,36 @@ class _Command(object):
         """Command objects override this member."""
         pass
 
+    def ids(self):
+        """Return the ids of the elements this command acts on.
+        Used to decide if waiting commands can be coalesced."""
+        try:
+            return (self.attributes['elemid'],)
+        except KeyError:
+            return ()
+
 class _ConnectCommand(_Command):
     """Base class for connecting elements to the power system."""
     def _operate(self, elem, context):
         """Add the generic element to the context's list."""
         attr = self.attributes
 
-        connect_names = attr['connections'] or []
-        # get the objects represented by the connected names.
-        connections = [context._getname(name) for name in connect_names]
+        connect_ids = attr['connections'] or []
+        # get the objects represented by the connected ids.
+        connections = [context._getelem(elemid) for elemid in connect_ids]
 
         # get a list of elems that I am supposed to connect to.
-        cached = context._getmap(attr['name'])
+        cached = context._getmap(attr['elemid'])
         # remove any NoneType connections (placeholders?).XXX Does this occur?
         cached_connections = [obj for obj in cached if obj is not None]
         
         # cache the ones that were not yet instantiated.
-        for name, obj in zip(connect_names, connections):
+        for elemid, obj in zip(connect_ids, connections):
             if obj is None:
-                # this connection failed because 'name' was not
+                # this connection failed because 'elemid' was not
                 #  yet instantiated so register myself as wanting to connect
-                #  to name.
-                context._addmap(mapfrom=name, mapto=attr['name'])
+                #  to elemid.
+                context._addmap(mapfrom=elemid, mapto=attr['elemid'])
 
         # remove None Type connections.
         connections = [item for item in connections if item is not None]
@@ -43,7 +59,7 @@ class _ConnectCommand(_Command):
                 elem.connect([element])
             except ElemError:
                 pass
-        context._addelem(attr['name'], elem) 
+        context._addelem(attr['elemid'], elem)
 
 class _OperationCreateBus(_ConnectCommand):
     """Create a new bus, using the provided parameters."""
@@ -55,7 +71,8 @@ class _OperationCreateBus(_ConnectCommand):
         attr = self.attributes
         newbus = context.BusType(pgen=attr['pgen'], 
                 qgen=attr['qgen'], pload=attr['pload'], qload=attr['qload'],
-                bustype=attr['bustype'], name=attr['name'])
+                bustype=attr['bustype'], name=attr['name'],
+                elemid=attr['elemid'])
 
         try:
             self._operate(newbus, context)
@@ -71,7 +88,7 @@ class _OperationCreateLine(_ConnectCommand):
 
         # create the new line.
         attr = self.attributes
-        newline = context.LineType(name=attr['name'])
+        newline = context.LineType(name=attr['name'], elemid=attr['elemid'])
 
         try:
             self._operate(newline, context)
@@ -83,32 +100,32 @@ class _OperationDecommission(_Command):
     def operate(self, context):
         """Decommission the given element, given the context passed."""
 
-        name = self.attributes['name']
+        elemid = self.attributes['elemid']
 
         try:
-            context._decommission(name)
+            context._decommission(elemid)
         except AttributeError:
-            # no such 'name' in context.
+            # no such 'elemid' in context.
             pass
 
 class _OperationRenameElement(_Command):
-    """Rename the element, from_name, to_name."""
+    """Rename the element, elemid, to_name."""
     def operate(self, context):
-        """rename the element 'from_name' to 'to_name'
-        Assumes that the keys 'from_name' and 'to_name' were
+        """rename the element 'elemid' to 'to_name'
+        Assumes that the keys 'elemid' and 'to_name' were
         passed in the creation of this object."""
 
-        from_name = self.attributes['from_name']
+        elemid = self.attributes['elemid']
         to_name = self.attributes['to_name']
 
-        context._rename(from_name, to_name)
+        context._rename(elemid, to_name)
 
 class _OperationSetSolutionCallback(_Command):
     """Set a callback that is called with the new netlist details
     on valid powerflow solution.
 
     format of callback should be a record (tuple):
-    (recordtype, element_name, (*payload))
+    (recordtype, element_name, (*payload), element_id)
 
     where payload is a variable length payload and it's contents for 
     the two defined recordtypes are:
@@ -129,6 +146,33 @@ class _OperationEditElement(_Command):
     with the ones in the changes dict."""
 
     def operate(self, context):
-        name = self.attributes['name']
+        elemid = self.attributes['elemid']
         changes = self.attributes['changes']
-        context._edit_elem(name, changes)
+        context._edit_elem(elemid, changes)
+
+    def merge(self, other):
+        """Fold a later edit of the same element into this one,
+        later values win."""
+        changes = dict(self.attributes['changes'])
+        changes.update(other.attributes['changes'])
+        self.attributes['changes'] = changes
+
+class _OperationEditElements(_Command):
+    """Update the attributes on many elements at once, edits is a dict 
+    of element id to changes dict."""
+
+    def operate(self, context):
+        for elemid, changes in self.attributes['edits'].items():
+            context._edit_elem(elemid, changes)
+
+    def ids(self):
+        return self.attributes['edits'].keys()
+
+    def merge(self, other):
+        """Fold a later bulk edit into this one, later values win."""
+        edits = dict(self.attributes['edits'])
+        for elemid, changes in other.attributes['edits'].items():
+            merged = dict(edits.get(elemid, {}))
+            merged.update(changes)
+            edits[elemid] = merged
+        self.attributes['edits'] = edits
@@ -0,0 +1,378 @@
+"""
+A compact binary journal of the commands posted to a PowerSystem, and
+a driver to replay a journal into a PowerSystem.
+
+A journal starts with MAGIC, followed by one record per command:
+
+    <d timestamp, seconds since the journal was started>
+    <B command type>
+    <I payload length>
+    <payload>
+
+Elements are written by name, a replay posts the commands through the
+PowerSystem's public methods so they are interned and queued just as
+they were when recorded. Solution callbacks are not journaled, nor are
+connections to elements that no longer exist, or edit values that are
+not a number, a string or None (bus powers of another type are written
+as None).
+
+Recording:
+    ps = PowerSystem(journal=CommandJournal(open('session.psj', 'wb')))
+
+Replaying, at the recorded speed or (speed=None) as fast as possible,
+and waiting for the last command to be solved:
+    replay(open('session.psj', 'rb'), ps, speed=None)
+    settle(ps)
+"""
+import struct
+import threading
+import time
+
+from command import _OperationCreateBus, _OperationCreateLine
+from command import _OperationEditElement, _OperationRenameElement
+from command import _OperationDecommission, _OperationEditElements
+from command import _Command
+
+__all__ = ['CommandJournal', 'JournalError', 'read', 'replay', 'settle']
+
+MAGIC = 'PSJ\x03'
+
+HEADER = struct.Struct('<dBI')
+
+# command types.
+BUS, LINE, EDIT, RENAME, DECOMMISSION, EDITS = range(1, 7)
+
+class JournalError(Exception):
+    """Raised on a journal that cannot be read."""
+    pass
+
+def _pack_str(text):
+    if isinstance(text, unicode):
+        text = text.encode('utf-8')
+    return struct.pack('<H', len(text)) + text
+
+def _unpack_str(data, offset):
+    size, = struct.unpack_from('<H', data, offset)
+    offset += 2
+    return data[offset:offset + size], offset + size
+
+# the count written for no list of names at all.
+NO_NAMES = 0xffff
+
+def _pack_names(names):
+    if names is None:
+        return struct.pack('<H', NO_NAMES)
+    return struct.pack('<H', len(names)) + ''.join(map(_pack_str, names))
+
+def _unpack_names(data, offset):
+    count, = struct.unpack_from('<H', data, offset)
+    offset += 2
+    if count == NO_NAMES:
+        return None, offset
+    names = []
+    for i in xrange(count):
+        name, offset = _unpack_str(data, offset)
+        names.append(name)
+    return names, offset
+
+def _connection_names(attr, ids):
+    if attr['connections'] is None:
+        return None
+    # a released id has no name, the connection could not be made.
+    names = [ids.name(ref) for ref in attr['connections']]
+    return [name for name in names if name is not None]
+
+
+def _encode_line(attr, ids):
+    connections = _connection_names(attr, ids)
+    return (LINE, struct.pack('<I', attr['elemid']) +
+                _pack_str(attr['name']) + _pack_names(connections))
+
+# the types of edit value.
+NUMBER, STRING, NONE = 'd', 's', 'n'
+
+def _pack_value(value):
+    """Return the value with its type, or None if it can't be written."""
+    if value is None:
+        return NONE
+    elif isinstance(value, basestring):
+        return STRING + _pack_str(value)
+    elif isinstance(value, (int, long, float)):
+        return NUMBER + struct.pack('<d', value)
+    return None
+
+def _unpack_value(data, offset):
+    kind = data[offset:offset + 1]
+    offset += 1
+    if kind == NUMBER:
+        value, = struct.unpack_from('<d', data, offset)
+        return value, offset + 8
+    elif kind == STRING:
+        return _unpack_str(data, offset)
+    elif kind == NONE:
+        return None, offset
+    raise JournalError("Unknown value type %r" % kind)
+
+# the powers of a bus, in the order they are written.
+POWERS = ('pgen', 'qgen', 'pload', 'qload')
+
+def _encode_bus(attr, ids):
+    connections = _connection_names(attr, ids)
+    # the powers may be None, or anything add_bus takes. One that can't
+    #  be written is recorded as None.
+    powers = [_pack_value(attr[power]) or NONE for power in POWERS]
+    return (BUS, struct.pack('<IB', attr['elemid'], attr['bustype']) +
+                ''.join(powers) + _pack_str(attr['name']) + 
+                _pack_names(connections))
+
+def _pack_changes(elemid, changes):
+    data = []
+    for change, value in changes.items():
+        value = _pack_value(value)
+        if value is not None:
+            data.append(_pack_str(change) + value)
+    return struct.pack('<IH', elemid, len(data)) + ''.join(data)
+
+def _unpack_changes(data, offset):
+    elemid, count = struct.unpack_from('<IH', data, offset)
+    offset += 6
+    changes = {}
+    for i in xrange(count):
+        change, offset = _unpack_str(data, offset)
+        changes[change], offset = _unpack_value(data, offset)
+    return elemid, changes, offset
+
+def _encode_edit(attr, ids):
+    return EDIT, _pack_changes(attr['elemid'], attr['changes'])
+
+def _encode_edits(attr, ids):
+    edits = attr['edits']
+    return EDITS, struct.pack('<I', len(edits)) + ''.join(
+                [_pack_changes(elemid, changes) 
+                        for elemid, changes in edits.items()])
+
+def _encode_rename(attr, ids):
+    return RENAME, struct.pack('<I', attr['elemid']) + _pack_str(attr['to_name'])
+
+def _encode_decommission(attr, ids):
+    return DECOMMISSION, struct.pack('<I', attr['elemid'])
+
+_ENCODERS = {
+    _OperationCreateBus: _encode_bus,
+    _OperationCreateLine: _encode_line,
+    _OperationEditElement: _encode_edit,
+    _OperationRenameElement: _encode_rename,
+    _OperationDecommission: _encode_decommission,
+    _OperationEditElements: _encode_edits,
+    }
+
+def _decode(kind, data):
+    """Return the fields of a record as a tuple."""
+    if kind == BUS:
+        fields = struct.unpack_from('<IB', data)
+        offset = struct.calcsize('<IB')
+        for power in POWERS:
+            value, offset = _unpack_value(data, offset)
+            fields += (value,)
+        name, offset = _unpack_str(data, offset)
+        connections, offset = _unpack_names(data, offset)
+        return fields + (name, connections)
+    elif kind == LINE:
+        elemid, = struct.unpack_from('<I', data)
+        name, offset = _unpack_str(data, 4)
+        connections, offset = _unpack_names(data, offset)
+        return elemid, name, connections
+    elif kind == EDIT:
+        elemid, changes, offset = _unpack_changes(data, 0)
+        return elemid, changes
+    elif kind == EDITS:
+        count, = struct.unpack_from('<I', data)
+        offset = 4
+        edits = {}
+        for i in xrange(count):
+            elemid, changes, offset = _unpack_changes(data, offset)
+            edits[elemid] = changes
+        return edits,
+    elif kind == RENAME:
+        elemid, = struct.unpack_from('<I', data)
+        to_name, offset = _unpack_str(data, 4)
+        return elemid, to_name
+    elif kind == DECOMMISSION:
+        return struct.unpack_from('<I', data)
+    raise JournalError("Unknown command type %d" % kind)
+
+class CommandJournal(object):
+    """Write commands to a binary journal as they are posted."""
+    def __init__(self, fileobj, clock=time.time):
+        """fileobj - an open binary file (or file like object).
+        clock - returns the time in seconds."""
+        self._file = fileobj
+        self._clock = clock
+        self._start = clock()
+        self._mutex = threading.Lock()
+
+        # number of commands written.
+        self.count = 0
+
+        fileobj.write(MAGIC)
+
+    def record(self, cmd, ids):
+        """Write cmd to the journal, ids is the NameIndex its element
+        ids belong to."""
+        try:
+            encode = _ENCODERS[type(cmd)]
+        except KeyError:
+            # not a change to the network.
+            return
+        kind, payload = encode(cmd.attributes, ids)
+
+        self._mutex.acquire()
+        try:
+            stamp = self._clock() - self._start
+            self._file.write(HEADER.pack(stamp, kind, len(payload)))
+            self._file.write(payload)
+            self.count += 1
+        finally:
+            self._mutex.release()
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+def read(fileobj):
+    """Generate the records of a journal as (timestamp, kind, fields)."""
+    if fileobj.read(len(MAGIC)) != MAGIC:
+        raise JournalError("Not a command journal.")
+
+    while True:
+        header = fileobj.read(HEADER.size)
+        if not header:
+            return
+        if len(header) < HEADER.size:
+            raise JournalError("Truncated journal.")
+        stamp, kind, size = HEADER.unpack(header)
+        payload = fileobj.read(size)
+        if len(payload) < size:
+            raise JournalError("Truncated journal.")
+        yield stamp, kind, _decode(kind, payload)
+
+def replay(fileobj, ps, speed=1.0, clock=time.time, sleep=time.sleep):
+    """Post the commands in the journal to the power system ps.
+
+    speed - a multiple of the recorded speed, None to post the commands
+            as fast as the power system will take them.
+    Returns the number of commands posted."""
+    # recorded id -> the element's name at this point in the replay.
+    names = {}
+
+    start = clock()
+    count = 0
+    for stamp, kind, fields in read(fileobj):
+        if speed:
+            delay = start + stamp / speed - clock()
+            if delay > 0:
+                sleep(delay)
+
+        if kind == BUS:
+            elemid, bustype, pgen, qgen, pload, qload, name, conns = fields
+            names[elemid] = name
+            ps.add_bus(name, pgen=pgen, qgen=qgen, pload=pload,
+                        qload=qload, bustype=bustype, connections=conns)
+        elif kind == LINE:
+            elemid, name, conns = fields
+            names[elemid] = name
+            ps.add_line(name, connections=conns)
+        elif kind == EDITS:
+            # the elements that still exist at this point in the replay.
+            edits = dict((names[elemid], changes) 
+                        for elemid, changes in fields[0].items()
+                        if elemid in names)
+            ps.edit_elems(edits)
+        else:
+            elemid = fields[0]
+            try:
+                name = names[elemid]
+            except KeyError:
+                # refers to an element that was never created, the
+                #  recorded command had no effect either.
+                continue
+
+            if kind == EDIT:
+                ps.edit_elem(name, fields[1])
+            elif kind == RENAME:
+                names[elemid] = fields[1]
+                ps.rename_element(name, fields[1])
+            elif kind == DECOMMISSION:
+                del(names[elemid])
+                ps.decommission_element(name)
+        count += 1
+
+    return count
+
+class _Settle(_Command):
+    """Notes the number of solves finished when it is run, so the next
+    solve to finish includes every command posted before it."""
+    # waiting changes nothing, it is not counted or solved for.
+    marker = True
+
+    def __init__(self, metrics):
+        _Command.__init__(self)
+        self._counters = [metrics.counter('solves'),
+                            metrics.counter('solves.failed')]
+        self.finished = None
+
+    def solves(self):
+        return sum(counter.value for counter in self._counters)
+
+    def operate(self, context):
+        self.finished = self.solves()
+
+    def settled(self):
+        return self.finished is not None and self.solves() > self.finished
+
+def settle(ps, timeout=None, poll=0.001, clock=time.time, sleep=time.sleep):
+    """Wait until the commands posted to the running power system ps
+    have been run and solved, or failed to solve. Returns False if
+    timeout seconds passed first."""
+    mark = _Settle(ps.metrics)
+    # queued directly, it is not journaled or timed. Nor does it ask
+    #  for a solve, or supersede one, the next (idle) solve settles it.
+    ps._queue.put(mark)
+    if timeout is not None:
+        timeout += clock()
+    while not mark.settled():
+        if timeout is not None and clock() > timeout:
+            return False
+        sleep(poll)
+    return True
+
+if __name__ == '__main__':
+    # replay a journal headless, as fast as possible, and report the
+    #  throughput of the solve pipeline and the latency of the commands.
+    import sys
+    from powersystem import PowerSystem
+
+    if len(sys.argv) != 2:
+        print "usage: %s journal" % sys.argv[0]
+        sys.exit(1)
+
+    ps = PowerSystem()
+    ps.setDaemon(True)
+    ps.start()
+
+    started = time.time()
+    count = replay(open(sys.argv[1], 'rb'), ps, speed=None)
+    settle(ps)
+    elapsed = time.time() - started
+    ps.stop()
+
+    # seconds from each command being posted to it being run.
+    applied = ps.metrics.histogram('command.applied')
+    print "%d commands in %.3f s, %.1f commands/s" % (count, elapsed, 
+                                                    count / max(elapsed, 1e-9))
+    if applied.count:
+        print "latency p50 %.3f ms, p99 %.3f ms" % (
+                                            1000 * applied.percentile(50),
+                                            1000 * applied.percentile(99))
@@ -0,0 +1,200 @@
+"""
+A threadsafe command queue for the PowerSystem object.
+
+Commands posted to the power system are coalesced while they wait
+to be run:
+    - consecutive edits to the same element are merged into one edit,
+      a rename in between does not change the element's id.
+    - consecutive bulk edits are merged into one bulk edit.
+    - an element that is created and then decommissioned before the
+      creation was run is never built at all.
+
+The queue can also be bounded, a full queue applies backpressure to
+whoever is posting commands (by blocking, or raising Queue.Full).
+"""
+import threading
+import Queue
+import time
+from collections import deque
+
+from command import _OperationEditElement, _OperationDecommission
+from command import _OperationCreateBus, _OperationCreateLine
+from command import _OperationRenameElement, _OperationEditElements
+
+__all__ = ['CommandQueue']
+
+class CommandQueue(object):
+    """A Queue.Queue work-alike that coalesces power system commands."""
+    def __init__(self, maxsize=0, block=True):
+        """maxsize - the number of commands allowed to wait in the queue,
+                        0 or less for an unbounded queue.
+        block - default behaviour of put on a full queue. True to wait
+                        for space, False to raise Queue.Full."""
+        self.maxsize = maxsize
+        self.block = block
+
+        self._items = deque()
+        self._mutex = threading.Lock()
+        self._not_empty = threading.Condition(self._mutex)
+        self._not_full = threading.Condition(self._mutex)
+
+        # number of commands that were merged into (or cancelled) a
+        # command that was already waiting.
+        self.coalesced = 0
+
+        # incremented on every put of a command that is not a marker, a
+        #  solve started at one generation is stale once the generation
+        #  moves on.
+        self.generation = 0
+
+    def qsize(self):
+        """Return the number of commands waiting to be run."""
+        self._mutex.acquire()
+        try:
+            return len(self._items)
+        finally:
+            self._mutex.release()
+    depth = qsize
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def full(self):
+        self._mutex.acquire()
+        try:
+            return self._full()
+        finally:
+            self._mutex.release()
+
+    def _full(self):
+        return 0 < self.maxsize <= len(self._items)
+
+    def put(self, cmd, block=None, timeout=None):
+        """Post a command. Commands that can be merged into a waiting
+        command never block."""
+        if block is None:
+            block = self.block
+
+        self._not_full.acquire()
+        try:
+            if not cmd.marker:
+                self.generation += 1
+            if self._coalesce(cmd):
+                self.coalesced += 1
+                return
+
+            if self._full():
+                if not block:
+                    raise Queue.Full
+                elif timeout is None:
+                    while self._full():
+                        self._not_full.wait()
+                else:
+                    endtime = time.time() + timeout
+                    while self._full():
+                        remaining = endtime - time.time()
+                        if remaining <= 0.0:
+                            raise Queue.Full
+                        self._not_full.wait(remaining)
+
+            self._items.append(cmd)
+            self._not_empty.notify()
+        finally:
+            self._not_full.release()
+
+    def put_nowait(self, cmd):
+        return self.put(cmd, block=False)
+
+    def get(self, block=True, timeout=None):
+        """Remove and return the oldest command, raise Queue.Empty
+        if there is nothing to return."""
+        self._not_empty.acquire()
+        try:
+            if not block:
+                if not self._items:
+                    raise Queue.Empty
+            elif timeout is None:
+                while not self._items:
+                    self._not_empty.wait()
+            else:
+                endtime = time.time() + timeout
+                while not self._items:
+                    remaining = endtime - time.time()
+                    if remaining <= 0.0:
+                        raise Queue.Empty
+                    self._not_empty.wait(remaining)
+
+            cmd = self._items.popleft()
+            self._not_full.notify()
+            return cmd
+        finally:
+            self._not_empty.release()
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def _coalesce(self, cmd):
+        """Attempt to fold cmd into the waiting commands, return True
+        if nothing is left to queue. Assumes the mutex is held."""
+        if isinstance(cmd, _OperationEditElement):
+            return self._merge_edit(cmd)
+        elif isinstance(cmd, _OperationEditElements):
+            return self._merge_edits(cmd)
+        elif isinstance(cmd, _OperationDecommission):
+            self._cancel_create(cmd)
+        return False
+
+    def _merge_edit(self, cmd):
+        """Merge the edit into the most recent waiting edit of the same
+        element. Stop looking at any command that creates or removes the
+        element."""
+        elemid = cmd.attributes['elemid']
+        for waiting in reversed(self._items):
+            if elemid not in waiting.ids():
+                continue
+            if isinstance(waiting, _OperationEditElement):
+                waiting.merge(cmd)
+                return True
+            if isinstance(waiting, _OperationRenameElement):
+                continue
+            # a create/decommission of the element, can't reorder.
+            return False
+        return False
+
+    def _merge_edits(self, cmd):
+        """Merge the bulk edit into the most recent waiting bulk edit,
+        unless a command after it (other than a rename) acts on any of
+        the same elements."""
+        elemids = set(cmd.ids())
+        for waiting in reversed(self._items):
+            if isinstance(waiting, _OperationEditElements):
+                waiting.merge(cmd)
+                return True
+            if isinstance(waiting, _OperationRenameElement):
+                continue
+            if not elemids.isdisjoint(waiting.ids()):
+                return False
+        return False
+
+    def _cancel_create(self, cmd):
+        """Remove a waiting create command (and any waiting edits or
+        renames) for the element cmd decommissions. The decommission is
+        still queued so the record of failed connections to the element 
+        is cleared."""
+        elemid = cmd.attributes['elemid']
+        edits = []
+        for waiting in reversed(self._items):
+            if elemid not in waiting.ids():
+                continue
+            if isinstance(waiting, (_OperationEditElement,
+                                    _OperationRenameElement)):
+                edits.append(waiting)
+                continue
+            if isinstance(waiting, (_OperationCreateBus,
+                                    _OperationCreateLine)):
+                for dead in edits + [waiting]:
+                    self._items.remove(dead)
+                    self.coalesced += 1
+                    # room for another command.
+                    self._not_full.notify()
+            break
@@ -63,6 +63,11 @@ HEX_B = 0.25
 HEX_S = 0.5
 
 #------MESH CONSTANTS--------
+# the area of the screen showing the map, left of the panel.
+MESH_POS = (30, 30)
+MESH_VIEW = (PANEL_POS[0] - MESH_POS[0], SCREEN_SIZE[1] - MESH_POS[1])
+# pixels scrolled per frame while an arrow key is held.
+SCROLL_STEP = 20
 TILE_HEIGHT = 32
 TILE_WIDTH = round(TILE_HEIGHT * HEX_A * 2)
 TILE_B = TILE_HEIGHT * HEX_B
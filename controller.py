@@ -1,38 +1,100 @@
+"""
+The global event controller.
+
+Listeners register for named events, and events sent by name are
+passed to every listener registered for that name. Delivery is:
+
+    - asynchronous by default. The controller thread blocks on the
+      queue of sent events and hands each listener call to one of a
+      fixed pool of worker threads.
+    - in order per listener. A listener is always called by the same
+      worker, so it sees its events in the order they were sent and is
+      never called from two threads at once.
+    - synchronous, in the sending thread, for a send with sync=True or
+      when the controller's synchronous attribute is set.
+"""
 import Queue
 import threading
-import time
+import traceback
 from collections import defaultdict
 
+__all__ = ['Controller']
+
+# number of worker threads calling the listeners.
+WORKERS = 4
+
 class Controller(threading.Thread):
     _shared_state = {}
-    def __init__(self):
+    def __init__(self, workers=WORKERS):
+        """workers - size of the worker pool, used by the first
+        Controller made."""
         self.__dict__ = self._shared_state
+        if self.__dict__:
+            # the borg is already set up.
+            return
+
         threading.Thread.__init__(self)
 
-        self._reg = Queue.Queue()
+        self._mutex = threading.Lock()
         self._registered = defaultdict(set)
 
         self._send = Queue.Queue()
 
+        # one queue per worker thread.
+        self._work = [Queue.Queue() for i in range(workers)]
+
+        # call listeners in the sending thread.
+        self.synchronous = False
+
     def register(self, name, fn):
         """register a fn to be called when event name occurs."""
-        self._reg.put((name, fn))
+        self._mutex.acquire()
+        try:
+            self._registered[name].add(fn)
+        finally:
+            self._mutex.release()
+
+    def listeners(self, name):
+        """Return the listeners registered for name."""
+        self._mutex.acquire()
+        try:
+            return list(self._registered.get(name, ()))
+        finally:
+            self._mutex.release()
+
+    def send(self, name, event, sync=None):
+        """send the event object to all who have registered for name.
+        sync - True to call the listeners before returning, defaults to
+                the controller's synchronous attribute."""
+        if sync is None:
+            sync = self.synchronous
+        if sync:
+            for fn in self.listeners(name):
+                fn(event)
+        else:
+            self._send.put((name, event))
 
-    def send(self, name, event):
-        """send the event object to all who have registered for name."""
-        self._send.put((name, event))
+    def _worker(self, fn):
+        """Return the queue of the worker that calls fn."""
+        return self._work[hash(fn) % len(self._work)]
 
     def run(self):
+        for work in self._work:
+            worker = threading.Thread(target=_work, args=(work,))
+            worker.setDaemon(True)
+            worker.start()
+
         while True:
-            while not self._reg.empty():
-                name, fn = self._reg.get()
-                self._registered[name].update([fn])
-
-            while not self._send.empty():
-                name, event = self._send.get()
-                listeners = self._registered[name]
-                for fn in listeners:
-                    t = threading.Thread(target=fn, args=(event,))
-                    t.setDaemon(True)
-                    t.start()
-            time.sleep(0.05)
+            name, event = self._send.get()
+            for fn in self.listeners(name):
+                self._worker(fn).put((fn, event))
+
+def _work(work):
+    """Call the listeners put on the work queue, in order."""
+    while True:
+        fn, event = work.get()
+        try:
+            fn(event)
+        except Exception:
+            # a failed listener must not take the worker with it.
+            traceback.print_exc()
@@ -1,10 +1,61 @@
+from collections import defaultdict, deque
+from numpy import nan, isnan
+
+from elementstore import ElementStore
+
 class ElemError(Exception):
     """Error in Elem object."""
     pass
 
-class AlreadySearched(Exception):
-    """Island search already performed for this node."""
-    pass
+class ChangeJournal(object):
+    """Record what changed in the network since the last solve.
+
+    Parameter writes are journaled per element and attribute. Changes 
+    to the netlist itself (connections, the swing bus) increment the 
+    topology epoch instead, a solver can keep its bus numbering and 
+    admittance matrix for as long as the epoch is unchanged."""
+    _shared_state = {}
+    epoch = 0
+    # element -> set of changed attribute names.
+    _changed = {}
+
+    def __init__(self):
+        """Borg singleton pattern."""
+        self.__dict__ = self._shared_state
+
+    def mark(self, elem, attr):
+        """Record that attribute attr of elem was written."""
+        try:
+            self._changed[elem].add(attr)
+        except KeyError:
+            self._changed[elem] = set([attr])
+
+    def topology(self):
+        """Record that the netlist has changed."""
+        self.epoch += 1
+
+    def changes(self):
+        """Return a mapping of element to changed attribute names."""
+        return self._changed
+
+    def clear(self):
+        """Forget the parameter changes, i.e. once they are solved."""
+        self._changed = {}
+
+class Parameter(object):
+    """An element parameter kept in the element store, that journals 
+    writes to itself."""
+    def __init__(self, name):
+        self._name = name
+
+    def __get__(self, inst, cls):
+        if inst is None:
+            return self
+        return float(getattr(inst._table, self._name)[inst._slot])
+
+    def __set__(self, inst, value):
+        getattr(inst._table, self._name)[inst._slot] = value
+        ChangeJournal().mark(inst, self._name)
 
 class BusTypeObserver(object):
     """An observer to notify swing holder when a bus becomes swing bus."""
@@ -29,6 +80,7 @@ class BusTypeObserver(object):
             return
 
         inst._bustype = value
+        ChangeJournal().mark(inst, 'bustype')
         # notify the swing holder.
         try:
             SwingHolder(inst)
@@ -44,6 +96,7 @@ class SwingHolder(object):
     def __init__(self, swing=None):
         """Can update the swing bus by passing swing bus here."""
         self.__dict__ = self._shared_state
+        previous = self._swing
 
         # validate that passed bus is a swing bus.
         try:
@@ -51,7 +104,9 @@ class SwingHolder(object):
                 pass
             else:
                 if swing.name == self._swing.name:
+                    # the swing bus was demoted, its netlist goes with it.
                     self._swing = None
+                    ChangeJournal().topology()
                 raise ElemError("Bus is not swing bus type")
         except AttributeError:
             # check if we were passed default value or some random object type.
@@ -68,64 +123,149 @@ class SwingHolder(object):
         # update swing bus if passed a new bus.
         self._swing = swing or self._swing
 
-    def active_nodes(self):
-        """Return a list of all the active nodes."""
+        if self._swing is not previous:
+            # a different swing bus energises a different netlist.
+            ChangeJournal().topology()
 
-        reg = Register()
-        # begin a new search, clear last search results.
-        reg.clear()
-
-        try:
-            self._swing.island_search()
-        except AttributeError:
+    def active_nodes(self):
+        """Return the set of all the active nodes, those connected 
+        through the network to the swing bus. The set is maintained as
+        elements are connected, do not modify it."""
+        if self._swing is None:
             raise ElemError("Error no swing bus set!")
 
-        # island search is now complete, return a list of connected.
-        return reg.get_nodes()
+        return Connectivity().component(self._swing)
 
-class Register(object):
-    """On island lookup, register search results to prevent 
-        multiple look ups for the same node."""
+class Connectivity(object):
+    """Track the islands of the network as elements are connected and
+    disconnected, so that finding the energised set is a lookup.
+
+    A line joins the island of its buses only once it is connected at
+    both ends. Islands are merged on connection (union by size, the 
+    smaller island is relabelled). On disconnection only the island 
+    that held the line is searched, outward from both of its buses in 
+    lockstep, so the cost is that of the smaller of the two halves."""
     _shared_state = {}
-    _nodes = []
+    # element -> set of elements in the same island.
+    _owner = {}
+    # element -> set of neighbours through fully connected lines.
+    _adjacent = defaultdict(set)
+    # fully connected line -> the buses it joins.
+    _lines = {}
 
     def __init__(self):
         """Borg singleton pattern."""
         self.__dict__ = self._shared_state
 
-    def clear(self):
-        """new island search, clear previous results."""
-        self._nodes = []
-
-    def register(self, node):
-        """Add node to searched list. If node exists in list raise
-        AlreadySearched, call register before computing search."""
-        if node in self._nodes:
-            raise AlreadySearched("Already searched node.")
-        self._nodes.append(node)
-
-    def remove(self, node):
-        """Attempt to remove a node from the searched list."""
+    def component(self, elem):
+        """Return the island containing elem."""
         try:
-            self._nodes.remove(node)
-        except ValueError:
-            pass
+            return self._owner[elem]
+        except KeyError:
+            island = self._owner[elem] = set([elem])
+            return island
+
+    def update(self, elems):
+        """Elements have been connected or disconnected, bring the 
+        islands up to date with the lines among them."""
+        for elem in elems:
+            if elem.bustype is None:
+                self._line_changed(elem)
+
+    def forget(self, elem):
+        """Drop an element with no connections left."""
+        if self._adjacent.get(elem):
+            return
+        self._adjacent.pop(elem, None)
+        if self._owner.get(elem) == set([elem]):
+            del(self._owner[elem])
+
+    def _line_changed(self, line):
+        if len(line._elems) >= line._maxelems:
+            buses = tuple(line._elems)
+        else:
+            # a dangling line does not connect anything.
+            buses = None
+
+        if buses == self._lines.get(line):
+            return
+
+        if line in self._lines:
+            self._cut(line)
+        if buses is not None:
+            self._join(line, buses)
+        ChangeJournal().topology()
+
+    def _join(self, line, buses):
+        self._lines[line] = buses
+        for bus in buses:
+            self._adjacent[line].add(bus)
+            self._adjacent[bus].add(line)
+            self._union(line, bus)
+
+    def _union(self, a, b):
+        island_a = self.component(a)
+        island_b = self.component(b)
+        if island_a is island_b:
+            return
+        if len(island_a) < len(island_b):
+            island_a, island_b = island_b, island_a
+        island_a.update(island_b)
+        for elem in island_b:
+            self._owner[elem] = island_a
+
+    def _cut(self, line):
+        buses = self._lines.pop(line)
+        for bus in buses:
+            self._adjacent[line].discard(bus)
+            self._adjacent[bus].discard(line)
+
+        # the line is now an island on its own.
+        island = self.component(line)
+        island.discard(line)
+        self._owner[line] = set([line])
+
+        if len(buses) < 2:
+            return
+        split = self._separated(buses[0], buses[1])
+        if split is None:
+            return
 
-    def get_nodes(self):
-        return self._nodes
+        # move the cut off half to an island of its own.
+        island.difference_update(split)
+        for elem in split:
+            self._owner[elem] = split
+
+    def _separated(self, a, b):
+        """Search outward from a and b in turn. Return None if they are
+        still connected, otherwise the elements reachable from whichever 
+        side ran out of elements first."""
+        if a is b:
+            return None
+        seen = (set([a]), set([b]))
+        frontier = (deque([a]), deque([b]))
+        while True:
+            for side in (0, 1):
+                if not frontier[side]:
+                    return seen[side]
+                node = frontier[side].popleft()
+                for other in self._adjacent[node]:
+                    if other in seen[1 - side]:
+                        return None
+                    if other not in seen[side]:
+                        seen[side].add(other)
+                        frontier[side].append(other)
 
 class Elem(object):
-    """Base element class."""
+    """Base element class. The parameters of an element are held in 
+    the ElementStore columns, the object itself only holds its name, 
+    connections and slot in the store."""
+    __slots__ = ('name', 'elemid', '_elems', '_slot', '__weakref__')
+
     # default bus-type is None.
-    # this attribute is used during island lookup.
+    # this attribute is used to tell lines from buses.
     bustype = BusTypeObserver()
 
-    # attribute to indicate if this node is connected 
-    #  through the network to a swing bus. update using the
-    #  island_search method.
-    _connected = False
-
-    name = 'default'
     def __repr__(self):
         return "<Elem object name: %s>" % self.name
 
@@ -149,40 +289,42 @@ class Elem(object):
         for elem in new_elems:
             elem.connect([self])
 
+        Connectivity().update([self] + list(new_elems))
+
     def disconnect(self, other):
         """Disconnect an Elem object from self."""
         try:
             self._elems.remove(other)
         except ValueError:
             # tried to disconnect an element that wasn't in list.
-            pass
-
-    def island_search(self):
-        """Begin a search to determine if this node is connected
-        to a type 1 bus.""" 
-
-        reg = Register()
-        # register self before performing search.
-        try:
-            reg.register(self)
-        except AlreadySearched:
             return
 
-        # if a LineElem self.bustype = None.
-        if self.bustype is None:
-            # if this line is not connected at both ends, disconnect.
-            if len(self._elems) < self._maxelems:
-                reg.remove(self)
-                return
+        self._rewired()
+        Connectivity().update([self, other])
 
-        # now propagate search.
-        for elem in self._elems:
-            elem.island_search()
+    def _rewired(self):
+        """Called when the connected elements have changed."""
+        pass
 
 class BusElem(Elem):
     """Bus element. Can connect to multiple LineElements."""
-    def __init__(self, name, pgen=0, qgen=0, pload=0, qload=0, bustype=1):
+    __slots__ = ()
+    _table = ElementStore.buses
+    # limit number of connected elements to a nominal 10.
+    _maxelems = 10
+
+    pgen = Parameter('pgen')
+    qgen = Parameter('qgen')
+    pload = Parameter('pload')
+    qload = Parameter('qload')
+    voltage = Parameter('voltage')
+    angle = Parameter('angle')
+
+    def __init__(self, name, pgen=0, qgen=0, pload=0, qload=0, bustype=1,
+                    elemid=None):
+        self._slot = self._table.allocate(self)
         self.name = name
+        self.elemid = elemid
         self.pgen = pgen
         self.qgen = qgen
         self.pload = pload
@@ -197,8 +339,6 @@ class BusElem(Elem):
 
         # an empty container to hold connected elements.
         self._elems = []
-        # limit number of connected elements to a nominal 10.
-        self._maxelems = 10
         # the bus type: 1 load P-Q, 2 generator P-V, 3 swing bus V-delta.
         self.bustype = bustype
 
@@ -232,9 +372,22 @@ class BusElem(Elem):
             for elem in self._elems:
                 elem.disconnect(self)
             self._elems = []
+
+            conn = Connectivity()
+            conn.update([self])
+            conn.forget(self)
         return locals()
     elems = property(**elems())
 
+    def _bustype():
+        def fget(self):
+            return int(self._table.bustype[self._slot])
+
+        def fset(self, value):
+            self._table.bustype[self._slot] = value
+        return locals()
+    _bustype = property(**_bustype())
+
     def tolist(self, busno):
         """convert this element to a list representation.
         [busno, voltage, angle, pgen, qgen, pload, qload, 
@@ -246,24 +399,38 @@ class BusElem(Elem):
 
     def torecord(self):
         """Return a record of the form:
-        (recordtype, name, (volt, ang, pgen, qgen, pload, qload))
+        (recordtype, name, (volt, ang, pgen, qgen, pload, qload), elemid)
         """
         return (
                 'bus', self.name, 
                     ( # payload.
                         self.voltage, self.angle, self.pgen,  
                         self.qgen, self.pload, self.qload, self.bustype 
-                    )
+                    ),
+                self.elemid
                 ) 
 
 class LineElem(Elem):
     """Line element. Can connect to two BusElements."""
-    def __init__(self, name):
+    __slots__ = ()
+    _table = ElementStore.lines
+    _bustype = None
+    # limit number of connected elements to 2.
+    _maxelems = 2
+
+    res = Parameter('res')
+    reac = Parameter('reac')
+    charg = Parameter('charg')
+    tap = Parameter('tap')
+    phase = Parameter('phase')
+
+    def __init__(self, name, elemid=None):
+        self._slot = self._table.allocate(self)
         self.name = name
+        self.elemid = elemid
         # an empty container to hold connected elements.
         self._elems = []
-        # limit number of connected elements to 2.
-        self._maxelems = 2
+        self._rewired()
 
         self.res = 0.005
         self.reac = 0.02
@@ -271,8 +438,6 @@ class LineElem(Elem):
         self.tap = 1
         self.phase = 0
 
-        # stored as (p, q, from, to)
-        self.pqflow = None
     def elems():
         def fget(self):
             """get the connected elements."""
@@ -292,6 +457,7 @@ class LineElem(Elem):
                             "Cannot connect instance of type %(badtype)r"
                             % dict(badtype=type(elem)))
                 self._elems = value
+                self._rewired()
                 return 
             except AttributeError:
                 # the value is not a sequence type or does not implement len.
@@ -302,9 +468,40 @@ class LineElem(Elem):
             for elem in self._elems:
                 elem.disconnect(self)
             self._elems = []
+            self._rewired()
+
+            conn = Connectivity()
+            conn.update([self])
+            conn.forget(self)
         return locals()
     elems = property(**elems())
 
+    def _rewired(self):
+        """Store the slots of the connected buses, -1 for an unconnected
+        end. The last solved power flow no longer applies."""
+        ends = [bus._slot for bus in self._elems] + [-1, -1]
+        self._table.frm[self._slot], self._table.to[self._slot] = ends[:2]
+        self.pqflow = None
+
+    def pqflow():
+        def fget(self):
+            """the solved flow as (p, q, from, to), or None if unsolved."""
+            table = self._table
+            pflow = table.pflow[self._slot]
+            if isnan(pflow):
+                return None
+            frm, to = self._elems
+            return (float(pflow), float(table.qflow[self._slot]), 
+                                                        frm.name, to.name)
+
+        def fset(self, value):
+            if value is None:
+                value = (nan, nan)
+            self._table.pflow[self._slot] = value[0]
+            self._table.qflow[self._slot] = value[1]
+        return locals()
+    pqflow = property(**pqflow())
+
     def tolist(self, from_to):
         frm, to = from_to
 
@@ -312,9 +509,9 @@ class LineElem(Elem):
                             self.charg, self.tap, self.phase]
     def torecord(self):
         """Return a record of the form:
-        (recordtype, name, (pflow, qflow, from_name, to_name))
+        (recordtype, name, (pflow, qflow, from_name, to_name), elemid)
         """
-        return ('line', self.name, self.pqflow)
+        return ('line', self.name, self.pqflow, self.elemid)
 
     
 
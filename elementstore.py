@@ -0,0 +1,117 @@
+"""
+Columnar storage for the network elements.
+
+The parameters of every BusElem and LineElem live here, one NumPy
+array per parameter, rather than on the element objects themselves.
+An element is a light proxy holding its name, its connections and a
+slot number into the columns. The solver bridge reads and writes the
+columns as whole vectors.
+
+Line ends are kept as bus slot numbers in the 'frm' and 'to' columns
+(-1 for an unconnected end), from which the bus to line adjacency is
+built in compressed sparse row form.
+"""
+import weakref
+from heapq import heappush, heappop
+from numpy import zeros, column_stack, concatenate, nonzero, argsort
+from numpy import bincount, cumsum
+
+__all__ = ['ElementStore', 'Columns']
+
+BUS_FIELDS = ('voltage', 'angle', 'pgen', 'qgen', 'pload', 'qload', 'bustype')
+LINE_FIELDS = ('frm', 'to', 'res', 'reac', 'charg', 'tap', 'phase',
+                'pflow', 'qflow')
+
+class Columns(object):
+    """Struct of arrays storage with stable slots.
+
+    Every field is a preallocated float array, indexed by slot. A slot
+    is released when its element is garbage collected. Released slots
+    go on a free list and the lowest free slot is reused first, so the
+    slots stay compact. The arrays double in size when full."""
+    def __init__(self, fields, size=64):
+        self.fields = fields
+        self.size = size
+        for field in fields:
+            setattr(self, field, zeros(size))
+        self.used = zeros(size, dtype=bool)
+
+        # slot -> weak reference to the element.
+        self.refs = [None] * size
+
+        self._free = []
+        self._top = 0
+
+    def allocate(self, elem):
+        """Give elem a slot, return the slot."""
+        if self._free:
+            slot = heappop(self._free)
+        else:
+            if self._top == self.size:
+                self._grow()
+            slot = self._top
+            self._top += 1
+
+        # clear anything left by the slot's last owner.
+        for field in self.fields:
+            getattr(self, field)[slot] = 0
+
+        def collected(ref):
+            self.release(slot)
+        self.refs[slot] = weakref.ref(elem, collected)
+        self.used[slot] = True
+        return slot
+
+    def release(self, slot):
+        """Free the slot for reuse."""
+        self.refs[slot] = None
+        self.used[slot] = False
+        heappush(self._free, slot)
+
+    def _grow(self):
+        size = self.size * 2
+        for field in self.fields + ('used',):
+            old = getattr(self, field)
+            column = zeros(size, dtype=old.dtype)
+            column[:self.size] = old
+            setattr(self, field, column)
+        self.refs.extend([None] * self.size)
+        self.size = size
+
+    def elem(self, slot):
+        """Return the element in slot, or None."""
+        ref = self.refs[slot]
+        if ref is not None:
+            return ref()
+
+    def rows(self, slots, fields=None):
+        """Return a 2d array of the given slots, one column per field."""
+        return column_stack([getattr(self, field)[slots]
+                                for field in fields or self.fields])
+
+class ElementStore(object):
+    """Borg holding the bus and line columns."""
+    _shared_state = {}
+    buses = Columns(BUS_FIELDS)
+    lines = Columns(LINE_FIELDS)
+
+    def __init__(self):
+        """Borg singleton pattern."""
+        self.__dict__ = self._shared_state
+
+    def adjacency(self):
+        """Return the bus to line adjacency as (indptr, indices), the
+        slots of the lines at bus slot i are indices[indptr[i]:indptr[i+1]]."""
+        lines = self.lines
+        slots = nonzero(lines.used)[0]
+        ends = concatenate([lines.frm[slots], lines.to[slots]]).astype(int)
+        owners = concatenate([slots, slots])
+
+        connected = ends >= 0
+        ends = ends[connected]
+        owners = owners[connected]
+
+        counts = bincount(ends, minlength=self.buses.size)
+        indptr = zeros(len(counts) + 1, dtype=int)
+        indptr[1:] = cumsum(counts)
+        return indptr, owners[argsort(ends, kind='mergesort')]
@@ -1,5 +1,8 @@
+import threading
+
 import pygame
 from pygame.locals import *
+from collections import OrderedDict
 
 from constants import *
 import textwrap
@@ -7,6 +10,18 @@ __all__ = ['small_font', 'large_font']
 
 pygame.font.init()
 
+# the number of rendered texts kept, the least recently used go first.
+TEXT_CACHE = 256
+
+# (size, bold) -> font object.
+_fonts = {}
+# (text, colours, size, bold, width) -> text surface, in least recently 
+#  used order.
+_texts = OrderedDict()
+# held while using the caches, text may be rendered by the game state's
+#  listeners on the solver's thread as well as by the game's.
+_mutex = threading.Lock()
+
 def large_font(text, colour, background_colour = TRANSPARENT, width=None):
     return font(text, colour, background_colour, HEADING_FONT_SIZE, bold=True, 
             width=width)
@@ -16,13 +31,39 @@ def small_font(text, colour, background_colour=TRANSPARENT, width=None):
 
 def font(text, colour, background_colour, size = DEFAULT_FONT_SIZE, bold=False,
         width=None):
+    """Return a surface of the text. The same text is rendered once and
+    the surface shared, so it must not be drawn on."""
+    key = (text, colour, background_colour, size, bold, width)
+    _mutex.acquire()
+    try:
+        try:
+            text_surface = _texts.pop(key)
+        except KeyError:
+            text_surface = _render(*key)
+            if len(_texts) >= TEXT_CACHE:
+                _texts.popitem(last=False)
+        _texts[key] = text_surface
+        return text_surface
+    finally:
+        _mutex.release()
+
+def _font(size, bold):
+    """Return the font object of size, loaded once. Called holding the
+    mutex."""
+    try:
+        return _fonts[(size, bold)]
+    except KeyError:
+        font_object = pygame.font.Font('SUPERHEL.ttf', size)
+        font_object.set_bold(bold)
+        _fonts[(size, bold)] = font_object
+        return font_object
+
+def _render(text, colour, background_colour, size, bold, width):
     if width:
         raw_lines = textwrap.wrap(text, width)
     else:
         raw_lines = text.split('\n') 
-    font_object = pygame.font.Font('SUPERHEL.ttf', size)
-    font_object.set_bold(bold)
-    render = font_object.render
+    render = _font(size, bold).render
     rendered_lines = []
     max_height, max_width = 0, 0
     for line in raw_lines:
@@ -1,11 +1,16 @@
 """A controller module to keep game state,
 and maintain callbacks."""
+import weakref
 from collections import defaultdict
 
 from observer import Observer
 from powersystem import PowerSystem
 
-import random
+import threading
+import time
+
+from tracing import Tracer
+from wind import WindField
 
 def curry(fn, arg):
     """Return a new function that calls function 'fn' always with 
@@ -14,24 +19,79 @@ def curry(fn, arg):
         return fn(arg, *args, **kws)
     return newfn
 
+def _key(fn):
+    """Return the key fn is registered under. A bound method is keyed
+    by its object and function, as a new method object is made each 
+    time it is looked up."""
+    try:
+        obj, func = fn.im_self, fn.im_func
+    except AttributeError:
+        return fn
+    if obj is None:
+        # an unbound method.
+        return fn
+    return id(obj), func
+
+class _WeakMethod(object):
+    """A bound method that does not keep its object alive.
+    collected - called with no arguments once the object is gone."""
+    def __init__(self, method, collected):
+        self._obj = weakref.ref(method.im_self, lambda ref: collected())
+        self._func = method.im_func
+
+    def __call__(self, *args):
+        obj = self._obj()
+        if obj is not None:
+            return self._func(obj, *args)
+
 class Dispatch(object):
     """A callable class that can handle events. I.e handle
-    people registering for events and callbacks notifying of events."""
-    _dispatch = defaultdict(list)
+    people registering for events and callbacks notifying of events.
+
+    The listeners are indexed by event name, then by listener. A 
+    listener registers once per name however many times it registers,
+    and sending an event only visits the listeners of that name. A 
+    listener that is a bound method is dropped once its object is 
+    garbage collected."""
+    # event name -> listener key -> listener, shared by all Dispatches.
+    _dispatch = {}
     def __init__(self):
         pass
 
     def __call__(self, name, *args):
         """Send the arguments to all listeners that have registered for
         events with name 'name'."""
-        listeners = self._dispatch[name]
+        try:
+            listeners = self._dispatch[name].values()
+        except KeyError:
+            return
         for listener in listeners:
             listener(*args)
 
     def register(self, name, fn):
         """Register for events with name 'name', and provide a function
         that can accept any number of arguments."""
-        self._dispatch[name] += [fn]
+        key = _key(fn)
+        topic = self._dispatch.setdefault(name, {})
+        if key in topic:
+            return
+        if isinstance(key, tuple):
+            # drop the listener when its object goes.
+            fn = _WeakMethod(fn, curry(curry(self._remove, name), key))
+        topic[key] = fn
+
+    def unregister(self, name, fn):
+        """Remove fn's registration for name."""
+        self._remove(name, _key(fn))
+
+    def _remove(self, name, key):
+        try:
+            topic = self._dispatch[name]
+            del(topic[key])
+        except KeyError:
+            return
+        if not topic:
+            self._dispatch.pop(name, None)
 
     def deregister(self, name):
         """remove the registration for name."""
@@ -42,7 +102,11 @@ class Dispatch(object):
 
     def listeners(self, name):
         """return a list of all the listeners for a particular name."""
-        return self._dispatch.get(name, [])
+        return self._dispatch.get(name, {}).values()
+
+    def registered(self, name):
+        """Return True if anything is registered for name."""
+        return name in self._dispatch
 
     def names(self):
         """Return a list of all the registered events."""
@@ -80,22 +144,43 @@ class GameState(object):
     def _solver_callback(self, records):
         """Called when the solver reaches a solution with the updated
         record list in tuples."""
-        el = ElemRegister()
+        started = time.time()
         for record in records:
-            self._dispatch(record[1], record)
+            self._dispatch(record[3], record)
 
-            # notify that this element has been updated.
-            el.poke(record[1])
+        # the elements that have dropped out of the solution.
+        el = ElemRegister()
+        for elemid in el.solved([record[3] for record in records]):
+            self._dispatch(elemid, None)
 
         self._records = records
+
+        tracer = Tracer()
+        if tracer.enabled and tracer.current():
+            tracer.span('gamestate.dispatch', started)
+            # the tiles are drawn by the game loop.
+            tracer.redraw_due(tracer.current())
     
     def register(self, name, fn):
+        """Register fn for events with name 'name', or for the records of
+        an element given by id or name."""
+        elemid = self.ps.ids.lookup(name)
+        if elemid is not None:
+            name = elemid
         self._dispatch.register(name, fn)
 
+    def name(self, elemid):
+        """Return the current name of the element."""
+        return self.ps.ids.name(elemid)
+
     def add_tile(self, tiletype, info, connections=None):
+        """Add an element for the tile to the power system, connections
+        are element ids or names. Returns the id of the new element."""
         if info is None:
             raise DefaultTile("Cannot register a default tile!")
 
+        started = time.time()
+
         self._nameregister[tiletype] += 1
 
         # remove some of the cash level.
@@ -106,63 +191,65 @@ class GameState(object):
 
         # now register this tile with the solver.
         if tiletype is 'line':
-            self.ps.add_line(name, connections=connections)
+            elemid = self.ps.add_line(name, connections=connections)
         else:
-            self.ps.add_bus(name, connections=connections, **info)
+            elemid = self.ps.add_bus(name, connections=connections, **info)
 
         # for some added fun, reg windfarms for gen changes.
         if 'wind' in tiletype.lower():
             wc = WindChange()
-            wc.register(name, info['pgen'])
+            wc.register(elemid, info['pgen'])
 
         # register this element with the ElemRegister.
         el = ElemRegister()
-        el.register(name)
-        return name
+        el.register(elemid)
+
+        tracer = Tracer()
+        if tracer.enabled:
+            tracer.span('gamestate.add_tile', started)
+        return elemid
 
     def edit_tile(self, name, changes):
         """update the element attributes with the ones in the changes
         dictionary."""
         self.ps.edit_elem(name, changes)
 
-    def remove_tile(self, name):
-        """remove the tile of name 'name' from the powersystem."""
-        if name in self._dispatch.names():
-            self.ps.decommission_element(name)
+    def edit_tiles(self, edits):
+        """update many elements at once, edits is a dictionary of element
+        to changes dictionary."""
+        self.ps.edit_elems(edits)
+
+    def remove_tile(self, elem):
+        """remove the tile's element (id or name) from the powersystem."""
+        elemid = self.ps.ids.lookup(elem)
+        if self._dispatch.registered(elemid):
+            self.ps.decommission_element(elemid)
             self.cash += 25
 
+            # nothing more will be sent for the element.
+            self._dispatch.deregister(elemid)
+            self._dispatch.deregister(('rename', elemid))
+
             wc = WindChange()
-            wc.remove(name)
+            wc.remove(elemid)
             er = ElemRegister()
-            er.remove(name)
+            er.remove(elemid)
 
-    def rename(self, from_name, to_name):
-        """rename an element from name to name. 
+    def rename(self, elem, to_name):
+        """rename an element (id or name) to name. 
         Does not rename if an existing element already has name."""
-        # if the name is already registered, don't proceed.
-        if to_name in self._dispatch.names():
+        # if the name is already in use, don't proceed.
+        if self.ps.ids.lookup(to_name) is not None:
+            return
+        elemid = self.ps.rename_element(elem, to_name)
+        if elemid is None:
             return
-        self.ps.rename_element(from_name, to_name)
-
-        # take care of registration.
-        listeners = self._dispatch.listeners(from_name)
-        for listener in listeners:
-            # also notify these listeners of a change.
-            self._dispatch.register(to_name, listener)
-
-        # anyone that has registered to be notified of name changes.
-        self._dispatch('rename', (from_name, to_name))
-        self._dispatch.deregister(from_name)
-
-        # now update the wind change and element track objects.
-        wc = WindChange()
-        size = wc.remove(from_name)
-        if size:
-            wc.register(to_name, size)
 
-        er = ElemRegister()
-        status = er.remove(from_name)
-        er.register(to_name, status)
+        # listeners, wind farms and element status are all kept by id,
+        #  only anyone showing the name needs to know, either of this
+        #  element or of any rename.
+        self._dispatch(('rename', elemid), (elemid, to_name))
+        self._dispatch('rename', (elemid, to_name))
 
     def tick(self):
         """Called on each iteration through the game loop.
@@ -172,15 +259,14 @@ class GameState(object):
         # access cash amount forces a callback on initial access.
         self.cash
 
-        # a scheme to determine disconnected nodes.
-        el = ElemRegister()
-        offline = el.status()
-
-        for element in offline:
-            self._dispatch(element, None)
+        # a failed solve leaves every element offline, the elements
+        #  dropped by a solution are sent by the solver callback.
+        if not self.ps.solution:
+            el = ElemRegister()
+            for elemid in el.failed():
+                self._dispatch(elemid, None)
 
         # a scheme to change windfarm output randomly.
-        #  in practice I would like output to change 1 every 20 seconds.
         wc = WindChange()
         wc.shuffle()
 
@@ -188,73 +274,85 @@ class WindChange(object):
     """Allows the wind to change and set the wind farm output
     randomly. Call periodically."""
     _shared_state = {}
-    _windfarms = {}
+    # seconds between changes in the wind.
+    period = 1.0
+    _field = WindField(period=period)
+    _last = None
     def __init__(self):
         self.__dict__ = self._shared_state
 
     def register(self, name, size):
-        self._windfarms[name] = size
+        self._field.add(name, size)
 
     def remove(self, name):
-        try:
-            size = self._windfarms[name]
-            del(self._windfarms[name])
-            return size
-        except KeyError:
-            pass
-
-    def shuffle(self):
-        """Calculate a probability of wind change for each windfarm.
-        If wind changes, calculate the new output level."""
-        for farm, size in self._windfarms.items():
-            windchange = random.choice(xrange(20)) 
-            if windchange:
-                continue
-            # select a random value from weibull distribution
-            #  with lambda = 0.3 and k = 1.
-            output = random.weibullvariate(0.3, 1) * size
+        return self._field.remove(name)
+
+    def shuffle(self, now=None):
+        """Advance the wind at every windfarm once a period has passed,
+        the farms whose output changed are edited together."""
+        if now is None:
+            now = time.time()
+        if self._last is not None and now - self._last < self.period:
+            return
+        self._last = now
 
+        changes = self._field.step()
+        if changes:
             gs = GameState()
-            gs.edit_tile(farm, dict(pgen=output))
-
-            # only change a single windfarm at a time.
-            break
+            gs.edit_tiles(dict((farm, dict(pgen=output)) 
+                                for farm, output in changes.items()))
 
 class ElemRegister(object):
-    """Keep a track of all online elements."""
+    """Keep a track of which elements are online, by id. 
+    An element is online while it is in the latest solution, only the
+    elements going offline are reported, so a steady network costs
+    nothing per element."""
     _shared_state = {}
-    _elements = {}
+    _elements = set()
+    _online = set()
+    # registered elements whose status has not been reported.
+    _unknown = set()
+    _mutex = threading.Lock()
     def __init__(self):
         self.__dict__ = self._shared_state
 
-    def register(self, name, status=False):
-        self._elements[name] = status
+    def register(self, name):
+        self._mutex.acquire()
+        try:
+            self._elements.add(name)
+            self._unknown.add(name)
+        finally:
+            self._mutex.release()
 
     def remove(self, name):
+        self._mutex.acquire()
         try:
-            status = self._elements[name]
-            del(self._elements[name])
-            return status
-        except KeyError:
-            pass
-
-    def poke(self, name):
-        """the passed argument was updated, 
-        set it's status to online."""
+            self._elements.discard(name)
+            self._online.discard(name)
+            self._unknown.discard(name)
+        finally:
+            self._mutex.release()
+
+    def online(self, name):
+        return name in self._online
+
+    def solved(self, names):
+        """A solution was reached for the elements names, returns the
+        elements that have gone offline since the last solution."""
+        self._mutex.acquire()
         try:
-            self._elements[name] = True
-        except KeyError:
-            pass
-        
-    def status(self):
-        """returns all of the elements that have not set
-        their status to online since the last check."""
-        offline = [name for name in self._elements if 
-                            self._elements[name] == False]
-        # reset the list.
-        for name in self._elements:
-            self._elements[name] = False
-
+            energized = self._elements.intersection(names)
+            offline = (self._online | self._unknown) - energized
+            self._online = energized
+            self._unknown = set()
+        finally:
+            self._mutex.release()
         return offline
 
-
+    def failed(self):
+        """No solution could be reached, returns the elements that have 
+        gone offline."""
+        if not self._online and not self._unknown:
+            # already reported.
+            return set()
+        return self.solved(())
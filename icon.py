@@ -3,6 +3,7 @@ from pygame.locals import *
 
 from sprite import *
 from button import *
+from assets import Assets
 
 __all__ = ['Icon']
 
@@ -49,7 +50,7 @@ myicon.show() - defined by Button
         self.rightaction = rightaction
 
     def set_sound(self, sound):
-        self.sound = pygame.mixer.Sound(sound)
+        self.sound = Assets().sound(sound)
 
     def play_sound(self):
         if self.sound != None:
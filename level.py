@@ -16,6 +16,12 @@ import levelevents as levent
 class Level(object):
     name = "Default Level"
     description = """Default Description."""
+    # the number of tiles in x and y.
+    mapsize = (20, 12)
+    # the images and sounds of the game, loaded while the level is 
+    #  being chosen.
+    assets = ['grass.png', 'water.png', 'coal.png', 'line.png', 'load.png',
+              'syncon.png', 'windfarm.png', 'sell.png', 'blip.wav']
     events = []
     conditions = []
     _count = count()
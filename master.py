@@ -3,6 +3,8 @@ Intended to be the top level for
 PowerSim. This is the top level parent.
 """
 import sys
+import os
+import atexit
 import pygame
 import threading
 import time
@@ -15,14 +17,24 @@ from pygame.locals import *
 from constants import *
 
 import controller
+from tracing import Tracer
 
 class Master(object):
     """
     Top level parent object.
     Maintains the pygame program.
+
+    Each child runs its loop in a thread of its own, or when scheduled
+    every child's loop is run in turn from the main loop, then every
+    child is redrawn, all on the one thread and at the master's frame 
+    rate.
     """
-    def __init__(self, size=None):
-        """Initialise the PowerSim game."""
+    def __init__(self, size=None, depth=0, scheduled=False):
+        """Initialise the PowerSim game.
+        depth - bits per pixel of the screen, by default the best one.
+        scheduled - run the children from the main loop rather than in
+                threads of their own. The controller is shared, it is
+                made synchronous for every sender."""
         # enable a large buffer to stop crackle in the sound.
         pygame.mixer.pre_init(44100, -16, 2, 1024 * 6)
         pygame.init()
@@ -32,7 +44,7 @@ class Master(object):
         self.size = size or SCREEN_SIZE
 
         # initialise the screen and background.
-        self.window = pygame.display.set_mode(self.size)
+        self.window = pygame.display.set_mode(self.size, 0, depth)
         self.screen = pygame.display.get_surface()
         # background is used to 'clear' the screen between frames.
         self.background = pygame.Surface(self.size).convert()
@@ -52,6 +64,11 @@ class Master(object):
         # create the controller.
         self.c = controller.Controller()
 
+        self.scheduled = scheduled
+        if scheduled:
+            # events are handled within the frame they are sent in.
+            self.c.synchronous = True
+
         self.c.register('exit', self.stop)
         self.c.register('pause', self.pause_child)
 
@@ -65,6 +82,9 @@ class Master(object):
 
             self.events()
 
+            if self.scheduled:
+                self.step()
+
             self.redraw()
 
     def prune(self):
@@ -72,16 +92,21 @@ class Master(object):
         for child in reversed(self.children):
             if not child.running.isSet():
                 self.children.remove(child)
-                try:
-                    self.listening.remove(child)
-                except ValueError:
-                    pass
+                self.listening = [(other, types) 
+                                    for other, types in self.listening
+                                    if other is not child]
                 # now fill over their empty space with background.
                 topleft = child.topleft
                 area = pygame.Rect(topleft, child.size)
                 self.screen.blit(self.background, topleft, area)
                 pygame.display.update([area])
 
+                # the children under it are published whole again.
+                for other in self.children:
+                    if area.colliderect(pygame.Rect(other.topleft, 
+                                                    other.size)):
+                        other.invalid = True
+
     def events(self):
         """tend to the event queue, pass events to global controller."""
         for event in pygame.event.get():
@@ -96,6 +121,16 @@ class Master(object):
                 elif event.type in types:
                     child.events.put(event)
 
+    def step(self):
+        """Run the loop of each of the running children once."""
+        # children may start or stop others as they run.
+        for child in list(self.children):
+            if not child.pause.isSet():
+                # suspended children don't run.
+                continue
+            if child.running.isSet():
+                child.step()
+
     def redraw(self):
         """check each of the children to see if they have a surface to
         publish and publish it."""
@@ -112,16 +147,28 @@ class Master(object):
             except NoUpdate:
                 continue
 
-            topleft = child.topleft
-            area = surface.get_rect(topleft=topleft)
+            dirty.extend(self.publish(child, surface))
+
+        pygame.display.update(dirty)
+
+    def publish(self, child, surface):
+        """Draw the parts of the child's surface that changed onto the 
+        screen, returns the areas of the screen drawn."""
+        dirty = []
+        topleft = child.topleft
+        rects = child.dirty_rects
+        if rects is None or child.invalid:
+            rects = [surface.get_rect()]
+            child.invalid = False
+        for rect in rects:
+            area = rect.move(topleft)
             # draw over screen with background first.
-            self.screen.blit(self.background, topleft, area)
-            self.screen.blit(surface, topleft)
+            self.screen.blit(self.background, area, area)
+            self.screen.blit(surface, area, rect)
 
             # create a kind of 'dirty' list to redraw.
             dirty.append(area)
-
-        pygame.display.update(dirty)
+        return dirty
 
     def stop(self, event):
         # exit the main loop.
@@ -129,7 +176,8 @@ class Master(object):
 
         for thread in self.children:
             thread.stop()
-            thread.join()
+            if thread.isAlive():
+                thread.join()
 
 
     def pause_child(self, pause):
@@ -142,9 +190,12 @@ class Master(object):
 
     def add_child(self, Child, *args, **kws):
         newchild = Child(parent=self, controller=self.c, *args, **kws)
-        newchild.setDaemon(True)
         # child begins in a paused state.
-        newchild.start()
+        if self.scheduled:
+            newchild.schedule()
+        else:
+            newchild.setDaemon(True)
+            newchild.start()
 
         self.children.append(newchild)
         return newchild
@@ -191,6 +242,12 @@ class FakeSemaphore(object):
 
 class BaseChild(threading.Thread):
     """Defines an empty Null child."""
+    # the rectangles of the surface changed by the last redraw, None
+    #  if all of it may have changed.
+    dirty_rects = None
+    # set when the screen under the child was drawn over by another, all
+    #  of the surface is published with the next redraw.
+    invalid = True
     def __init__(self, parent, controller, *args, **kws):
         threading.Thread.__init__(self)
         self.running = threading.Event()
@@ -227,20 +284,29 @@ class BaseChild(threading.Thread):
             if not self.running.isSet():
                 break
 
-            # get all the events.
-            events = []
-            while not self.events.empty():
-                events.append(self.events.get())
-
-            # executed once per loop.
-            self.looplock.acquire()
-            try:
-                self._loop(events)
-            finally:
-                self.drawlock.release()
+            self.step()
 
             self.clock.tick(FPS)
 
+    def schedule(self):
+        """Run from the parent's main loop, which calls step once a 
+        frame, instead of in a thread."""
+        self.running.set()
+
+    def step(self):
+        """Run the loop once, with the events received since the last."""
+        # get all the events.
+        events = []
+        while not self.events.empty():
+            events.append(self.events.get())
+
+        # executed once per loop.
+        self.looplock.acquire()
+        try:
+            self._loop(events)
+        finally:
+            self.drawlock.release()
+
     def redraw(self):
         self.drawlock.acquire()
         try:
@@ -253,8 +319,9 @@ class BaseChild(threading.Thread):
         raise NoUpdate("BaseChild does not redraw!")
 
     def _loop(self, events):
-        time.sleep(1.0/FPS)
-        time.sleep(1.0/FPS)
+        """Called once per frame with the events received, the frame 
+        rate is kept by the thread's clock or the master."""
+        pass
 
     def stop(self):
         """Override this function to hook into the
@@ -269,6 +336,8 @@ class BaseChild(threading.Thread):
         self.pause.clear()
 
     def resume(self):
+        # the screen may have been drawn over while suspended.
+        self.invalid = True
         self.pause.set()
 
     def bind(self, name, fn, obj):
@@ -444,11 +513,18 @@ class Menu(BaseChild):
         return self.surface
 
 if __name__ == '__main__':
+    # POWERSIM_TRACE=trace.json records a trace of the player's actions.
+    tracefile = os.environ.get('POWERSIM_TRACE')
+    if tracefile:
+        Tracer().start(tracefile)
+        atexit.register(Tracer().stop)
+
     c = controller.Controller()
     c.setDaemon(True)
     c.start()
 
-    m = Master()
+    # POWERSIM_SCHEDULED=1 runs the menus and game on the main thread.
+    m = Master(scheduled=bool(os.environ.get('POWERSIM_SCHEDULED')))
     # start a child.
     kid3 = m.add_child(Menu)
     kid3.resume()
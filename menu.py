@@ -9,6 +9,7 @@ from master import BaseChild
 from menuitem import MenuItem
 from unique import Unique
 from font import small_font
+from assets import Assets
 
 class LevelMenu(BaseChild):
     def init(self, levels, prev=None, **kws):
@@ -103,6 +104,9 @@ class LevelMenu(BaseChild):
         # remove any other description box.
         self.kill_desc()
 
+        # load the level's images and sounds while the player reads.
+        Assets().preload(level.assets)
+
         # get a unique name to register to close the description box.
         unique = Unique()
         close_name = unique.generate(level.name)
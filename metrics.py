@@ -0,0 +1,199 @@
+"""
+Counters and histograms for watching the power system at run time.
+
+Histograms are HDR style: a value is counted in a bucket whose width
+is a fixed fraction of the value, so recording is a couple of integer
+operations and the percentiles are accurate to within 1/64 (about 1.5%)
+over the whole range from a microsecond to hours.
+
+Each metric is written to by one thread only, recording takes no lock.
+A snapshot may be taken from any thread, it is not atomic across
+metrics.
+
+    metrics = Metrics()
+    solves = metrics.counter('solves')
+    solver = metrics.histogram('solve.solver')
+
+    started = time.time()
+    ...
+    solver.record(time.time() - started)
+    solves.inc()
+
+    metrics.snapshot()
+    metrics.start_dump('metrics.log', period=10)
+"""
+import json
+import threading
+import time
+
+__all__ = ['Metrics', 'Counter', 'Histogram']
+
+# values are counted in whole units of the resolution, i.e microseconds.
+RESOLUTION = 1e-6
+
+# 2**SUB_BITS buckets for each power of two, values below 2**SUB_BITS
+#  units are counted exactly.
+SUB_BITS = 7
+HALF = 1 << (SUB_BITS - 1)
+
+# the percentiles reported in a snapshot.
+PERCENTILES = (50, 90, 99, 99.9)
+
+class Counter(object):
+    """A count of events."""
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, count=1):
+        self.value += count
+
+    def snapshot(self):
+        return self.value
+
+class Histogram(object):
+    """A distribution of values (by default seconds)."""
+    def __init__(self, resolution=RESOLUTION):
+        self.resolution = resolution
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (2 * HALF)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        """Count a value."""
+        units = int(value / self.resolution + 0.5)
+        if units < 0:
+            units = 0
+        shift = units.bit_length() - SUB_BITS
+        if shift < 0:
+            shift = 0
+        index = shift * HALF + (units >> shift)
+
+        counts = self.counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += 1
+
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def _value(self, index):
+        """Return the middle of the range of values counted in index."""
+        if index < 2 * HALF:
+            return index * self.resolution
+        shift = index // HALF - 1
+        low = (index - shift * HALF) << shift
+        return (low + (1 << shift) / 2.0) * self.resolution
+
+    def percentile(self, percent):
+        """Return the value below which percent of the values fall."""
+        if not self.count:
+            return None
+        rank = max(int(round(self.count * percent / 100.0)), 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                # keep within the exactly known extremes.
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def mean(self):
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def snapshot(self):
+        """Return a summary of the distribution as a dict."""
+        summary = dict(count=self.count, mean=self.mean(),
+                        min=self.min, max=self.max)
+        for percent in PERCENTILES:
+            summary['p%s' % percent] = self.percentile(percent)
+        return summary
+
+class Metrics(object):
+    """A registry of named metrics."""
+    def __init__(self):
+        self._metrics = {}
+        # name -> callable, read when a snapshot is taken.
+        self._gauges = {}
+        self._mutex = threading.Lock()
+        self._dumper = None
+
+    def _get(self, name, kind):
+        try:
+            return self._metrics[name]
+        except KeyError:
+            self._mutex.acquire()
+            try:
+                return self._metrics.setdefault(name, kind())
+            finally:
+                self._mutex.release()
+
+    def counter(self, name):
+        """Return the counter called name, created on first use."""
+        return self._get(name, Counter)
+
+    def histogram(self, name):
+        """Return the histogram called name, created on first use."""
+        return self._get(name, Histogram)
+
+    def gauge(self, name, fn):
+        """Report the value returned by fn as name in snapshots."""
+        self._gauges[name] = fn
+
+    def snapshot(self):
+        """Return a dict of metric name to its current value."""
+        snap = dict((name, metric.snapshot())
+                        for name, metric in self._metrics.items())
+        for name, fn in self._gauges.items():
+            snap[name] = fn()
+        return snap
+
+    def dump(self, fileobj):
+        """Write a snapshot to fileobj as a line of JSON."""
+        snap = self.snapshot()
+        snap['time'] = time.time()
+        fileobj.write(json.dumps(snap, sort_keys=True) + '\n')
+        fileobj.flush()
+
+    def start_dump(self, path, period=10.0):
+        """Append a snapshot to the file at path every period seconds."""
+        self.stop_dump()
+        self._dumper = _Dumper(self, path, period)
+        self._dumper.start()
+
+    def stop_dump(self):
+        if self._dumper is not None:
+            self._dumper.stop()
+            self._dumper = None
+
+class _Dumper(threading.Thread):
+    def __init__(self, metrics, path, period):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        self._metrics = metrics
+        self._path = path
+        self._period = period
+        self._stopped = threading.Event()
+
+    def run(self):
+        fileobj = open(self._path, 'a')
+        try:
+            while not self._stopped.isSet():
+                self._stopped.wait(self._period)
+                self._metrics.dump(fileobj)
+        finally:
+            fileobj.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
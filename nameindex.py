@@ -0,0 +1,85 @@
+"""
+Interned integer ids for element names.
+
+Elements are identified by an integer id everywhere inside the power
+system and game state, names are only kept for display and to look up
+an id. Renaming an element changes its entry here and nothing else.
+
+Ids are never reused, a name that is released and interned again is
+a new element.
+"""
+import threading
+
+__all__ = ['NameIndex']
+
+class NameIndex(object):
+    """A two way map between element names and integer ids.
+
+    Methods accept an element reference, either its id or its name."""
+    def __init__(self):
+        # name -> id and id -> name.
+        self._ids = {}
+        self._names = {}
+        self._last = 0
+
+        # names are interned by whoever posts to the power system.
+        self._mutex = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    def intern(self, ref):
+        """Return the id of ref, a name not seen before is given a new id."""
+        if isinstance(ref, (int, long)):
+            return ref
+        self._mutex.acquire()
+        try:
+            try:
+                return self._ids[ref]
+            except KeyError:
+                self._last += 1
+                elemid = self._ids[ref] = self._last
+                self._names[elemid] = ref
+                return elemid
+        finally:
+            self._mutex.release()
+
+    def lookup(self, ref):
+        """Return the id of ref, or None if there is no such element."""
+        if isinstance(ref, (int, long)):
+            if ref in self._names:
+                return ref
+            return None
+        return self._ids.get(ref)
+
+    def name(self, ref):
+        """Return the name of ref, or None if there is no such element."""
+        return self._names.get(self.lookup(ref))
+
+    def rename(self, ref, to_name):
+        """Give the element ref a new name. Return its id, or None if
+        there is no such element or to_name is already in use."""
+        self._mutex.acquire()
+        try:
+            elemid = self.lookup(ref)
+            if elemid is None or to_name in self._ids:
+                return None
+            del(self._ids[self._names[elemid]])
+            self._ids[to_name] = elemid
+            self._names[elemid] = to_name
+            return elemid
+        finally:
+            self._mutex.release()
+
+    def release(self, ref):
+        """Forget the element ref, return its id or None if there is no
+        such element."""
+        self._mutex.acquire()
+        try:
+            elemid = self.lookup(ref)
+            if elemid is None:
+                return None
+            del(self._ids[self._names.pop(elemid)])
+            return elemid
+        finally:
+            self._mutex.release()
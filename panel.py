@@ -4,14 +4,15 @@ from pygame.locals import *
 from constants import *
 from icon import *
 from font import *
+from render import DirtyGroup, draw_children
 
 __all__ = ['Panel']
 
-class Panel(pygame.sprite.Sprite):
+class Panel(pygame.sprite.DirtySprite):
     def __init__(self, containers, pos = PANEL_POS, size = PANEL_SIZE):
-        pygame.sprite.Sprite.__init__(self, containers)
+        pygame.sprite.DirtySprite.__init__(self, containers)
 
-        self.child_groups = pygame.sprite.RenderUpdates()
+        self.child_groups = DirtyGroup()
         self.buttons = pygame.sprite.Group()
         self.panels = pygame.sprite.Group()
 
@@ -42,12 +43,19 @@ class Panel(pygame.sprite.Sprite):
     def make_heading(self, pos, text='powersim.'):
         self._heading = large_font(text, HEADING_COL, PANEL_BACK)
         self.panel.blit(self._heading, pos)
-        self.image.blit(self.panel, (0,0))
+        self.__repaint()
 
     def make_text(self, pos, text = 'default'):
         paragraph = small_font(text, DULL_WHITE, PANEL_BACK)
         self.panel.blit(paragraph, pos)
+        self.__repaint()
+
+    def __repaint(self):
+        """the panel background changed, draw it and then every child
+        back over it."""
         self.image.blit(self.panel, (0,0))
+        self.child_groups.repaint()
+        self.dirty = 1
 
     def clear_yrange(self, (topleft, size)):
         """clears a section of background the size of rect."""
@@ -71,6 +79,7 @@ class Panel(pygame.sprite.Sprite):
     def set_pos(self, pos):
         self.pos = pos
         self.rect.topleft = pos
+        self.dirty = 1
 
     def add_icon(self, pos, icon):
         self.__add_object(pos, icon, self.buttons)
@@ -103,9 +112,8 @@ class Panel(pygame.sprite.Sprite):
             if not panel.alive():
                 panel.close()
 
-        self.child_groups.clear(self.image, self.panel)
         self.child_groups.update(mouse)
-        self.child_groups.draw(self.image)
+        draw_children(self, self.child_groups, self.panel)
         self.showing_dynamic = False
 
     def __contains__(self, pos):
@@ -7,9 +7,11 @@ from button import *
 
 __all__ = ['Popup']
 
-class Popup(pygame.sprite.Sprite):
+class Popup(pygame.sprite.DirtySprite):
+    # drawn above text entries.
+    _layer = 2
     def __init__(self, pos, heading, text, popup_container, button_container):
-        pygame.sprite.Sprite.__init__(self, popup_container)
+        pygame.sprite.DirtySprite.__init__(self, popup_container)
 
         self.container = popup_container
         self.pos = pos
@@ -3,6 +3,7 @@ import pygame
 from pygame.locals import *
 import sys
 import Queue
+import time
 
 from constants import *
 from button import *
@@ -17,6 +18,8 @@ from tileobject import *
 from tilemesh import *
 
 from gamestate import GameState
+from render import DirtyGroup
+from tracing import Tracer
 from textgrab import TextGrab, NoTextBox
 
 from master import BaseChild
@@ -37,7 +40,9 @@ class Game(BaseChild):
         self.background.fill(GREY)
         self.screen.blit(self.background, (0,0))
 
-        self.all = pygame.sprite.RenderUpdates()
+        # everything on screen, drawn in layers: the mesh and panel,
+        #  then text entries, popups and buttons.
+        self.all = DirtyGroup()
         self.buttons = pygame.sprite.Group()
         self.sprites = pygame.sprite.Group()
         self.popups = pygame.sprite.Group()
@@ -76,7 +81,8 @@ class Game(BaseChild):
                     (0,1): (Watertile, ()),
                     (3,0): (Watertile, ()),
                 }
-        self.mesh = Mesh([self.all], members, (20,12), pos = (30,30))
+        self.mesh = Mesh([self.all], members, level.mapsize, pos=MESH_POS,
+                            view=MESH_VIEW)
         self.mesh.set_panel(self.panel)
         self.mesh.show(self.all)
 
@@ -104,14 +110,27 @@ class Game(BaseChild):
         self.level.tick(self)
 
     def _redraw(self):
-        self.screen = self.background.copy()
+        tracer = Tracer()
+        if tracer.enabled:
+            started = time.time()
+            self._draw()
+            # the actions whose results are now on screen.
+            traces = tracer.take_redraw()
+            if traces:
+                tracer.span('game.redraw', started, traces, flow='f')
+            return self.screen
+        return self._draw()
+
+    def _draw(self):
+        self._update()
+        return self._paint()
+
+    def _update(self):
         self.all.update((pygame.mouse.get_pos(), clicktrack()), 'name' )
-        dirty = self.all.draw(self.screen)
 
-        # allow the text entry boxes and buttons to be highest layer.
-        self.textentry.draw(self.screen)
-        self.popups.draw(self.screen)
-        self.buttons.draw(self.screen)
+    def _paint(self):
+        # only the sprites that changed are drawn, and passed on.
+        self.dirty_rects = self.all.draw(self.screen, self.background)
         return self.screen
 
     def make_popup(self, heading, txt):
@@ -125,7 +144,6 @@ class Game(BaseChild):
 
     def event(self, events):
         for event in events:
-            event = self.events.get()
             if event.type == QUIT:
                 self.quit()
             elif event.type == KEYDOWN or event.type == KEYUP:
@@ -164,15 +182,15 @@ class Game(BaseChild):
         elif event.key == K_u and event.type == KEYDOWN: #u: unpause musics
             pygame.mixer.music.unpause()
 
-        elif event.key == K_UP:
-            self.keystate[K_UP] = event.type == KEYDOWN 
+        elif event.key in self.keystate:
+            self.keystate[event.key] = event.type == KEYDOWN 
 
     def keyrun(self):
-        try:
-            if self.keystate[K_UP]:
-                self.pos = (self.pos[0], (self.pos[1] - STEP) % SCREEN_SIZE[1])
-        except KeyError:
-            pass
+        # the arrow keys scroll the map.
+        dx = (self.keystate[K_RIGHT] - self.keystate[K_LEFT]) * SCROLL_STEP
+        dy = (self.keystate[K_DOWN] - self.keystate[K_UP]) * SCROLL_STEP
+        if dx or dy:
+            self.mesh.scroll((dx, dy))
 
     def mouseevent(self, event):
         if event.type == MOUSEMOTION:
@@ -192,6 +210,10 @@ class Game(BaseChild):
                 self.all.update((pygame.mouse.get_pos(), (1,0,0)))
             elif event.button == 3:
                 self.all.update((pygame.mouse.get_pos(), (0,0,1)))
+            elif event.button in (4, 5) and event.pos in self.mesh:
+                # the wheel zooms the map about the mouse.
+                factor = 1.25 if event.button == 4 else 0.8
+                self.mesh.zoom_by(factor, about=event.pos)
             self.pos = event.pos
             for sprite in self.textentry:
                 if not (event.pos in sprite):
@@ -4,20 +4,36 @@ import time
 from collections import defaultdict
 
 # exceptions.
-from elem import ElemError, AlreadySearched
+from elem import ElemError
 # Element classes.
 from elem import SwingHolder, BusElem, LineElem
 # Solver Bridge.
-from solverbridge import SolverBridge, NoSolution
+from solverbridge import SolverBridge, NoSolution, SolveSuperseded
 # get the solver.
 from solver import loadflow
 
 from command import _OperationCreateLine, _OperationCreateBus
 from command import _OperationDecommission, _OperationRenameElement
 from command import _OperationSetSolutionCallback, _OperationEditElement
+from command import _OperationEditElements
+from commandqueue import CommandQueue
+from nameindex import NameIndex
+from scheduler import SolveScheduler
+from metrics import Metrics
+from tracing import Tracer
 
 __all__ = ['PowerSystem']
 
+# default number of commands allowed to wait for the solver before
+#  posting a command blocks the caller.
+QUEUE_SIZE = 256
+
+# a solve is abandoned for a newer network at most SUPERSEDE_LIMIT times
+#  in a row, and only in the first SUPERSEDE_SHARE of its expected time,
+#  past that it is cheaper to finish it than to start again.
+SUPERSEDE_LIMIT = 3
+SUPERSEDE_SHARE = 0.5
+
 class PowerSystemError(Exception):
     """Error in Power System Class."""
     pass
@@ -31,20 +47,56 @@ class PowerSystemError(Exception):
 class PowerSystem(threading.Thread):
     """An object to bridge the Mesh object - a graphical view, and the 
     strategy to calculate power flow."""
-    def __init__(self, bustype=BusElem, linetype=LineElem):
+    def __init__(self, bustype=BusElem, linetype=LineElem,
+                    queuesize=QUEUE_SIZE, block=True, scheduler=None,
+                    journal=None, metrics=None):
+        """queuesize - maximum number of waiting commands, 0 is unbounded.
+        block - if True posting to a full queue waits for the solver,
+                    otherwise Queue.Full is raised.
+        scheduler - decides when to solve, defaults to a SolveScheduler.
+        journal - a CommandJournal to record the posted commands in.
+        metrics - a Metrics registry, one is made if not given."""
         threading.Thread.__init__(self)
-        # a threadsafe queue for communication with Mesh.
-        self._queue = Queue.Queue(-1)
+        # a threadsafe queue for communication with Mesh, edits to the 
+        #  same element are coalesced while waiting.
+        self._queue = CommandQueue(maxsize=queuesize, block=block)
         # bus and line types can be set at startup.
         self.BusType = bustype
         self.LineType = linetype
 
+        # element names and their ids, elements are referred to by id
+        #  from here on in.
+        self.ids = NameIndex()
+
         # keep a map of attempted connections.
         self._attempted = defaultdict(list)
 
-        # active elements.
+        # active elements, by id.
         self._elems = {}
 
+        # paces the solves against the measured solve time.
+        self.scheduler = scheduler or SolveScheduler()
+
+        # records the commands for replay, may be set at any time.
+        self.journal = journal
+
+        # timings of each stage of the command and solve pipeline.
+        self.metrics = metrics = metrics or Metrics()
+        self._latency = metrics.histogram('command.latency')
+        self._operating = metrics.histogram('command.operate')
+        self._applied = metrics.histogram('command.applied')
+        self._callback = metrics.histogram('solve.callback')
+        self._commands = metrics.counter('commands')
+        self._solves = metrics.counter('solves')
+        self._superseded = metrics.counter('solves.superseded')
+        self._failed = metrics.counter('solves.failed')
+        metrics.gauge('queue.depth', self.queue_depth)
+        metrics.gauge('queue.coalesced', lambda: self._queue.coalesced)
+
+        # trace ids of the commands run since the last solve.
+        self._tracer = Tracer()
+        self._traces = set()
+
         # thread running.
         self._running = False
 
@@ -61,7 +113,8 @@ class PowerSystem(threading.Thread):
     def add_bus(self, name, pgen=0, qgen=0, connections=None, 
                             pload=0, qload=0, bustype=None):
         """Creates a new bus object in the network, use the bustype 
-        keyword to specify if type 1 (integer 1)."""
+        keyword to specify if type 1 (integer 1). Connections may be
+        given by element id or name. Returns the id of the new bus."""
         if bustype not in [None, 1, 2, 3]:
             raise PowerSystemError("Invalid Bus Type.")
         
@@ -80,45 +133,111 @@ class PowerSystem(threading.Thread):
             else:
                 bustype = 3
 
-        bus = _OperationCreateBus(name=name, pgen=pgen, qgen=qgen, pload=pload,
-                connections=connections, qload=qload, bustype=bustype)
+        new = self.ids.lookup(name) is None
+        elemid = self.ids.intern(name)
+        bus = _OperationCreateBus(elemid=elemid, name=name, pgen=pgen, 
+                qgen=qgen, pload=pload, qload=qload, bustype=bustype,
+                connections=self._intern_all(connections))
 
-        self._queue.put(bus)
+        self._post_create(bus, new)
+        return elemid
 
     def set_solution_callback(self, fn):
         """Enable other client classes to be notified of the changed
         netlist details after a solution."""
 
         cmd = _OperationSetSolutionCallback(fn=fn)
-        self._queue.put(cmd)
+        self._post(cmd)
         
     def add_line(self, name, connections=None):
-        """Creates a new line object in the network."""
-
-        line = _OperationCreateLine(name=name, connections=connections)
-
-        self._queue.put(line)
-
-    def rename_element(self, from_name, to_name):
-        """Rename an existing element from name to name."""
-        com = _OperationRenameElement(from_name=from_name, to_name=to_name)
-        self._queue.put(com)
+        """Creates a new line object in the network. Returns the id of 
+        the new line."""
+
+        new = self.ids.lookup(name) is None
+        elemid = self.ids.intern(name)
+        line = _OperationCreateLine(elemid=elemid, name=name, 
+                connections=self._intern_all(connections))
+
+        self._post_create(line, new)
+        return elemid
+
+    def rename_element(self, elem, to_name):
+        """Rename an existing element (id or name) to name. Returns the 
+        element id, or None if the element does not exist or to_name is
+        taken. The element keeps its id."""
+        elemid = self.ids.rename(elem, to_name)
+        if elemid is None:
+            return None
+        com = _OperationRenameElement(elemid=elemid, to_name=to_name)
+        self._post(com)
+        return elemid
         
-    def decommission_element(self, name):
-        """Remove the element from the Power System."""
-        com = _OperationDecommission(name=name)
-        self._queue.put(com)
+    def decommission_element(self, elem):
+        """Remove the element (id or name) from the Power System. Its 
+        name is free for reuse straight away."""
+        elemid = self.ids.release(elem)
+        if elemid is None:
+            return
+        com = _OperationDecommission(elemid=elemid)
+        self._post(com)
 
-    def edit_elem(self, name, changes):
-        """Edit the element given by name, with the 
+    def edit_elem(self, elem, changes):
+        """Edit the element given by id or name, with the 
         attribute changes in the changes dict."""
-        com = _OperationEditElement(name=name, changes=changes)
-        self._queue.put(com)
+        elemid = self.ids.lookup(elem)
+        if elemid is None:
+            return
+        com = _OperationEditElement(elemid=elemid, changes=changes)
+        self._post(com)
+
+    def edit_elems(self, edits):
+        """Edit many elements in one command, edits is a dict of element
+        (id or name) to attribute changes dict. The edits share a solve."""
+        byid = {}
+        for elem, changes in edits.items():
+            elemid = self.ids.lookup(elem)
+            if elemid is not None:
+                byid[elemid] = changes
+        if not byid:
+            return
+        com = _OperationEditElements(edits=byid)
+        self._post(com)
+
+    def _post(self, cmd):
+        """Queue the command, and journal it if recording."""
+        cmd.posted = time.time()
+        if self._tracer.enabled:
+            cmd.traces = self._tracer.current()
+        journal = self.journal
+        if journal is not None:
+            journal.record(cmd, self.ids)
+        self._queue.put(cmd)
 
-    def _edit_elem(self, name, changes):
+    def _post_create(self, cmd, new):
+        """Post the command creating an element, new if its name was
+        interned for it. If it can't be posted the name is released
+        again, the element will never exist."""
+        try:
+            self._post(cmd)
+        except:
+            if new:
+                self.ids.release(cmd.attributes['elemid'])
+            raise
+
+    def queue_depth(self):
+        """Return the number of commands waiting to be run."""
+        return self._queue.qsize()
+
+    def _intern_all(self, refs):
+        """Return the ids of a list of element ids or names."""
+        if refs is None:
+            return None
+        return [self.ids.intern(ref) for ref in refs]
+
+    def _edit_elem(self, elemid, changes):
         """Change the attributes on the element with the ones
         in the given change dictionary."""
-        elem = self._getname(name)
+        elem = self._getelem(elemid)
         for change, value in changes.items():
             try:
                 getattr(elem, change)
@@ -127,101 +246,183 @@ class PowerSystem(threading.Thread):
             else:
                 setattr(elem, change, value)
 
-    def _addelem(self, name, elem):
+    def _addelem(self, elemid, elem):
         """Add a mapped reference to the element."""
-        self._elems[name] = elem
+        self._elems[elemid] = elem
+
+    def _getelem(self, elemid):
+        """Return the object mapped by id."""
+        return self._elems.get(elemid)
 
     def _getname(self, name):
-        """Return the object mapped by name."""
-        return self._elems.get(name)
+        """Return the object currently named name."""
+        return self._elems.get(self.ids.lookup(name))
 
     def _addmap(self, mapfrom, mapto):
         """Each key will return a list of elems that failed to connect
         to this elem."""
         self._attempted[mapfrom] += [mapto]
 
-    def _getmap(self, name):
-        """Return a list of elems that failed to connect to name.
+    def _getmap(self, elemid):
+        """Return a list of elems that failed to connect to elemid.
         Also clears the list, assumes that object will be created 
         and it is not needed"""
-        lst = [self._getname(elemname) for elemname in self._attempted[name]]
-        del(self._attempted[name])
+        lst = [self._getelem(other) for other in self._attempted[elemid]]
+        del(self._attempted[elemid])
         return lst
 
-    def _decommission(self, name):
-        """Decommission the element given by name."""
+    def _decommission(self, elemid):
+        """Decommission the element given by id."""
         # remove the mapping of elems that failed to connect to this element.
         try:
-            del(self._attempted[name])
+            del(self._attempted[elemid])
         except KeyError:
             # no attempts to connect were made.
             pass
 
-        element = self._getname(name)
+        element = self._getelem(elemid)
         element.decommission()
 
-        del(self._elems[name])
+        del(self._elems[elemid])
 
-    def _rename(self, from_name, to_name):
-        """Rename the element, and remap all it's references to old name.
-        Do not execute if to_name exists."""
+    def _rename(self, elemid, to_name):
+        """Set the new name on the element, it is already mapped to its
+        new name in the name index."""
+        elem = self._getelem(elemid)
 
-        if self._getname(to_name) is not None:
-            # exit early if the new name already exists.
+        # exit early if no such element exists.
+        if elem is None:
             return
 
-        # get the original named object.
-        old_elem = self._getname(from_name)
-
-        # exit early if no such old element exists.
-        if old_elem is None:
-            return
-
-        # set the new name on the object itself.
-        old_elem.name = to_name
-
-        # remove the current mapping.
-        del(self._elems[from_name])
-
-        # add the new mapping.
-        self._addelem(to_name, old_elem)
+        elem.name = to_name
 
     def run(self):
         """The main power system loop. 
         Checks the queue for posted commands and runs them."""
 
-        solver = SolverBridge(loadflow)
+        solver = SolverBridge(loadflow, metrics=self.metrics)
         # set the swing bus, this will be automatically updated when
         # a real swingbus is set.
         solver.swingbus = SwingHolder()
 
+        scheduler = self.scheduler
+
+        # solves abandoned in a row.
+        superseded = 0
+
         self._running = True
         while self._running:
 
             try:
-                cmd = self._queue.get(timeout=0.1)
+                cmd = self._queue.get(timeout=scheduler.wait())
             except Queue.Empty:
-                # no items in the queue after 0.1 seconds.
+                # no items arrived before the next solve is due.
                 pass
             else:
                 # implement the command giving power system as the context.
-                cmd.operate(context=self)
+                count = self._apply(cmd)
+                # run the commands already waiting, they share one solve.
+                count += self._apply_waiting()
+                if count:
+                    scheduler.arrived(count)
 
-            # now get the netlist and solve the network.
+            if not scheduler.due():
+                continue
+
+            # now get the netlist and solve the network, the solve is 
+            #  abandoned if another command arrives before it completes.
+            started = time.time()
             try:
-                netlist = solver.solve()
+                netlist = solver.solve(
+                                cancel=self._staleness(started, superseded))
+            except SolveSuperseded:
+                # restart from the latest state, the buses hold the
+                #  partial solution as a warm start.
+                superseded += 1
+                scheduler.solved(started, abandoned=True)
+                self._superseded.inc()
+                self._trace('solve.superseded', started)
+                continue
             except (ElemError, NoSolution), msg:
+                superseded = 0
                 self.solution = False
+                scheduler.solved(started)
+                self._failed.inc()
+                self._trace('solve.failed', started, flow='f')
+                self._traces = set()
             else:
+                superseded = 0
                 self.solution = True
-
-                # notify callback 
+                scheduler.solved(started)
+                self._solves.inc()
+                self._trace('solve', started)
+
+                # notify callback, the traces solved for follow the
+                #  records out.
+                traces, self._traces = self._traces, set()
+                self._tracer.adopt(traces)
+                calling = time.time()
                 self._solution_callback(self._make_solution_callback(netlist))
+                self._callback.record(time.time() - calling)
+                self._trace('solve.callback', calling, traces)
+                self._tracer.end()
+
+    def _trace(self, name, started, traces=None, flow='t'):
+        """Record a span of the traces being solved for."""
+        if traces is None:
+            traces = self._traces
+        if traces and self._tracer.enabled:
+            self._tracer.span(name, started, traces, flow)
+
+    def _apply(self, cmd):
+        """Run the command, timing it and its wait in the queue. Return
+        the number of commands run, 0 for a marker."""
+        if cmd.marker:
+            cmd.operate(context=self)
+            return 0
+        started = time.time()
+        cmd.operate(context=self)
+        finished = time.time()
+        self._operating.record(finished - started)
+        if cmd.posted is not None:
+            self._latency.record(started - cmd.posted)
+            self._applied.record(finished - cmd.posted)
+        self._commands.inc()
+        if cmd.traces:
+            self._traces.update(cmd.traces)
+            self._trace('command.operate', started, cmd.traces)
+        return 1
+
+    def _apply_waiting(self):
+        """Run the commands waiting in the queue now, return the number
+        run. Commands posted meanwhile are left for the next pass."""
+        count = 0
+        for i in range(self._queue.qsize()):
+            try:
+                cmd = self._queue.get_nowait()
+            except Queue.Empty:
+                break
+            count += self._apply(cmd)
+        return count
+
+    def _staleness(self, started, superseded):
+        """Return a callable that is True once a command has been posted
+        since this call, while the solve started at started is still worth
+        abandoning. Returns None once superseded solves in a row reach
+        SUPERSEDE_LIMIT, the solve is then always finished."""
+        if superseded >= SUPERSEDE_LIMIT:
+            return None
+        queue = self._queue
+        generation = queue.generation
+        deadline = started + SUPERSEDE_SHARE * self.scheduler.solve_cost
+        def stale():
+            return queue.generation != generation and time.time() < deadline
+        return stale
 
     def _make_solution_callback(self, netlist):
         """Transform netlist and lineflow to a series of payload records 
         of the form:
-            (recordtype, name, (*payload))
+            (recordtype, name, (*payload), elemid)
         """
         return tuple(element.torecord() for element in netlist)
 
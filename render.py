@@ -0,0 +1,91 @@
+"""
+Dirty rectangle rendering.
+
+Sprites are pygame DirtySprites, a sprite sets its dirty flag whenever
+its image or position changes. A DirtyGroup then redraws only the dirty
+sprites (and the parts of their neighbours they overlap) and returns
+the rectangles it changed, so a surface of mostly static sprites costs
+almost nothing to keep up to date.
+
+Groups nest: a sprite that draws its own group of children onto its
+image (the mesh, panels) passes the rectangles its children changed on
+to the groups it is in, rather than redrawing all of itself.
+
+    group = DirtyGroup()
+    ...
+    rects = group.draw(surface, background)
+
+A sprite's image depends only on its picture and its state (the colour
+of its border), so the images are rendered once per picture and state
+and kept in the RenderCache, shared by every sprite drawn the same way.
+A change of state is then a change of image, not a redraw.
+"""
+import pygame
+
+__all__ = ['DirtyGroup', 'RenderCache', 'draw_children', 'report']
+
+class DirtyGroup(pygame.sprite.LayeredDirty):
+    """A LayeredDirty group that always draws by dirty rectangles.
+
+    LayeredDirty falls back to redrawing everything once a frame has
+    been slow, and then stays there as a full redraw is slow too. A
+    full redraw is never needed here, a static sprite is never
+    redrawn."""
+    def __init__(self, *sprites, **kws):
+        pygame.sprite.LayeredDirty.__init__(self, *sprites, **kws)
+        self._use_update = True
+
+    def draw(self, surface, bgd=None):
+        """Draw the dirty sprites onto surface, clearing under them with
+        bgd. Returns the list of rectangles changed."""
+        rects = pygame.sprite.LayeredDirty.draw(self, surface, bgd)
+        self._use_update = True
+        return rects
+
+    def repaint(self):
+        """Redraw every sprite on the next draw, i.e after the surface
+        has been drawn over."""
+        for sprite in self:
+            sprite.dirty = 1
+
+class RenderCache(object):
+    """Borg holding the rendered images of sprites, by key. The images
+    are shared, so must not be drawn on."""
+    _shared_state = {}
+    # key -> image. The keys are few, a picture in each of a handful of
+    #  states, so nothing is dropped.
+    _images = {}
+    def __init__(self):
+        self.__dict__ = self._shared_state
+
+    def get(self, key, render):
+        """Return the image for key, calling render to make it the first
+        time the key is asked for."""
+        try:
+            return self._images[key]
+        except KeyError:
+            image = self._images[key] = render()
+            return image
+
+    def clear(self):
+        self._images.clear()
+
+    def __len__(self):
+        return len(self._images)
+
+def draw_children(sprite, children, background):
+    """Draw the DirtyGroup children onto the sprite's image, and have
+    the groups the sprite is in redraw the parts of it that changed."""
+    report(sprite, children.draw(sprite.image, background))
+
+def report(sprite, rects):
+    """Have the groups the sprite is in redraw rects of its image."""
+    if not rects or sprite.dirty:
+        # nothing changed, or all of the sprite is redrawn anyway.
+        return
+    x, y = sprite.rect.topleft
+    area = sprite.image.get_rect()
+    for group in sprite.groups():
+        if isinstance(group, pygame.sprite.LayeredDirty):
+            for rect in rects:
+                group.repaint_rect(rect.clip(area).move(x, y))
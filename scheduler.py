@@ -0,0 +1,110 @@
+"""
+Adaptive solve scheduling for the PowerSystem loop.
+
+The scheduler keeps a running (exponentially weighted) average of how
+long a solve takes and how often commands arrive, and uses them to
+decide when the next solve should start:
+
+    - a small network solves in far less time than the target latency,
+      a command is solved as soon as it arrives.
+    - a large network is solved no more often than the cpu budget
+      allows, commands arriving in the mean time are batched into the
+      next solve rather than queueing a solve each.
+    - with nothing changed the network is re-solved every 'idle' seconds
+      (or slower, if the budget demands it).
+"""
+import time
+
+__all__ = ['SolveScheduler']
+
+class SolveScheduler(object):
+    def __init__(self, latency=0.1, budget=0.5, idle=0.1, smoothing=0.3):
+        """latency - target seconds from a command arriving to its solution.
+        budget - fraction of wall time the solver is allowed to use.
+        idle - seconds between solves when no commands have arrived.
+        smoothing - weight given to the newest sample in the averages."""
+        self.latency = latency
+        self.budget = budget
+        self.idle = idle
+        self.smoothing = smoothing
+
+        # average seconds per solve and between command arrivals.
+        self.solve_cost = 0.0
+        self.interval = None
+
+        # commands have been run since the last solve.
+        self.dirty = False
+
+        self._last_solve = None
+        self._last_arrival = None
+        self._first_pending = None
+
+    def _average(self, average, sample):
+        if average is None:
+            return sample
+        return average + self.smoothing * (sample - average)
+
+    def arrived(self, count=1, now=None):
+        """Notify the scheduler that count commands were run."""
+        if now is None:
+            now = time.time()
+        if self._last_arrival is not None:
+            sample = (now - self._last_arrival) / float(count)
+            self.interval = self._average(self.interval, sample)
+        self._last_arrival = now
+        if not self.dirty:
+            self._first_pending = now
+        self.dirty = True
+
+    def solved(self, started, finished=None, abandoned=False):
+        """Notify the scheduler of a solve. An abandoned solve is cut 
+        short, so is not counted in the solve cost, and the commands 
+        that superseded it are still waiting to be solved."""
+        self._last_solve = started
+        if abandoned:
+            return
+        if finished is None:
+            finished = time.time()
+        self.solve_cost = self._average(self.solve_cost, finished - started)
+        self.dirty = False
+
+    def spacing(self):
+        """Minimum seconds between the start of two solves."""
+        return self.solve_cost / self.budget
+
+    def hold(self):
+        """Seconds to wait after a command for another to batch with it.
+        Only worth it if commands arrive quicker than a solve completes."""
+        if self.interval is None or self.interval >= self.solve_cost:
+            return 0.0
+        return min(self.interval, self.slack())
+
+    def slack(self):
+        """Seconds a command may wait and still meet the target latency."""
+        return max(self.latency - self.solve_cost, 0.0)
+
+    def next_solve(self):
+        """Return the time the next solve should start."""
+        if self._last_solve is None:
+            return 0.0
+
+        earliest = self._last_solve + self.spacing()
+        if not self.dirty:
+            return max(earliest, self._last_solve + self.idle)
+
+        # batch, but never hold the oldest command past the target latency.
+        batched = min(self._last_arrival + self.hold(),
+                        self._first_pending + self.slack())
+        return max(earliest, batched)
+
+    def wait(self, now=None):
+        """Seconds the loop may block waiting for a command."""
+        if now is None:
+            now = time.time()
+        return max(self.next_solve() - now, 0.0)
+
+    def due(self, now=None):
+        """Return True if it is time to solve."""
+        if now is None:
+            now = time.time()
+        return now >= self.next_solve()
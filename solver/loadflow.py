@@ -8,12 +8,13 @@ from numpy.linalg import solve
 from scipy.linsolve import spsolve
 from scipy.sparse import lil_matrix as sparse
 
-from ybus import ybus
+from ybus import ybus, bus_types
 from ybus import make_sparse
 from calc import calc
 from form_jac import form_jac
 
-def loadflow(bus, line, tol, iter_max, vmin, vmax, acc, display, flag=1):
+def loadflow(bus, line, tol, iter_max, vmin, vmax, acc, display, flag=1,
+        interrupt=None, cache=None):
     """
     bus - bus data.
     line - line data.
@@ -26,6 +27,12 @@ def loadflow(bus, line, tol, iter_max, vmin, vmax, acc, display, flag=1):
                 else, no load-flow study report.
     flag - 1, form new jacobian every iteration.
            2, form new jacobian every other iteration.
+    interrupt - optional callable, interrupt(V, ang) is called before each
+           iteration with the current voltage magnitudes and angles (rad).
+           It may raise to abandon the solution.
+    cache - optional dict, the admittance matrix is kept here and reused
+           while the caller leaves the dict alone. Clear it when the line
+           data or bus numbering changes.
     """
     tt = time.time()
     LOAD_BUS, GEN_BUS, SWING_BUS = 3,2,1
@@ -38,7 +45,13 @@ def loadflow(bus, line, tol, iter_max, vmin, vmax, acc, display, flag=1):
     volt_min = vmin * ones((1, nbus))
     volt_max = vmax * ones((1, nbus))
     # build admittance matrix y
-    Y, nSW, nPV, nPQ, SB, bus_int = ybus(bus, line, 2)
+    if cache is not None and 'ybus' in cache:
+        Y, bus_int = cache['ybus']
+        nSW, nPV, nPQ, SB = bus_types(bus, bus_int)
+    else:
+        Y, nSW, nPV, nPQ, SB, bus_int = ybus(bus, line, 2)
+        if cache is not None:
+            cache['ybus'] = (Y, bus_int)
     
     # process bus data.
     bus_no = array(bus[:,0])
@@ -89,6 +102,8 @@ def loadflow(bus, line, tol, iter_max, vmin, vmax, acc, display, flag=1):
     st = time.time()
     # start iteration process.
     while conv_flag == 1 and iter < iter_max:
+        if interrupt is not None:
+            interrupt(V, ang)
         iter += 1
         if flag == 2:
             if iter == 2 * iter / 2 + 1:
@@ -7,7 +7,7 @@ from numpy import matrix
 from numpy import array
 from numpy import ones
 
-__all__ = ['ybus']
+__all__ = ['ybus', 'bus_types']
 
 def ybus(bus, line, nargout=0):
     """
@@ -79,22 +79,35 @@ def ybus(bus, line, nargout=0):
     Y = Y + make_sparse(ibus, ibus, comp_bus, nbus, nbus)
 
     if nargout > 1:
-        nSW = 0
-        nPV = 0
-        nPQ = 0
-        for i in range(nbus):
-            bus_type = bus[i,9]
-            if bus_type == SWING_BUS:
-                SB = int(bus_int[int(bus[i,0])])
-                nSW = nSW + 1
-            elif bus_type == GEN_BUS:
-                nPV += 1
-            else:
-                nPQ += 1
+        nSW, nPV, nPQ, SB = bus_types(bus, bus_int)
         return Y, nSW, nPV, nPQ, SB, bus_int
     else:
         return Y, bus_int
 
+def bus_types(bus, bus_int):
+    """
+    output:
+        nSW - number of swing buses
+        nPV - number of generator buses
+        nPQ - number of load buses
+        SB - bus number of swing bus
+    """
+    SWING_BUS, GEN_BUS, LOAD_BUS = 1, 2, 3
+
+    nSW = 0
+    nPV = 0
+    nPQ = 0
+    for i in range(len(bus[:,0])):
+        bus_type = bus[i,9]
+        if bus_type == SWING_BUS:
+            SB = int(bus_int[int(bus[i,0])])
+            nSW = nSW + 1
+        elif bus_type == GEN_BUS:
+            nPV += 1
+        else:
+            nPQ += 1
+    return nSW, nPV, nPQ, SB
+
 def make_sparse(a, b, w, n, m):
     s = sparse((n,m), dtype=scipy.complex128)
     for i, value in enumerate(a):
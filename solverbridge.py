@@ -1,11 +1,26 @@
 """
-A module to bridge between the object representation of 
-elements and the matrix representation required by a 
+A module to bridge between the object representation of
+elements and the matrix representation required by a
 typical solver.
+
+The elements keep their parameters in the ElementStore columns (one
+NumPy array per field), the bridge gathers the netlist's rows from
+them and copies the results back as whole vectors. A bus's slot in
+the store is also its bus number.
 """
 
-from collections import defaultdict
-from numpy import matrix
+import time
+from math import pi
+from numpy import matrix, asarray, array, zeros, column_stack
+
+from elem import ChangeJournal
+from elementstore import ElementStore
+from metrics import Metrics
+
+# column layout of the solver bus and line matrices.
+BUS_FIELDS = ('busno', 'voltage', 'angle', 'pgen', 'qgen', 'pload', 'qload',
+                'cond', 'susc', 'bustype')
+LINE_FIELDS = ('frm', 'to', 'res', 'reac', 'charg', 'tap', 'phase')
 
 class InvalidSwingBus(AttributeError):
     """Raised on swingbus object that does not implement
@@ -17,25 +32,51 @@ class NoSolution(ArithmeticError):
     at some point."""
     pass
 
+class SolveSuperseded(NoSolution):
+    """Raised when a solve is abandoned part way because the network
+    changed underneath it. Holds the voltage magnitudes and angles (rad)
+    reached so far."""
+    def __init__(self, voltage, angle):
+        NoSolution.__init__(self, "Solve superseded by a newer network.")
+        self.voltage = asarray(voltage).real.flatten()
+        self.angle = asarray(angle).real.flatten()
+
 class SolverBridge(object):
-    def __init__(self, solver):
+    def __init__(self, solver, metrics=None):
         """Initialise with an instantiated solver class.
-        This class accepts a bus and a line matrix."""
+        This class accepts a bus and a line matrix.
+
+        metrics - a Metrics registry to record the time spent finding
+                the netlist, marshalling, solving and unmarshalling in."""
         self._solver = solver
 
+        metrics = metrics or Metrics()
+        self._islands = metrics.histogram('solve.islands')
+        self._marshal = metrics.histogram('solve.marshal')
+        self._solving = metrics.histogram('solve.solver')
+        self._unmarshal = metrics.histogram('solve.unmarshal')
+
         # used to get the latest netlist.
         self._swingbus = None
 
+        # the topology epoch the current slots were built for.
+        self._epoch = None
+
         self._createstorage()
 
     def _createstorage(self):
-        """Create the mapping attributes."""
-        # a mapping between busnos and names.
-        # lines are mapped by (to,frm) tuple.
-        self._name2busnum = {}
-        self._busnum2elem = {}
-        self._line2elem = {}
-        # XXX: Remove this not required.
+        """Create the netlist storage."""
+        self._store = ElementStore()
+
+        # the store slots in the netlist, in the order they are sent to
+        #  the solver.
+        self._busidx = array([], dtype=int)
+        self._lineidx = array([], dtype=int)
+        self._netlist = None
+
+        # solver side cache (admittance matrix), valid until the lines
+        #  or the numbering change.
+        self._cache = {}
 
     def swingbus():
         def fget(self):
@@ -44,105 +85,124 @@ class SolverBridge(object):
         def fset(self, swingbus):
             """Set swing bus checks swingbus
             implements interface before setting."""
-            
+
             try:
                 swingbus.active_nodes
             except AttributeError:
                 msg = 'SwingBus object does not define active nodes'
                 raise InvalidSwingBus(msg)
-                        
+
             self._swingbus = swingbus
         return locals()
     swingbus = property(**swingbus())
 
-    def solve(self):
-        """Once swing bus has been set, this is called to
-        send the netlist to the solver and update objects."""
-
-        # create new mapped storages.
-        self._createstorage()
-
+    def _sync(self):
+        """Collect the store slots of the active netlist."""
+        self._netlist = None
         netlist = self.swingbus.active_nodes()
-        # map all the buses in the netlist.
 
-        busmatrix = []
-        for i, element in enumerate(netlist):
-            # first map all bus elements.
-
-            if element._bustype is None:
-                # check if a bus or line element.
-                continue
-        
-            self._busnum2elem[i] = element
-            self._name2busnum[element.name] = i
-
-            busmatrix.append(element.tolist(i))
-
-        # now map the line elements.
-        linematrix = []
+        busidx = []
+        lineidx = []
         for element in netlist:
-            # check to see if it is a bus.
-            if element._bustype is not None:
-                continue
-
-            # get connected buses.
-            buses = element.elems
-
-            # a tuple of the connected bus numbers. 
-            nums = tuple(self._name2busnum[bus.name] 
-                                    for bus in buses)
-
-            self._line2elem[nums] = element
-
-            linematrix.append(element.tolist(nums))
-
-        busmatrix = matrix(busmatrix)
-        linematrix = matrix(linematrix)
-
+            if element._bustype is None:
+                lineidx.append(element._slot)
+            else:
+                busidx.append(element._slot)
+
+        self._busidx = array(sorted(busidx), dtype=int)
+        self._lineidx = array(sorted(lineidx), dtype=int)
+        self._netlist = netlist
+        self._cache.clear()
+
+    def _patch(self, changes):
+        """The changed parameters are already in the store, a change to
+        a line in the netlist drops the cached admittance."""
+        netlist = self._netlist
+        for element in changes:
+            if element._bustype is None and element in netlist:
+                self._cache.clear()
+                return
+
+    def solve(self, cancel=None):
+        """Once swing bus has been set, this is called to
+        send the netlist to the solver and update objects.
+
+        cancel - optional callable, checked between solver iterations.
+                If it returns True the solve is abandoned, the voltages
+                reached so far are kept as a warm start for the next
+                solve and SolveSuperseded is raised."""
+
+        journal = ChangeJournal()
+        started = time.time()
+        if self._epoch != journal.epoch or self._netlist is None:
+            # the netlist changed, give new elements their slots.
+            self._epoch = journal.epoch
+            self._sync()
+            marshalling = time.time()
+            self._islands.record(marshalling - started)
+        else:
+            marshalling = started
+        self._patch(journal.changes())
+        journal.clear()
+
+        netlist = self._netlist
+        buses = self._store.buses
+        lines = self._store.lines
+        busidx = self._busidx
+        lineidx = self._lineidx
+
+        if not len(lineidx):
+            raise NoSolution("No lines in the network! No Solution")
+
+        # conductance and susceptance are not modelled.
+        empty = zeros(len(busidx))
+        busmatrix = matrix(column_stack([busidx] + 
+                        [getattr(buses, field)[busidx] 
+                            for field in BUS_FIELDS[1:7]] + 
+                        [empty, empty, buses.bustype[busidx]]))
+        linematrix = matrix(lines.rows(lineidx, LINE_FIELDS))
+
+        kws = dict(cache=self._cache)
+        if cancel is not None:
+            def interrupt(voltage, angle):
+                if cancel():
+                    raise SolveSuperseded(voltage, angle)
+            kws['interrupt'] = interrupt
+
+        solving = time.time()
+        self._marshal.record(solving - marshalling)
         try:
             # compute the solution and return as a system of arrays.
-            busrows, linerows = self._solver(busmatrix, linematrix, 
-                                        0.02, 15, 0.95, 1.05, 1, 'n', 1)
+            busrows, linerows = self._solver(busmatrix, linematrix,
+                                        0.02, 15, 0.95, 1.05, 1, 'n', 1, **kws)
         except (ValueError, IndexError, TypeError, UnboundLocalError):
             # occurs when solver fails loudly.
+            self._solving.record(time.time() - solving)
             raise NoSolution("Solver failed to complete! No Solution")
-
-        # update buses with recalculated values.
-        for row in busrows:
-            busobj = self._busnum2elem[int(row[0])]
-            updatebus(busobj, row)
-
-        # update lines with recalculated values.
-        for row in linerows:
-            frmto = (int(row[1]), int(row[2]))
-            try:
-                lineobj = self._line2elem[frmto]
-            except KeyError:
-                continue
-
-            # store power flows as a direction from bus name to bus name.
-            frm_name = self._busnum2elem[frmto[0]].name
-            to_name = self._busnum2elem[frmto[1]].name
-            # store as a nested tuple (p, q, from, to)
-            lineobj.pqflow = (row[3], row[4], frm_name, to_name)
+        except SolveSuperseded, msg:
+            self._solving.record(time.time() - solving)
+            # keep the partial solution as the starting point of the next.
+            buses.voltage[busidx] = msg.voltage
+            buses.angle[busidx] = msg.angle * 180 / pi
+            raise
+        unmarshalling = time.time()
+        self._solving.record(unmarshalling - solving)
+
+        # copy the recalculated values into the store.
+        busrows = asarray(busrows).real
+        slots = busrows[:, 0].astype(int)
+        for i in range(1, 7):
+            getattr(buses, BUS_FIELDS[i])[slots] = busrows[:, i]
+
+        # the solver returns a sending and receiving end row per line,
+        #  the sending end flow is stored (from bus to to bus).
+        linerows = asarray(linerows)[0::2].real
+        slots = lineidx[linerows[:, 0].astype(int)]
+        lines.pflow[slots] = linerows[:, 3]
+        lines.qflow[slots] = linerows[:, 4]
+
+        # writing the solution back is not a change to the network.
+        journal.clear()
+        self._unmarshal.record(time.time() - unmarshalling)
 
         return netlist
-
-def updatebus(busobj, row):
-    """Update the bus with the contents of the row.
-    Could be implemented in the bus object."""
-    busobj.voltage = row[1]
-    busobj.angle = row[2]
-    busobj.pgen = row[3]
-    busobj.qgen = row[4]
-    busobj.pload = row[5]
-    busobj.qload = row[6]
-
-
-
-
-
-
-        
-
-
@@ -7,15 +7,18 @@ from icontypes import *
 from panel import *
 
 from gamestate import GameState
+from render import RenderCache
 
 __all__ = ['Sprite']
 
-class Sprite(pygame.sprite.Sprite):
+class Sprite(pygame.sprite.DirtySprite):
     def __init__(self, pos, containers, image, num_pics = (1,1)):
-        pygame.sprite.Sprite.__init__(self, containers)
+        pygame.sprite.DirtySprite.__init__(self, containers)
 
         #load the image array
         self.imgs = load_img(image, num_pics)
+        # the sprites with the same source are drawn with the same images.
+        self.source = (image, num_pics)
         self.num_images = num_pics[0]*num_pics[1]
         self.img_index = 0 #currently indexed image
         
@@ -30,7 +33,8 @@ class Sprite(pygame.sprite.Sprite):
 
         self.paragraph = 'default sprite'
         self.kill()
-        self.dirty = False
+        # the image is out of date, redrawn on the next update.
+        self._stale = False
 
     def _makepanel(self):
         p = Panel([], (0,0), SUB_PANEL_SIZE)
@@ -45,9 +49,11 @@ class Sprite(pygame.sprite.Sprite):
         self.add(self.containers)
 
     def redraw(self):
-        image, rect = self.__drawboundingbox(self.colour)
-        self.image = image
-        self.rect = rect
+        key = ('sprite', self.source, self.img_index, self.colour)
+        render = lambda: self.__drawboundingbox(self.colour)[0]
+        self.image = RenderCache().get(key, render)
+        self.rect = self.image.get_rect(topleft=self.pos)
+        self.dirty = 1
 
     def __drawsurface(self, colour = TRANSPARENT, size = SPRITE_SIZE):
         rect = pygame.Rect((0,0), size)
@@ -75,17 +81,18 @@ class Sprite(pygame.sprite.Sprite):
         return image
 
     def update(self, *args):
-        if self.dirty:
-            self.dirty = False
+        if self._stale:
+            self._stale = False
             self.redraw()
 
     def set_pos(self, pos):
         self.pos = pos
         self.rect.topleft = pos
+        self.dirty = 1
 
     def increment_image(self, increment = 1):
         self.img_index = (self.img_index + increment) % self.num_images
-        self.dirty = True
+        self._stale = True
 
     def set_bounding(self, bounding):
         maybechange = False
@@ -101,7 +108,7 @@ class Sprite(pygame.sprite.Sprite):
             if bounding == False:
                 self.current_state = BUTTON_OFF
                 self.colour = self.colours[self.current_state]
-            self.dirty = True
+            self._stale = True
             self.last_state = bounding
 
     def click(self, button):
@@ -118,6 +125,6 @@ class Sprite(pygame.sprite.Sprite):
         if self.current_state != new_state:
             self.current_state = new_state
             self.colour = self.colours[new_state]
-            self.dirty = True
+            self._stale = True
             
 
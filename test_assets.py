@@ -0,0 +1,78 @@
+import os
+import unittest
+
+# the images are converted without a display.
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import pygame
+
+from assets import Assets
+from button import load_img
+
+def setUpModule():
+    pygame.display.init()
+    pygame.display.set_mode((10, 10), 0, 32)
+
+class TestAssets(unittest.TestCase):
+    """Test each image is loaded from disk once, and shared."""
+    def setUp(self):
+        Assets._sheets.clear()
+        Assets._frames.clear()
+        # count the files read from disk.
+        self.loaded = []
+        self.load = pygame.image.load
+        def load(filename):
+            self.loaded.append(filename)
+            return self.load(filename)
+        pygame.image.load = load
+
+    def tearDown(self):
+        pygame.image.load = self.load
+
+    def testShared(self):
+        """Test the same image is loaded once and its frames shared."""
+        a = Assets().image('coal.png')
+        b = Assets().image('coal.png', (1, 1))
+        self.assert_(a is b)
+        self.assert_(load_img('coal.png') is a)
+        self.assert_(self.loaded == ['coal.png'])
+
+    def testSheet(self):
+        """Test a sheet cut differently is loaded once, its frames cut
+        from the same image."""
+        whole = Assets().image('turtle.png', (1, 1))
+        halves = Assets().image('turtle.png', (2, 1))
+        self.assert_(self.loaded == ['turtle.png'])
+        self.assert_(len(whole) == 1 and len(halves) == 2)
+        self.assert_(halves[0].get_parent() is whole[0].get_parent())
+        w, h = whole[0].get_size()
+        self.assert_(halves[0].get_size() == (w / 2, h))
+        self.assert_(halves[1].get_offset() == (w / 2, 0))
+
+    def testPreload(self):
+        """Test preloaded images are handed out without reading the
+        disk again."""
+        Assets().preload(['coal.png', 'grass.png']).join()
+        self.assert_(sorted(self.loaded) == ['coal.png', 'grass.png'])
+        Assets().image('coal.png')
+        Assets().image('grass.png')
+        self.assert_(len(self.loaded) == 2)
+        # but another is.
+        Assets().image('water.png')
+        self.assert_(self.loaded[2:] == ['water.png'])
+
+    def testMissing(self):
+        """Test a missing file raises pygame.error, as loading it did,
+        and is tried again the next time."""
+        self.failUnlessRaises(pygame.error, Assets().image, 'missing.png')
+        self.failUnlessRaises(pygame.error, Assets().image, 'missing.png')
+        self.assert_(self.loaded == ['missing.png'] * 2)
+        # the buttons still get None.
+        self.assert_(load_img('missing.png') is None)
+        # and preloading skips it.
+        Assets().preload(['missing.png', 'coal.png']).join()
+        self.assert_(Assets()._sheets.keys() == ['coal.png'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from numpy import zeros
 
 import elem
 
@@ -66,6 +67,56 @@ class TestBridge(unittest.TestCase):
 
         self.failureException(s.solve())
 
+    def testSuperseded(self):
+        """Test that a cancelled solve leaves the partial solution on
+        the buses and raises SolveSuperseded."""
+        def solver(bus, line, *args, **kws):
+            nbus = len(bus)
+            kws['interrupt']([[1.02]] * nbus, [[0.1]] * nbus)
+            self.fail("Solve was not interrupted.")
+
+        s = sbridge.SolverBridge(solver)
+        s.swingbus = self.swingholder
+
+        self.failUnlessRaises(sbridge.SolveSuperseded, s.solve,
+                                cancel=lambda: True)
+        self.assertAlmostEqual(self.b3.voltage, 1.02)
+        self.assertAlmostEqual(self.b3.angle, 0.1 * 180 / 3.14159265, 4)
+
+    def testParameterPatch(self):
+        """Test that a parameter edit patches the bus matrix and keeps
+        the solver cache, while a new line renumbers the network."""
+        calls = []
+        def solver(bus, line, *args, **kws):
+            calls.append((bus.copy(), dict(kws['cache'])))
+            kws['cache'].setdefault('ybus', len(calls))
+            return bus.A, zeros((0, 5))
+
+        s = sbridge.SolverBridge(solver)
+        s.swingbus = self.swingholder
+        s.solve()
+
+        self.b3.pload = 5
+        s.solve()
+        bus, cache = calls[-1]
+        self.assert_(5 in bus[:, 5])
+        self.assert_(cache == dict(ybus=1))
+
+        # a new line means a new netlist.
+        b4 = elem.BusElem(bustype=3, name='far')
+        l3 = elem.LineElem(name='farline')
+        l3.connect([self.b3, b4])
+        s.solve()
+        bus, cache = calls[-1]
+        self.assert_(len(bus) == 4)
+        self.assert_(cache == {})
+
+        # editing a line drops the cached admittance.
+        l3.reac = 0.5
+        s.solve()
+        bus, cache = calls[-1]
+        self.assert_(cache == {})
+
 class TestSolver(unittest.TestCase):
     """Test that the solver is returning a satisfactory 
     result, under a range of conditions."""
@@ -0,0 +1,174 @@
+import unittest
+from StringIO import StringIO
+
+import powersystem
+from commandjournal import CommandJournal, JournalError, read, replay, settle
+from commandjournal import BUS, LINE, EDIT, RENAME, DECOMMISSION, EDITS
+
+class FakeClock(object):
+    """A clock that only moves when slept on."""
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.slept.append(delay)
+        self.now += delay
+
+def queued(ps):
+    """Return the (type, attributes) of the commands waiting in ps."""
+    cmds = []
+    while not ps._queue.empty():
+        cmd = ps._queue.get_nowait()
+        cmds.append((type(cmd), cmd.attributes))
+    return cmds
+
+class TestJournal(unittest.TestCase):
+    """Record a session into a journal and replay it. The power systems
+    are not started, the commands are left in their queues."""
+    def setUp(self):
+        self.clock = FakeClock()
+        self.file = StringIO()
+        self.ps = powersystem.PowerSystem(
+                        journal=CommandJournal(self.file, clock=self.clock))
+
+        ps = self.ps
+        ps.add_line('phil', connections=['swing', 'gen'])
+        ps.add_bus('swing', bustype=1)
+        self.clock.now += 0.5
+        ps.add_bus('gen', pgen=1, qgen=0.2)
+        ps.edit_elem('gen', dict(pgen=0.5))
+        self.clock.now += 0.25
+        ps.rename_element('gen', 'coal')
+        ps.edit_elem('coal', dict(qgen=0.1))
+        ps.decommission_element('phil')
+        ps.edit_elems({'coal': dict(pgen=0.2), 'swing': dict(qgen=0.1)})
+
+    def records(self):
+        return list(read(StringIO(self.file.getvalue())))
+
+    def testRecord(self):
+        """Test the journal holds every command with its time."""
+        records = self.records()
+        self.assert_([kind for stamp, kind, fields in records] ==
+                    [LINE, BUS, BUS, EDIT, RENAME, EDIT, DECOMMISSION, EDITS])
+        self.assert_([stamp for stamp, kind, fields in records] ==
+                    [0, 0, 0.5, 0.5, 0.75, 0.75, 0.75, 0.75])
+
+        elemid, name, connections = records[0][2]
+        self.assert_(name == 'phil' and connections == ['swing', 'gen'])
+        self.assert_(records[3][2][1] == dict(pgen=0.5))
+        self.assert_(records[4][2][1] == 'coal')
+        coal, swing = self.ps.ids.lookup('coal'), self.ps.ids.lookup('swing')
+        self.assert_(records[7][2][0] == {coal: dict(pgen=0.2),
+                                          swing: dict(qgen=0.1)})
+
+    def testReplay(self):
+        """Test a replay posts the same commands as were recorded."""
+        recorded = queued(self.ps)
+
+        ps = powersystem.PowerSystem()
+        count = replay(StringIO(self.file.getvalue()), ps, speed=None)
+        self.assert_(count == 8)
+        self.assert_(queued(ps) == recorded)
+        self.assert_(ps.ids.lookup('coal') == self.ps.ids.lookup('coal'))
+
+    def testSpeed(self):
+        """Test a replay keeps to the recorded times, scaled by speed."""
+        clock = self.clock
+        clock.slept = []
+        replay(StringIO(self.file.getvalue()), powersystem.PowerSystem(),
+                    speed=2.0, clock=clock, sleep=clock.sleep)
+        self.assert_(clock.slept == [0.25, 0.125])
+
+    def testReleased(self):
+        """Test connections to released elements are left out."""
+        ps = self.ps
+        ps.add_line('dead', connections=['coal', 'swing'])
+        ps.ids.release('coal')
+        ps.add_line('ghost', connections=[ps.ids.intern('swing'), 
+                                            ps.ids.lookup('dead') + 100])
+        elemid, name, connections = self.records()[-1][2]
+        self.assert_(name == 'ghost' and connections == ['swing'])
+
+    def testValues(self):
+        """Test edit values of any type are recorded, those that can't
+        be written are left out."""
+        self.ps.edit_elem('coal', dict(pgen=None, name='nuclear', qgen=2,
+                                        pload=object()))
+        elemid, changes = self.records()[-1][2]
+        self.assert_(changes == dict(pgen=None, name='nuclear', qgen=2.0))
+
+    def testBusValues(self):
+        """Test a bus with powers of None is recorded and replayed."""
+        ps = self.ps
+        ps.add_bus('idle', pgen=None, qgen=None, pload=0.5, qload=None)
+        elemid, bustype, pgen, qgen, pload, qload, name, conns = \
+                                                    self.records()[-1][2]
+        self.assert_(elemid == ps.ids.lookup('idle') and bustype == 3)
+        self.assert_((pgen, qgen, pload, qload) == (None, None, 0.5, None))
+
+        recorded = queued(ps)
+        replayed = powersystem.PowerSystem()
+        replay(StringIO(self.file.getvalue()), replayed, speed=None)
+        self.assert_(queued(replayed) == recorded)
+
+    def testNotPosted(self):
+        """Test an element whose command can't be journaled is not
+        queued, and its name is not kept."""
+        ps = self.ps
+        queued(ps)
+        def broken(data):
+            raise IOError("disk full")
+        self.file.write = broken
+        self.failUnlessRaises(IOError, ps.add_bus, 'lost', pgen=1)
+        self.failUnlessRaises(IOError, ps.add_line, 'gone')
+        self.assert_(ps.ids.lookup('lost') is None)
+        self.assert_(ps.ids.lookup('gone') is None)
+        self.assert_(queued(ps) == [])
+        # an element that already has its name keeps it.
+        self.failUnlessRaises(IOError, ps.add_bus, 'coal')
+        self.assert_(ps.ids.lookup('coal') is not None)
+
+    def testSettle(self):
+        """Test settle waits for the replayed commands to be solved."""
+        ps = powersystem.PowerSystem()
+        ps.setDaemon(True)
+        ps.start()
+        try:
+            replay(StringIO(self.file.getvalue()), ps, speed=None)
+            self.assert_(settle(ps, timeout=10))
+            self.assert_(ps.queue_depth() == 0)
+            snap = ps.metrics.snapshot()
+            self.assert_(snap['solves'] + snap['solves.failed'] >= 1)
+            self.assert_(snap['command.applied']['count'] == 
+                            snap['command.latency']['count'])
+        finally:
+            ps.stop()
+
+    def testSettleUncounted(self):
+        """Test waiting to settle is not counted as a command, and does
+        not ask for a solve or supersede one."""
+        ps = powersystem.PowerSystem()
+        ps.setDaemon(True)
+        ps.start()
+        try:
+            self.assert_(settle(ps, timeout=10))
+            self.assert_(settle(ps, timeout=10))
+            self.assert_(ps.metrics.snapshot()['commands'] == 0)
+            self.assert_(ps._queue.generation == 0)
+            self.assert_(ps.scheduler.interval is None)
+            self.assert_(not ps.scheduler.dirty)
+        finally:
+            ps.stop()
+
+    def testBadJournal(self):
+        self.failUnlessRaises(JournalError, list, read(StringIO('nonsense')))
+        truncated = StringIO(self.file.getvalue()[:-3])
+        self.failUnlessRaises(JournalError, list, read(truncated))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import Queue
+import threading
+
+from commandqueue import CommandQueue
+from command import _OperationEditElement, _OperationDecommission
+from command import _OperationCreateBus, _OperationRenameElement
+from command import _OperationEditElements
+
+def edit(elemid, **changes):
+    return _OperationEditElement(elemid=elemid, changes=changes)
+
+def create(elemid):
+    return _OperationCreateBus(elemid=elemid, name='bus%d' % elemid, pgen=0,
+                        qgen=0, pload=0, qload=0, connections=None, bustype=3)
+
+class TestCoalesce(unittest.TestCase):
+    """Test that waiting commands are merged."""
+    def setUp(self):
+        self.q = CommandQueue()
+
+    def testMergeEdits(self):
+        """Test that edits to the same element become a single edit."""
+        q = self.q
+        q.put(edit(1, pgen=0.1))
+        q.put(edit(2, pgen=0.5))
+        q.put(edit(1, pgen=0.2, qgen=0.1))
+
+        self.assert_(q.qsize() == 2)
+        cmd = q.get_nowait()
+        self.assert_(cmd.attributes['changes'] == dict(pgen=0.2, qgen=0.1))
+        self.assert_(q.coalesced == 1)
+
+    def testRename(self):
+        """Test that edits are merged across a rename, the element
+        keeps its id."""
+        q = self.q
+        q.put(edit(1, pgen=0.1))
+        q.put(_OperationRenameElement(elemid=1, to_name='bob'))
+        q.put(edit(1, pgen=0.2))
+
+        self.assert_(q.qsize() == 2)
+
+    def testCreateBarrier(self):
+        """Test that an edit is not merged into one before a create."""
+        q = self.q
+        q.put(edit(1, pgen=0.1))
+        q.put(create(1))
+        q.put(edit(1, pgen=0.2))
+
+        self.assert_(q.qsize() == 3)
+
+    def testMergeBulkEdits(self):
+        """Test that consecutive bulk edits become a single bulk edit."""
+        q = self.q
+        q.put(_OperationEditElements(edits={1: dict(pgen=0.1)}))
+        q.put(_OperationRenameElement(elemid=1, to_name='bob'))
+        q.put(_OperationEditElements(edits={1: dict(pgen=0.2), 2: dict()}))
+
+        self.assert_(q.qsize() == 2)
+        cmd = q.get_nowait()
+        self.assert_(cmd.attributes['edits'] == {1: dict(pgen=0.2), 2: {}})
+
+    def testBulkBarrier(self):
+        """Test that a bulk edit is not merged past an edit of one of
+        its elements."""
+        q = self.q
+        q.put(_OperationEditElements(edits={1: dict(pgen=0.1)}))
+        q.put(edit(2, pgen=0.3))
+        q.put(_OperationEditElements(edits={3: dict(pgen=0.2)}))
+        self.assert_(q.qsize() == 2)
+        q.put(_OperationEditElements(edits={2: dict(pgen=0.2)}))
+        self.assert_(q.qsize() == 3)
+
+    def testCreateDecommission(self):
+        """Test that a waiting create and decommission pair collapses."""
+        q = self.q
+        q.put(create(1))
+        q.put(edit(1, pgen=1))
+        q.put(_OperationRenameElement(elemid=1, to_name='bob'))
+        q.put(create(2))
+        q.put(_OperationDecommission(elemid=1))
+
+        cmds = [q.get_nowait() for i in range(q.qsize())]
+        self.assert_(len(cmds) == 2)
+        self.assert_(cmds[0].attributes['elemid'] == 2)
+        self.assert_(isinstance(cmds[1], _OperationDecommission))
+
+class TestBackpressure(unittest.TestCase):
+    def testFull(self):
+        """Test that a full, non-blocking queue raises Queue.Full."""
+        q = CommandQueue(maxsize=2, block=False)
+        q.put(create(1))
+        q.put(edit(1, pload=1))
+        self.failUnlessRaises(Queue.Full, q.put, create(3))
+        # merging into a waiting command still succeeds.
+        q.put(edit(1, pload=2))
+        self.assert_(q.qsize() == 2)
+
+    def testTimeout(self):
+        q = CommandQueue(maxsize=1)
+        q.put(create(1))
+        self.failUnlessRaises(Queue.Full, q.put, create(2), timeout=0.01)
+        q.get()
+        self.failUnlessRaises(Queue.Empty, q.get, timeout=0.01)
+
+    def testCancelled(self):
+        """Test a put waiting on a full queue is let in when a cancelled
+        create makes room."""
+        q = CommandQueue(maxsize=3)
+        q.put(create(1))
+        q.put(edit(1, pload=1))
+        q.put(create(2))
+        waiting = threading.Thread(target=q.put, args=(create(3),))
+        waiting.setDaemon(True)
+        waiting.start()
+        waiting.join(0.05)
+        self.assert_(waiting.isAlive())
+
+        # removes two commands, and queues one.
+        q.put(_OperationDecommission(elemid=1))
+        waiting.join(1)
+        self.assert_(not waiting.isAlive())
+        self.assert_([cmd.attributes['elemid'] for cmd in q._items] == 
+                        [2, 1, 3])
+
+if __name__ == '__main__':
+    unittest.main()
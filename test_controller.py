@@ -0,0 +1,80 @@
+import unittest
+import threading
+import time
+
+import controller
+
+class TestController(unittest.TestCase):
+    def setUp(self):
+        self.c = controller.Controller()
+        if not self.c.isAlive():
+            self.c.setDaemon(True)
+            self.c.start()
+
+    def wait(self, done, timeout=1.0):
+        end = time.time() + timeout
+        while not done() and time.time() < end:
+            time.sleep(0.001)
+
+    def testBorg(self):
+        """Test that the controllers share one registry."""
+        self.c.register('borg', len)
+        self.assert_(len in controller.Controller().listeners('borg'))
+
+    def testOrder(self):
+        """Test a listener sees its events in the order sent."""
+        seen = []
+        def listener(event):
+            seen.append(event)
+        self.c.register('ordered', listener)
+        for i in range(200):
+            self.c.send('ordered', i)
+        self.wait(lambda: len(seen) == 200)
+        self.assert_(seen == range(200))
+
+    def testPool(self):
+        """Test that events are delivered by the worker pool, not a
+        thread per event."""
+        threads = set()
+        def listener(event):
+            threads.add(threading.currentThread())
+        self.c.register('pool', listener)
+        before = threading.activeCount()
+        for i in range(50):
+            self.c.send('pool', i)
+        self.wait(lambda: len(threads) == 1)
+        time.sleep(0.05)
+        self.assert_(len(threads) == 1)
+        self.assert_(threading.activeCount() == before)
+
+    def testSync(self):
+        """Test that a synchronous send calls the listeners at once."""
+        seen = []
+        def listener(event):
+            seen.append(event)
+        self.c.register('sync', listener)
+        self.c.send('sync', 1, sync=True)
+        self.assert_(seen == [1])
+
+        self.c.synchronous = True
+        try:
+            self.c.send('sync', 2)
+            self.assert_(seen == [1, 2])
+        finally:
+            self.c.synchronous = False
+
+    def testFailure(self):
+        """Test that a failing listener does not stop later events."""
+        seen = []
+        def listener(event):
+            if event == 0:
+                raise ValueError("expected failure, ignore the traceback")
+            seen.append(event)
+        self.c.register('failure', listener)
+        self.c.send('failure', 0)
+        self.c.send('failure', 1)
+        self.wait(lambda: seen)
+        self.assert_(seen == [1])
+
+if __name__ == '__main__':
+    unittest.main()
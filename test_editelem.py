@@ -26,6 +26,13 @@ class TestGameState(unittest.TestCase):
         elem = self.gs.ps._getname('gen')
         self.assertAlmostEqual(elem.pgen, 0.5, 1)
 
+    def testEditElems(self):
+        """Test editing many elements at once."""
+        self.gs.edit_tiles({'gen': dict(pgen=0.4), 'load': dict(pload=0.8)})
+        time.sleep(0.4)
+        self.assertAlmostEqual(self.gs.ps._getname('gen').pgen, 0.4, 1)
+        self.assertAlmostEqual(self.gs.ps._getname('load').pload, 0.8, 1)
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -51,6 +51,57 @@ class TestSwing(unittest.TestCase):
         # assert that there are 3 elements in the network.
         self.assert_(len(swing.active_nodes()) == 3)
 
+    def testDeepChain(self):
+        """Test that a radial chain deeper than the recursion limit
+        is found, and that cutting it keeps only the swing side."""
+        import sys
+        depth = sys.getrecursionlimit() + 100
+
+        chain = [self.b3]
+        lines = []
+        for i in range(depth):
+            bus = elem.BusElem(bustype=3, name='chain%d' % i)
+            line = elem.LineElem(name='link%d' % i)
+            line.connect([chain[-1], bus])
+            chain.append(bus)
+            lines.append(line)
+
+        swing = elem.SwingHolder()
+        self.assert_(len(swing.active_nodes()) == 2 * depth + 1)
+
+        lines[10].decommission()
+        self.assert_(len(swing.active_nodes()) == 21)
+
+        # reconnect the far half through a new line.
+        lines[10] = elem.LineElem(name='relink')
+        lines[10].connect([chain[10], chain[11]])
+        self.assert_(len(swing.active_nodes()) == 2 * depth + 1)
+
+    def testMeshedCut(self):
+        """Test that cutting a line in a loop does not split the island."""
+        b1 = elem.BusElem(bustype=3, name='loop1')
+        b2 = elem.BusElem(bustype=3, name='loop2')
+        l1 = elem.LineElem(name='loopline1')
+        l2 = elem.LineElem(name='loopline2')
+        l3 = elem.LineElem(name='loopline3')
+        l1.connect([self.b3, b1])
+        l2.connect([b1, b2])
+        l3.connect([b2, self.b3])
+
+        swing = elem.SwingHolder()
+        self.assert_(len(swing.active_nodes()) == 6)
+        l2.decommission()
+        self.assert_(len(swing.active_nodes()) == 5)
+        b2.decommission()
+        self.assert_(len(swing.active_nodes()) == 3)
+
+    def testDemoteSwing(self):
+        """Test that demoting the swing bus changes the topology."""
+        epoch = elem.ChangeJournal().epoch
+        self.b3.bustype = 2
+        self.assert_(elem.SwingHolder()._swing is None)
+        self.assert_(elem.ChangeJournal().epoch > epoch)
+
     def testRubbishSwingBus(self):
         """Assert that a rubbish swing bus cannot be created."""
         self.failUnlessRaises(elem.ElemError, elem.SwingHolder, "Rubbish")
@@ -0,0 +1,89 @@
+import unittest
+import gc
+
+import elem
+from elementstore import ElementStore, Columns
+
+class Owner(object):
+    """Something to own a slot."""
+    pass
+
+class TestColumns(unittest.TestCase):
+    def testSlots(self):
+        """Test that slots are reused and the columns grow."""
+        cols = Columns(('a', 'b'), size=2)
+        one, two, three = Owner(), Owner(), Owner()
+        self.assert_(cols.allocate(one) == 0)
+        self.assert_(cols.allocate(two) == 1)
+        cols.b[1] = 6
+        self.assert_(cols.allocate(three) == 2)
+        self.assert_(cols.size == 4 and cols.b[1] == 6)
+        self.assert_(cols.elem(2) is three)
+
+        cols.release(0)
+        four = Owner()
+        self.assert_(cols.allocate(four) == 0)
+        self.assert_(cols.rows([1]).tolist() == [[0, 6]])
+
+    def testCollected(self):
+        """Test that a slot is freed, and cleared, once its owner is gone."""
+        cols = Columns(('a',), size=2)
+        one = Owner()
+        slot = cols.allocate(one)
+        cols.a[slot] = 5
+        del(one)
+        gc.collect()
+        self.failIf(cols.used[slot])
+        self.assert_(cols.allocate(Owner()) == slot)
+        self.assert_(cols.a[slot] == 0)
+
+class TestStore(unittest.TestCase):
+    def testProxy(self):
+        """Test that element parameters live in the store."""
+        store = ElementStore()
+        b1 = elem.BusElem(name='store1', pgen=3, bustype=3)
+        self.assert_(store.buses.pgen[b1._slot] == 3)
+        b1.pload = 2
+        self.assert_(store.buses.pload[b1._slot] == 2)
+        self.assert_(b1.bustype == 3)
+        self.failUnlessRaises(AttributeError, setattr, b1, 'other', 1)
+
+    def testLineEnds(self):
+        """Test that line ends and flows follow the connections."""
+        store = ElementStore()
+        b1 = elem.BusElem(name='end1', bustype=3)
+        b2 = elem.BusElem(name='end2', bustype=3)
+        l1 = elem.LineElem(name='endline')
+        l1.connect([b1, b2])
+        ends = (store.lines.frm[l1._slot], store.lines.to[l1._slot])
+        self.assert_(sorted(ends) == sorted([b1._slot, b2._slot]))
+
+        self.assert_(l1.pqflow is None)
+        l1.pqflow = (1.0, 0.5, None, None)
+        self.assert_(l1.pqflow[:2] == (1.0, 0.5))
+
+        b2.decommission()
+        self.assert_(store.lines.to[l1._slot] == -1)
+        self.assert_(l1.pqflow is None)
+
+    def testAdjacency(self):
+        """Test the bus to line adjacency."""
+        store = ElementStore()
+        hub = elem.BusElem(name='hub', bustype=3)
+        spokes = []
+        for i in range(3):
+            bus = elem.BusElem(name='spoke%d' % i, bustype=3)
+            line = elem.LineElem(name='spokeline%d' % i)
+            line.connect([hub, bus])
+            spokes.append((bus, line))
+
+        indptr, indices = store.adjacency()
+        def lines_at(bus):
+            return set(indices[indptr[bus._slot]:indptr[bus._slot + 1]])
+
+        self.assert_(lines_at(hub) == set(l._slot for b, l in spokes))
+        for bus, line in spokes:
+            self.assert_(lines_at(bus) == set([line._slot]))
+
+if __name__ == '__main__':
+    unittest.main()
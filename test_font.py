@@ -0,0 +1,51 @@
+import unittest
+
+import font
+from constants import BLACK, WHITE, TRANSPARENT
+
+class TestTextCache(unittest.TestCase):
+    """Test rendered texts are shared, and the least recently used are
+    dropped."""
+    def setUp(self):
+        font._texts.clear()
+
+    def testHit(self):
+        """Test the same text is rendered once."""
+        first = font.small_font('volts', BLACK)
+        self.assert_(font.small_font('volts', BLACK) is first)
+        self.assert_(len(font._texts) == 1)
+
+    def testKeys(self):
+        """Test texts differing in colour, background, size or width are
+        rendered apart."""
+        texts = [font.small_font('a power line', BLACK),
+                font.small_font('a power line', WHITE),
+                font.small_font('a power line', BLACK, WHITE),
+                font.large_font('a power line', BLACK),
+                font.small_font('a power line', BLACK, width=5)]
+        self.assert_(len(set(map(id, texts))) == 5)
+        self.assert_(len(font._texts) == 5)
+        # wrapped onto more lines.
+        self.assert_(texts[4].get_height() > texts[0].get_height())
+        self.assert_(font.small_font('a power line', WHITE) is texts[1])
+
+    def testEviction(self):
+        """Test the cache holds TEXT_CACHE texts, dropping the least
+        recently used."""
+        first = font.small_font('0', BLACK)
+        second = font.small_font('1', BLACK)
+        for i in range(2, font.TEXT_CACHE):
+            font.small_font(str(i), BLACK)
+        self.assert_(len(font._texts) == font.TEXT_CACHE)
+
+        # using the first makes the second the least recently used.
+        self.assert_(font.small_font('0', BLACK) is first)
+        font.small_font('full', BLACK)
+        self.assert_(len(font._texts) == font.TEXT_CACHE)
+        self.assert_(font.small_font('0', BLACK) is first)
+        self.assert_(('1', BLACK, TRANSPARENT, font.DEFAULT_FONT_SIZE, 
+                        False, None) not in font._texts)
+        self.assert_(font.small_font('1', BLACK) is not second)
+
+if __name__ == '__main__':
+    unittest.main()
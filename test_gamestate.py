@@ -1,8 +1,9 @@
 #!/usr/bin/env python
 import unittest
 
-from gamestate import GameState
+from gamestate import GameState, Dispatch, ElemRegister
 
+import gc
 import time
 
 
@@ -48,6 +49,23 @@ class TestGameState(unittest.TestCase):
         time.sleep(0.1)
         self.assert_(True)
 
+    def testRename(self):
+        """Test an element is only renamed to a name not in use."""
+        gs = self.gs
+        listener = Listener()
+        gs.register('rename', listener.hear)
+        try:
+            gs.ps.add_bus('renamed', pload=1)
+            elemid = gs.ps.ids.lookup('renamed')
+            gs.rename('renamed', 'load')
+            self.assert_(gs.name(elemid) == 'renamed')
+            gs.rename('renamed', 'renamed again')
+            self.assert_(gs.name(elemid) == 'renamed again')
+            self.assert_(listener.heard == [((elemid, 'renamed again'),)])
+        finally:
+            gs._dispatch.unregister('rename', listener.hear)
+            gs.ps.decommission_element(elemid)
+
     def testEditElem(self):
         """Test the ability to edit the element."""
         self.assert_(True)
@@ -60,6 +78,108 @@ class TestGameState(unittest.TestCase):
         ##self.gs.edit_tile('gen', dict(pgen=0.5))
         #time.sleep(0.4)
 
+class Listener(object):
+    def __init__(self):
+        self.heard = []
+
+    def hear(self, *args):
+        self.heard.append(args)
+
+class TestDispatch(unittest.TestCase):
+    """Test the registry of event listeners."""
+    def setUp(self):
+        self.dispatch = Dispatch()
+
+    def tearDown(self):
+        for name in ('one', 'two'):
+            self.dispatch.deregister(name)
+
+    def testOnce(self):
+        """a listener registered twice hears each event once."""
+        listener = Listener()
+        self.dispatch.register('one', listener.hear)
+        self.dispatch.register('one', listener.hear)
+        self.dispatch('one', 1)
+        self.assert_(listener.heard == [(1,)])
+        self.assert_(len(self.dispatch.listeners('one')) == 1)
+
+    def testTopic(self):
+        """only the listeners of the event's name hear it."""
+        one, two = Listener(), Listener()
+        self.dispatch.register('one', one.hear)
+        self.dispatch.register('two', two.hear)
+        self.dispatch('one', 1)
+        self.assert_(one.heard == [(1,)])
+        self.assert_(two.heard == [])
+
+    def testUnregister(self):
+        one, two = Listener(), Listener()
+        self.dispatch.register('one', one.hear)
+        self.dispatch.register('one', two.hear)
+        self.dispatch.unregister('one', one.hear)
+        self.dispatch('one', 1)
+        self.assert_(one.heard == [])
+        self.assert_(two.heard == [(1,)])
+
+        self.dispatch.unregister('one', two.hear)
+        self.assert_(not self.dispatch.registered('one'))
+
+    def testCollected(self):
+        """a listener's object is not kept alive by registering."""
+        listener = Listener()
+        self.dispatch.register('one', listener.hear)
+        self.assert_(self.dispatch.registered('one'))
+        del(listener)
+        gc.collect()
+        self.assert_(not self.dispatch.registered('one'))
+
+    def testFunction(self):
+        """a plain function is kept for as long as it is registered."""
+        heard = []
+        def hear(value):
+            heard.append(value)
+        self.dispatch.register('one', hear)
+        del(hear)
+        gc.collect()
+        self.dispatch('one', 1)
+        self.assert_(heard == [1])
+
+class TestElemRegister(unittest.TestCase):
+    """Test the online status of elements."""
+    def setUp(self):
+        self.el = ElemRegister()
+        for elemid in (1001, 1002, 1003):
+            self.el.register(elemid)
+
+    def tearDown(self):
+        for elemid in (1001, 1002, 1003):
+            self.el.remove(elemid)
+
+    def testNew(self):
+        """a new element not in the next solution goes offline."""
+        self.assert_(self.el.solved([1001, 1002]) == set([1003]))
+        self.assert_(self.el.online(1001))
+        self.assert_(not self.el.online(1003))
+
+    def testTransitions(self):
+        """only the elements that change are reported."""
+        self.el.solved([1001, 1002, 1003])
+        self.assert_(self.el.solved([1001, 1002, 1003]) == set())
+        self.assert_(self.el.solved([1001]) == set([1002, 1003]))
+        self.assert_(self.el.solved([1001]) == set())
+        self.assert_(self.el.solved([1001, 1002]) == set())
+        self.assert_(self.el.online(1002))
+
+    def testFailed(self):
+        self.el.solved([1001, 1002])
+        self.assert_(self.el.failed() == set([1001, 1002]))
+        self.assert_(self.el.failed() == set())
+
+    def testRemoved(self):
+        self.el.solved([1001, 1002, 1003])
+        self.el.remove(1002)
+        self.assert_(self.el.solved([1001]) == set([1003]))
+
 if __name__ == '__main__':
     unittest.main()
 
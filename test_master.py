@@ -0,0 +1,113 @@
+import os
+import unittest
+import threading
+
+# the master's window is opened without a display.
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import pygame
+from pygame.locals import *
+
+import controller
+from master import Master, BaseChild
+
+class Recorder(BaseChild):
+    """A child that notes the thread each of its loops is run in, and
+    the events it is given."""
+    def init(self, **kws):
+        self.surface = self.parent.reserve(child=self, topleft=(0, 0),
+                                            size=(20, 20))
+        self.parent.listen(self, (KEYDOWN,))
+        self.threads = []
+        self.heard = []
+        # the number of loops after which to send exit, if any.
+        self.exit_after = kws.get('exit_after')
+
+    def _loop(self, events):
+        self.threads.append(threading.currentThread())
+        self.heard.extend(event.key for event in events)
+        if len(self.threads) == self.exit_after:
+            self.controller.send('exit', None)
+
+    def _redraw(self):
+        return self.surface
+
+def key(k):
+    pygame.event.post(pygame.event.Event(KEYDOWN, key=k))
+
+class TestScheduled(unittest.TestCase):
+    """Test the children run in turn on the main thread when scheduled."""
+    def setUp(self):
+        self.m = Master(size=(100, 100), depth=32, scheduled=True)
+        self.a = self.m.add_child(Recorder)
+        self.b = self.m.add_child(Recorder)
+        pygame.event.clear()
+
+    def tearDown(self):
+        # the controller is shared, put it back as it was.
+        controller.Controller().synchronous = False
+
+    def frame(self):
+        self.m.prune()
+        self.m.events()
+        self.m.step()
+        self.m.redraw()
+
+    def testNoThreads(self):
+        """Test no thread is started for a scheduled child."""
+        self.assert_(not self.a.isAlive() and not self.b.isAlive())
+        self.assert_(self.a.running.isSet() and self.b.running.isSet())
+
+    def testPause(self):
+        """Test only the running child is stepped, and given events."""
+        a, b = self.a, self.b
+        main = threading.currentThread()
+
+        a.resume()
+        key(K_a)
+        self.frame()
+        self.assert_(a.threads == [main] and a.heard == [K_a])
+        self.assert_(b.threads == [] and b.heard == [])
+
+        a.suspend()
+        b.resume()
+        key(K_b)
+        self.frame()
+        self.assert_(a.threads == [main] and a.heard == [K_a])
+        self.assert_(b.threads == [main] and b.heard == [K_b])
+
+    def testStop(self):
+        """Test a stopped child is not stepped again, and is pruned."""
+        a, b = self.a, self.b
+        a.resume()
+        b.resume()
+        self.frame()
+        b.stop()
+        self.frame()
+        self.assert_(len(a.threads) == 2 and len(b.threads) == 1)
+        self.assert_(self.m.children == [a])
+        self.assert_([child for child, types in self.m.listening] == [a])
+
+    def testSynchronous(self):
+        """Test the controller calls listeners in the sending thread."""
+        c = controller.Controller()
+        self.assert_(c.synchronous)
+        threads = []
+        def listener(event):
+            threads.append(threading.currentThread())
+        c.register('scheduled', listener)
+        c.send('scheduled', None)
+        self.assert_(threads == [threading.currentThread()])
+
+    def testExit(self):
+        """Test the main loop runs the children until one sends exit."""
+        m = self.m
+        child = m.add_child(Recorder, exit_after=3)
+        child.resume()
+        m.mainloop()
+        self.assert_(not m.running)
+        self.assert_(child.threads == [threading.currentThread()] * 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from StringIO import StringIO
+import json
+import time
+
+from metrics import Metrics, Histogram
+import powersystem
+
+class TestHistogram(unittest.TestCase):
+    def testPercentiles(self):
+        """Test percentiles are within the bucket precision."""
+        h = Histogram()
+        for ms in range(1, 1001):
+            h.record(ms / 1000.0)
+        self.assert_(h.count == 1000)
+        self.assertAlmostEqual(h.mean(), 0.5005, 6)
+        for percent, value in ((50, 0.5), (90, 0.9), (99, 0.99)):
+            self.assert_(abs(h.percentile(percent) - value) < value / 64.0)
+        self.assert_(h.percentile(100) == 1.0)
+        self.assert_(h.min == 0.001 and h.max == 1.0)
+
+    def testSmall(self):
+        """Test small values are counted exactly."""
+        h = Histogram()
+        h.record(5e-6)
+        h.record(0)
+        self.assertAlmostEqual(h.percentile(100), 5e-6, 12)
+        self.assert_(h.percentile(50) == 0)
+
+    def testEmpty(self):
+        h = Histogram()
+        self.assert_(h.percentile(50) is None and h.mean() is None)
+
+class TestMetrics(unittest.TestCase):
+    def testSnapshot(self):
+        m = Metrics()
+        m.counter('a').inc()
+        m.counter('a').inc(2)
+        m.histogram('b').record(0.25)
+        m.gauge('c', lambda: 7)
+        snap = m.snapshot()
+        self.assert_(snap['a'] == 3 and snap['c'] == 7)
+        self.assert_(snap['b']['count'] == 1 and snap['b']['p50'] == 0.25)
+
+        out = StringIO()
+        m.dump(out)
+        self.assert_(json.loads(out.getvalue())['a'] == 3)
+
+    def testPowerSystem(self):
+        """Test the power system times the commands it runs."""
+        ps = powersystem.PowerSystem()
+        ps.start()
+        try:
+            ps.add_bus('john')
+            ps.add_line('phil', connections=['john'])
+            time.sleep(0.1)
+            snap = ps.metrics.snapshot()
+        finally:
+            ps.stop()
+        self.assert_(snap['commands'] == 2)
+        self.assert_(snap['command.latency']['count'] == 2)
+        self.assert_(snap['command.operate']['count'] == 2)
+        self.assert_(snap['queue.depth'] == 0)
+
+if __name__ == '__main__':
+    unittest.main()
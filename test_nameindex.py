@@ -0,0 +1,43 @@
+import unittest
+
+from nameindex import NameIndex
+
+class TestNameIndex(unittest.TestCase):
+    def setUp(self):
+        self.ids = NameIndex()
+
+    def testIntern(self):
+        """Test that a name always interns to the same id."""
+        ids = self.ids
+        john = ids.intern('john')
+        self.assert_(ids.intern('john') == john)
+        self.assert_(ids.intern('mary') != john)
+        self.assert_(ids.intern(john) == john)
+        self.assert_(ids.lookup('john') == john)
+        self.assert_(ids.lookup('phil') is None)
+        self.assert_(ids.name(john) == 'john')
+
+    def testRename(self):
+        """Test that a rename keeps the id, and won't take a used name."""
+        ids = self.ids
+        john = ids.intern('john')
+        ids.intern('mary')
+        self.assert_(ids.rename('john', 'mary') is None)
+        self.assert_(ids.rename('jimbob', 'tuffnuts') is None)
+
+        self.assert_(ids.rename(john, 'susan') == john)
+        self.assert_(ids.lookup('john') is None)
+        self.assert_(ids.lookup('susan') == john)
+        self.assert_(ids.name(john) == 'susan')
+
+    def testRelease(self):
+        """Test that a released name is given a new id."""
+        ids = self.ids
+        john = ids.intern('john')
+        self.assert_(ids.release('john') == john)
+        self.assert_(ids.lookup(john) is None)
+        self.assert_(ids.release('john') is None)
+        self.assert_(ids.intern('john') != john)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,8 @@ import unittest
 import powersystem
 
 import time
+from math import pi
+from numpy import asarray, zeros, arange, repeat
 
 class TestPS(unittest.TestCase):
     """Test the Power System Object."""
@@ -107,6 +109,8 @@ class TestPS(unittest.TestCase):
         # check the change occured.
         self.assert_(ps._getname('john') is None)
         self.assert_(ps._getname('susan') is not None)
+        self.assert_(ps._getname('susan').name == 'susan')
+        self.assert_(ps._getname('susan').elemid == ps.ids.lookup('susan'))
 
         # check that an invalid name change raises no error.
         ps.rename_element('jimbob', 'tuffnuts')
@@ -255,5 +259,56 @@ class TestPS(unittest.TestCase):
         # assert that callback was called.
         self.assert_(called[0] is True)
 
+def slowflow(bus, line, *args, **kws):
+    """A stand in for the load flow that takes SLOW_STEPS iterations of
+    SLOW_STEP seconds, and leaves the network as it was."""
+    bus = asarray(bus)
+    interrupt = kws.get('interrupt')
+    for i in range(SLOW_STEPS):
+        if interrupt is not None:
+            interrupt(bus[:, 1], bus[:, 2] * pi / 180)
+        time.sleep(SLOW_STEP)
+    # a sending and receiving end row per line.
+    flows = zeros((2 * len(line), 5))
+    flows[:, 0] = repeat(arange(len(line)), 2)
+    return bus, flows
+
+SLOW_STEPS = 10
+SLOW_STEP = 0.01
+
+class TestSuperseded(unittest.TestCase):
+    """Test a slow solve is not abandoned for ever by a stream of edits."""
+    def setUp(self):
+        self.loadflow = powersystem.loadflow
+        powersystem.loadflow = slowflow
+        self.ps = powersystem.PowerSystem()
+
+    def tearDown(self):
+        self.ps.stop()
+        powersystem.loadflow = self.loadflow
+
+    def testStream(self):
+        """Test edits posted faster than a solve still get solutions."""
+        ps = self.ps
+        ps.start()
+        ps.add_bus('swing', bustype=1)
+        ps.add_bus('gen', pgen=1, qgen=0.2)
+        ps.add_line('phil', connections=['swing', 'gen'])
+        time.sleep(0.3)
+        self.assert_(ps.solution is True)
+
+        solved = ps.metrics.counter('solves')
+        superseded = ps.metrics.counter('solves.superseded')
+        before = solved.value
+        ps.solution = False
+        # an edit every 2 solver iterations for 10 solves' time.
+        for i in range(5 * SLOW_STEPS):
+            ps.edit_elem('gen', dict(pgen=1 + i * 0.01))
+            time.sleep(2 * SLOW_STEP)
+
+        self.assert_(superseded.value > 0)
+        self.assert_(solved.value > before)
+        self.assert_(ps.solution is True)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,185 @@
+import os
+import unittest
+
+# drawn without a display.
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import pygame
+from pygame.locals import *
+
+import controller
+from constants import GREY, RED, BLUE, WHITE
+from master import Master, BaseChild
+from render import DirtyGroup, report
+
+def setUpModule():
+    pygame.display.init()
+    pygame.display.set_mode((10, 10), 0, 32)
+
+def block(colour, topleft, size=(10, 10), *groups):
+    sprite = pygame.sprite.DirtySprite(*groups)
+    sprite.image = pygame.Surface(size)
+    sprite.image.fill(colour)
+    sprite.rect = pygame.Rect(topleft, size)
+    return sprite
+
+def covered(rects, rect):
+    """Return True if every point of rect is in one of rects."""
+    return all(any(other.collidepoint(x, y) for other in rects)
+                for x in range(rect.left, rect.right)
+                for y in range(rect.top, rect.bottom))
+
+class TestDirtyGroup(unittest.TestCase):
+    """Test only the sprites that change are redrawn."""
+    def setUp(self):
+        self.surface = pygame.Surface((100, 100))
+        self.background = pygame.Surface((100, 100))
+        self.background.fill(GREY)
+        self.surface.blit(self.background, (0, 0))
+        self.group = DirtyGroup()
+        self.red = block(RED, (10, 10), (10, 10), self.group)
+        self.blue = block(BLUE, (50, 50), (10, 10), self.group)
+
+    def draw(self):
+        return self.group.draw(self.surface, self.background)
+
+    def testSteady(self):
+        """Test a frame with nothing changed draws nothing."""
+        rects = self.draw()
+        self.assert_(covered(rects, self.red.rect))
+        self.assert_(covered(rects, self.blue.rect))
+        self.assert_(self.draw() == [])
+        self.assert_(self.draw() == [])
+
+    def testMoved(self):
+        """Test a moved sprite redraws where it was and where it is."""
+        self.draw()
+        old = self.red.rect.copy()
+        self.red.rect.topleft = (70, 20)
+        self.red.dirty = 1
+        rects = self.draw()
+        self.assert_(covered(rects, old) and covered(rects, self.red.rect))
+        self.assert_(not covered(rects, self.blue.rect))
+        # the background shows where it was.
+        self.assert_(self.surface.get_at(old.center)[:3] == GREY)
+        self.assert_(self.surface.get_at(self.red.rect.center)[:3] == RED)
+
+    def testRepaint(self):
+        """Test repaint redraws every sprite."""
+        self.draw()
+        self.group.repaint()
+        rects = self.draw()
+        self.assert_(covered(rects, self.red.rect))
+        self.assert_(covered(rects, self.blue.rect))
+
+class TestReport(unittest.TestCase):
+    """Test a sprite drawing children onto its image has only the parts
+    that changed redrawn."""
+    def setUp(self):
+        self.group = DirtyGroup()
+        self.parent = block(WHITE, (20, 30), (50, 50), self.group)
+        self.surface = pygame.Surface((100, 100))
+        self.background = pygame.Surface((100, 100))
+        self.group.draw(self.surface, self.background)
+
+    def testReport(self):
+        """Test the rects reported are redrawn, on the parent's group."""
+        report(self.parent, [pygame.Rect(5, 5, 10, 10)])
+        self.assert_(self.group.draw(self.surface, self.background) ==
+                        [pygame.Rect(25, 35, 10, 10)])
+
+    def testClipped(self):
+        """Test the rects are kept within the parent."""
+        report(self.parent, [pygame.Rect(45, 45, 10, 10)])
+        self.assert_(self.group.draw(self.surface, self.background) ==
+                        [pygame.Rect(65, 75, 5, 5)])
+
+    def testDirty(self):
+        """Test nothing more is done for a parent redrawn whole."""
+        self.parent.dirty = 1
+        report(self.parent, [pygame.Rect(5, 5, 10, 10)])
+        self.assert_(self.group.draw(self.surface, self.background) ==
+                        [self.parent.rect])
+        report(self.parent, [])
+        self.assert_(self.group.draw(self.surface, self.background) == [])
+
+class Block(BaseChild):
+    """A child showing a block of colour, and the rects it changed."""
+    def init(self, topleft=(0, 0), size=(40, 40), colour=RED):
+        self.surface = self.parent.reserve(child=self, topleft=topleft,
+                                            size=size)
+        self.surface.fill(colour)
+
+    def _redraw(self):
+        return self.surface
+
+class TestPublish(unittest.TestCase):
+    """Test the master puts only the changed parts of a child on the
+    screen, unless the screen under it was drawn over."""
+    def setUp(self):
+        self.m = Master(size=(100, 100), depth=32, scheduled=True)
+        self.below = self.m.add_child(Block, topleft=(10, 10), colour=RED)
+        self.above = self.m.add_child(Block, topleft=(30, 30), colour=BLUE)
+
+    def tearDown(self):
+        # the controller is shared, put it back as it was.
+        controller.Controller().synchronous = False
+
+    def publish(self, child):
+        return self.m.publish(child, child.redraw())
+
+    def testFirst(self):
+        """Test a child is first published whole."""
+        self.below.dirty_rects = []
+        self.assert_(self.publish(self.below) ==
+                        [pygame.Rect(10, 10, 40, 40)])
+
+    def testSteady(self):
+        """Test a child that changed nothing publishes nothing."""
+        self.publish(self.below)
+        self.below.dirty_rects = []
+        self.assert_(self.publish(self.below) == [])
+
+    def testRects(self):
+        """Test the rects changed are published, on the screen."""
+        self.publish(self.below)
+        self.below.dirty_rects = [pygame.Rect(5, 5, 10, 10)]
+        self.assert_(self.publish(self.below) ==
+                        [pygame.Rect(15, 15, 10, 10)])
+        # none given, all of it may have changed.
+        self.below.dirty_rects = None
+        self.assert_(self.publish(self.below) ==
+                        [pygame.Rect(10, 10, 40, 40)])
+
+    def testPruned(self):
+        """Test a child under one that stopped is published whole, and
+        the screen shows it again."""
+        m, below, above = self.m, self.below, self.above
+        self.publish(below)
+        self.publish(above)
+        below.dirty_rects = above.dirty_rects = []
+        self.assert_(self.publish(below) == [])
+        self.assert_(m.screen.get_at((35, 35))[:3] == BLUE)
+
+        above.stop()
+        m.prune()
+        self.assert_(m.children == [below] and below.invalid)
+        self.assert_(self.publish(below) == [pygame.Rect(10, 10, 40, 40)])
+        self.assert_(not below.invalid)
+        self.assert_(m.screen.get_at((35, 35))[:3] == RED)
+        # the area only under the stopped child is background.
+        self.assert_(m.screen.get_at((60, 60))[:3] == GREY)
+        self.assert_(self.publish(below) == [])
+
+    def testResumed(self):
+        """Test a resumed child is published whole."""
+        self.publish(self.below)
+        self.below.dirty_rects = []
+        self.below.suspend()
+        self.below.resume()
+        self.assert_(self.publish(self.below) ==
+                        [pygame.Rect(10, 10, 40, 40)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import unittest
+
+# the tiles are drawn without a display.
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import pygame
+
+from constants import TILE_HEIGHT, WARNING_UNSELECTED
+from render import RenderCache
+from sprite import Sprite
+from tileobject import Tile
+from tiletypes import Grasstile, Watertile
+
+def setUpModule():
+    pygame.display.init()
+    pygame.display.set_mode((10, 10), 0, 32)
+
+def pixels(image):
+    return pygame.image.tostring(image, 'RGB')
+
+class TestRenderCache(unittest.TestCase):
+    """Test the rendered images are shared by key."""
+    def setUp(self):
+        RenderCache().clear()
+
+    def testGet(self):
+        """Test render is called only the first time a key is asked for."""
+        cache = RenderCache()
+        made = []
+        def render():
+            made.append(pygame.Surface((1, 1)))
+            return made[-1]
+        first = cache.get('key', render)
+        self.assert_(cache.get('key', render) is first)
+        self.assert_(RenderCache().get('key', render) is first)
+        self.assert_(made == [first] and len(cache) == 1)
+        cache.get('other', render)
+        self.assert_(len(made) == 2 and len(cache) == 2)
+        cache.clear()
+        self.assert_(len(RenderCache()) == 0)
+
+class TestTile(unittest.TestCase):
+    """Test tiles of a type in the same state share one image, and it is
+    the image they were drawn with uncached."""
+    def setUp(self):
+        RenderCache().clear()
+
+    def testShared(self):
+        """Test two tiles of a type share one surface."""
+        a, b = Grasstile(), Grasstile()
+        self.assert_(a.image is b.image)
+        self.assert_(len(RenderCache()) == 1)
+        # each has its own rect.
+        a.pos = (40, 0)
+        a.redraw()
+        self.assert_(a.image is b.image and a.rect != b.rect)
+
+    def testColour(self):
+        """Test a tile in another colour gets its own image, and is
+        back on the shared one once the colour is put back."""
+        a, b = Grasstile(), Grasstile()
+        shared = b.image
+        a.setwarning(True)
+        self.assert_(a.colour == WARNING_UNSELECTED)
+        self.assert_(a.image is not shared)
+        self.assert_(pixels(a.image) != pixels(shared))
+        self.assert_(b.image is shared)
+        a.setwarning(False)
+        self.assert_(a.image is shared)
+
+    def testSize(self):
+        """Test tiles of another size or picture get their own images."""
+        small = Tile((0, 0), [], TILE_HEIGHT / 2, 'grass.png')
+        big = Tile((0, 0), [], TILE_HEIGHT, 'grass.png')
+        grass, water = Grasstile(), Watertile()
+        self.assert_(small.image.get_size() == (TILE_HEIGHT / 2,) * 2)
+        self.assert_(big.image is grass.image)
+        self.assert_(small.image is not big.image)
+        self.assert_(water.image is not grass.image)
+        self.assert_(len(RenderCache()) == 3)
+
+    def testUncached(self):
+        """Test the shared image is the one the tile renders itself."""
+        a = Grasstile()
+        a.setwarning(True)
+        b = Grasstile()
+        b.setwarning(True)
+        self.assert_(b.image is a.image)
+        self.assert_(pixels(b.image) == pixels(b._Tile__render()))
+        self.assert_(b.image.get_colorkey() ==
+                        b._Tile__render().get_colorkey())
+
+class TestSprite(unittest.TestCase):
+    """Test sprites of a picture in the same state share one image."""
+    def setUp(self):
+        RenderCache().clear()
+
+    def testShared(self):
+        a = Sprite((0, 0), [], 'coal.png')
+        b = Sprite((30, 0), [], 'coal.png')
+        c = Sprite((0, 0), [], 'grass.png')
+        self.assert_(a.image is b.image and a.rect != b.rect)
+        self.assert_(c.image is not a.image)
+
+    def testUncached(self):
+        """Test the shared image is the one the sprite renders itself."""
+        a = Sprite((0, 0), [], 'coal.png')
+        b = Sprite((0, 0), [], 'coal.png')
+        image, rect = b._Sprite__drawboundingbox(b.colour)
+        self.assert_(pixels(a.image) == pixels(image))
+
+if __name__ == '__main__':
+    unittest.main()
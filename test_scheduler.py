@@ -0,0 +1,68 @@
+import unittest
+
+from scheduler import SolveScheduler
+
+class TestScheduler(unittest.TestCase):
+    """Test the solve timing decisions with a fake clock."""
+    def setUp(self):
+        self.s = SolveScheduler(latency=0.1, budget=0.5, idle=0.1,
+                                smoothing=1.0)
+
+    def testFirstSolve(self):
+        """Test that the first solve is due immediately."""
+        self.assert_(self.s.due(now=0))
+
+    def testSmallNetwork(self):
+        """Test that a cheap solve reacts to a command at once."""
+        s = self.s
+        s.solved(10.0, 10.001)
+        s.arrived(now=10.002)
+        self.assert_(s.due(now=10.003))
+
+    def testIdle(self):
+        """Test that an unchanged network is refreshed every idle period."""
+        s = self.s
+        s.solved(10.0, 10.001)
+        self.failIf(s.due(now=10.05))
+        self.assertAlmostEqual(s.wait(now=10.05), 0.05)
+        self.assert_(s.due(now=10.1))
+
+    def testBudget(self):
+        """Test that an expensive solve is spaced to the cpu budget."""
+        s = self.s
+        s.solved(10.0, 11.0)
+        s.arrived(now=11.0)
+        # a 1 second solve at a 50% budget, no sooner than 2 seconds.
+        self.failIf(s.due(now=11.5))
+        self.assert_(s.due(now=12.0))
+
+    def testBatching(self):
+        """Test that a burst of commands is held to batch, but never
+        past the target latency."""
+        s = self.s
+        s.budget = 1.0
+        s.solved(10.0, 10.05)
+        s.arrived(now=10.05)
+        s.arrived(now=10.06)
+        self.failIf(s.due(now=10.061))
+        self.assert_(s.due(now=10.07))
+        # a continuous stream is cut off at the latency slack.
+        for i in range(1, 10):
+            s.arrived(now=10.06 + i * 0.005)
+        self.assert_(s.due(now=10.05 + s.slack()))
+
+    def testAbandoned(self):
+        """Test that an abandoned solve does not lower the solve cost,
+        and leaves the network to be solved."""
+        s = self.s
+        s.solved(10.0, 11.0)
+        s.arrived(now=11.5)
+        s.solved(12.0, 12.01, abandoned=True)
+        self.assert_(s.solve_cost == 1.0)
+        self.assert_(s.dirty)
+        # still spaced to the budget from the abandoned solve's start.
+        self.failIf(s.due(now=13.5))
+        self.assert_(s.due(now=14.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,450 @@
+import os
+import unittest
+
+# the map is drawn without a display.
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import pygame
+
+import tilemesh
+from constants import TILE_HEIGHT, TRANSPARENT, GREY
+from gamestate import GameState
+from tilemesh import Mesh, _layout, _inhex, COLUMN, ROW, ODD
+from tilemesh import CHUNK, CHUNK_SIZE
+from tiletypes import Grasstile, Watertile, Coaltile, Linetile
+
+# the size of the test map, in tiles.
+SIZE = (6, 5)
+
+def setUpModule():
+    # a 32 bit display, the dummy driver's default of 8 bits has no
+    #  palette to copy the tiles with.
+    pygame.display.init()
+    pygame.display.set_mode((10, 10), 0, 32)
+
+def locations((xdim, ydim)):
+    return [(x, y) for x in range(xdim) for y in range(ydim)]
+
+def tilerect(location):
+    """Return the area of the map covered by the tile's image."""
+    return pygame.Rect(_layout(location), (TILE_HEIGHT, TILE_HEIGHT))
+
+def distance(location, pos):
+    rect = tilerect(location)
+    return (rect.centerx - pos[0]) ** 2 + (rect.centery - pos[1]) ** 2
+
+class TestPick(unittest.TestCase):
+    """Test the tile under a position is found from the layout, against
+    a search of every tile on the map."""
+    def setUp(self):
+        self.mesh = Mesh([], {'default': (Grasstile, ())}, SIZE, (0, 0))
+
+    def testLayout(self):
+        """Test the odd columns are placed ODD further down."""
+        self.assert_(_layout((0, 0)) == (0, 0))
+        self.assert_(_layout((1, 0)) == (COLUMN, ODD))
+        self.assert_(_layout((2, 1)) == (2 * COLUMN, ROW))
+        self.assert_(_layout((3, 2)) == (3 * COLUMN, 2 * ROW + ODD))
+
+    def testInHex(self):
+        """Test the hexagon's middle is inside it, and its corners are
+        not."""
+        middle = TILE_HEIGHT / 2
+        self.assert_(_inhex((middle, tilemesh.HEX_HALF)))
+        self.assert_(not _inhex((0, 0)))
+        self.assert_(not _inhex((TILE_HEIGHT - 1, 0)))
+        self.assert_(not _inhex((0, 2 * tilemesh.HEX_HALF - 1)))
+        self.assert_(not _inhex((middle, 2 * tilemesh.HEX_HALF + 1)))
+
+    def testPick(self):
+        """Test every position on the map picks a tile whose hexagon is
+        under it, or between hexagons the closest tile whose image is."""
+        mesh = self.mesh
+        cells = locations(SIZE)
+        width, height = mesh.mapsize
+        between = odd = 0
+        for px in range(-2, width + 2):
+            for py in range(-2, height + 2):
+                pos = (px, py)
+                tile = mesh.pick(pos)
+                picked = tile and tile.location
+
+                inside = [location for location in cells
+                            if _inhex((px - _layout(location)[0],
+                                        py - _layout(location)[1]))]
+                if inside:
+                    self.assert_(picked in inside, (pos, picked, inside))
+                    odd += picked[0] % 2
+                    continue
+
+                covering = [location for location in cells
+                                if tilerect(location).collidepoint(pos)]
+                if covering:
+                    between += 1
+                    nearest = min(distance(location, pos)
+                                    for location in covering)
+                    self.assert_(picked in covering, (pos, picked, covering))
+                    self.assert_(distance(picked, pos) == nearest)
+                else:
+                    self.assert_(picked is None, (pos, picked))
+        # both the fall back and the odd columns were tried.
+        self.assert_(between and odd)
+
+    def testOddColumn(self):
+        """Test the odd columns are picked ODD down, and the gap above
+        the first odd tile is empty."""
+        mesh = self.mesh
+        for location in [(1, 0), (3, 2), (5, 4)]:
+            middle = tilerect(location).center
+            self.assert_(mesh.pick(middle).location == location)
+        self.assert_(mesh.pick((COLUMN + TILE_HEIGHT / 2, 2)) is None)
+        # the odd columns reach below the bottom of the even ones.
+        left, top = _layout((1, SIZE[1] - 1))
+        self.assert_(mesh.pick((left + TILE_HEIGHT / 2, top + 20)).location ==
+                        (1, SIZE[1] - 1))
+
+class TestMesh(unittest.TestCase):
+    """Test the tiles and terrain of the map are kept in step as tiles
+    are built, sold and moused over."""
+    def setUp(self):
+        # water along the top row, members are by row then column.
+        members = {'default': (Grasstile, ())}
+        for x in range(SIZE[0]):
+            members[(0, x)] = (Watertile, ())
+        self.mesh = Mesh([], members, SIZE, (0, 0))
+        self.grass = self.mesh.terrain[1, 0]
+        self.water = self.mesh.terrain[0, 0]
+
+    def tearDown(self):
+        # put back the game state's own add_tile.
+        GameState().__dict__.pop('add_tile', None)
+
+    def mouseover(self, location):
+        pos = tilerect(location).center
+        self.mesh._Mesh__mouseover(pos)
+
+    def testTerrain(self):
+        """Test the terrain is kept in the grid, without any tiles."""
+        mesh = self.mesh
+        self.assert_(self.grass != self.water)
+        self.assert_((mesh.terrain[0] == self.water).all())
+        self.assert_((mesh.terrain[1:] == self.grass).all())
+        self.assert_(mesh._tiles == {})
+
+    def testKinds(self):
+        """Test a tile is made once for each kind of terrain, and once
+        for each tile built."""
+        made = []
+        class Grass(Grasstile):
+            def __init__(self, *args):
+                made.append(self.type)
+                Grasstile.__init__(self, *args)
+        class Coal(Coaltile):
+            def __init__(self, *args):
+                made.append(self.type)
+                Coaltile.__init__(self, *args)
+
+        members = {'default': (Grass, ())}
+        for x in range(SIZE[0]):
+            members[(0, x)] = (Grass, ())
+        members[(1, 1)] = members[(3, 3)] = (Coal, ())
+        mesh = Mesh([], members, SIZE, (0, 0))
+        self.assert_(sorted(made) == ['Coal', 'Coal', 'Grass'])
+        self.assert_(len(mesh._tiles) == 2)
+        self.assert_(mesh._kinds == [(Grass, ())])
+
+        # and nothing more to draw the map.
+        for chunk in mesh._chunks.values():
+            chunk.draw()
+        self.assert_(len(made) == 3)
+
+    def testBuildSell(self):
+        """Test a tile built on the terrain and sold back leaves the
+        terrain as it was, drawn again once the tile is gone."""
+        mesh = self.mesh
+        location = (2, 3)
+        chunk = mesh._Mesh__chunk(location)
+        chunk.draw()
+        middle = tilerect(location).center
+        painted = chunk.back.get_at(middle)
+        self.assert_(painted != TRANSPARENT)
+
+        coal = Coaltile()
+        coal.set_xy(location)
+        mesh.addtile(coal, location)
+        self.assert_(mesh._tiles == {location: coal})
+        self.assert_(coal.elemid is not None)
+        self.assert_(mesh.terrain[3, 2] == self.grass)
+        self.assert_(chunk.back.get_at(middle) == TRANSPARENT)
+        # the built tile is picked, not the terrain under it.
+        self.assert_(mesh.pick(middle) is coal)
+
+        mesh.sell_tile(coal)
+        self.assert_(mesh._tiles == {})
+        self.assert_(coal not in mesh.active)
+        self.assert_(mesh.terrain[3, 2] == self.grass)
+        self.assert_(chunk.back.get_at(middle) == painted)
+        # and it's terrain to build on again.
+        self.assert_(mesh.pick(middle).type == 'Grass')
+
+    def testBuildTerrain(self):
+        """Test building terrain changes the grid, not the tiles."""
+        mesh = self.mesh
+        mesh.addtile(Watertile(), (4, 4))
+        self.assert_(mesh.terrain[4, 4] == self.water)
+        self.assert_(mesh._tiles == {})
+
+    def testBuiltOn(self):
+        """Test a tile can't be built over another."""
+        mesh = self.mesh
+        coal = Coaltile()
+        mesh.addtile(coal, (1, 1))
+        mesh.addtile(Linetile(), (1, 1))
+        self.assert_(mesh._tiles == {(1, 1): coal})
+
+    def testHover(self):
+        """Test the terrain tile under the mouse is dropped once the
+        mouse moves on."""
+        mesh = self.mesh
+        self.mouseover((1, 1))
+        hovered = mesh._tiles[(1, 1)]
+        self.assert_(hovered.type == 'Grass' and mesh._hover is hovered)
+
+        self.mouseover((2, 0))
+        self.assert_(mesh._tiles.keys() == [(2, 0)])
+        self.assert_(mesh._tiles[(2, 0)].type == 'Water')
+        self.assert_(hovered not in mesh.active)
+
+        # off the map.
+        mesh._Mesh__mouseover((-10, -10))
+        self.assert_(mesh._tiles == {} and mesh._hover is None)
+
+    def testHoverBuilt(self):
+        """Test building on the hovered terrain replaces its tile, and a
+        built tile is kept when the mouse moves on."""
+        mesh = self.mesh
+        self.mouseover((3, 2))
+        hovered = mesh._hover
+        coal = Coaltile()
+        mesh.addtile(coal, (3, 2))
+        self.assert_(mesh._tiles == {(3, 2): coal})
+        self.assert_(mesh._hover is None and hovered not in mesh.active)
+
+        self.mouseover((3, 2))
+        self.assert_(mesh._hover is coal)
+        self.mouseover((0, 3))
+        self.assert_(sorted(mesh._tiles) == [(0, 3), (3, 2)])
+
+    def testAdjacent(self):
+        """Test the adjacent tiles are the six nearest, in both even and
+        odd columns and at the edges of the map."""
+        mesh = self.mesh
+        cells = locations(SIZE)
+        for location in cells:
+            mesh.gettile(location)
+
+        def near(location):
+            # the neighbours are ROW or less apart, the next nearest
+            #  tiles are nearly twice that.
+            x, y = _layout(location)
+            return set(other for other in cells if other != location and
+                        (_layout(other)[0] - x) ** 2 +
+                        (_layout(other)[1] - y) ** 2 <= ROW ** 2)
+
+        for location in cells:
+            adjacent = set(tile.location
+                            for tile in mesh._adjacent(location))
+            self.assert_(adjacent == near(location), location)
+
+        self.assert_(len(mesh._adjacent((2, 2))) == 6)
+        self.assert_(len(mesh._adjacent((3, 2))) == 6)
+        # corners, the odd column sits lower.
+        self.assert_(len(mesh._adjacent((0, 0))) == 2)
+        self.assert_(len(mesh._adjacent((5, 0))) == 3)
+        self.assert_(len(mesh._adjacent((5, 4))) == 2)
+
+    def testAddTiles(self):
+        """Test tiles added together are each connected to the tiles
+        next to them already in the game state."""
+        gs = GameState()
+        added = []
+        add_tile = gs.add_tile
+        def record(tiletype, info, connections=None):
+            elemid = add_tile(tiletype, info, connections)
+            added.append((elemid, connections))
+            return elemid
+        gs.add_tile = record
+
+        mesh = self.mesh
+        west, line, east = Coaltile(), Linetile(), Coaltile()
+        # (2, 3) and (4, 3) are both next to (3, 2), not to each other.
+        mesh.addtiles({(4, 3): east, (3, 2): line, (2, 3): west})
+        self.assert_(added == [(west.elemid, []),
+                                (line.elemid, [west.elemid]),
+                                (east.elemid, [line.elemid])])
+
+        # a later tile joins all its built neighbours.
+        added[:] = []
+        south = Linetile()
+        mesh.addtile(south, (3, 3))
+        elemid, connections = added[0]
+        self.assert_(sorted(connections) ==
+                        sorted([west.elemid, line.elemid, east.elemid]))
+
+# a map of several chunks, and the size of the view onto it.
+BIG = (40, 20)
+VIEW = (300, 200)
+
+# the mouse, away from the map.
+AWAY = ((-1000, -1000), (0, 0, 0))
+
+class TestChunks(unittest.TestCase):
+    """Test the map drawn a chunk at a time, and only the chunks in view,
+    is the same as drawing every tile."""
+    def setUp(self):
+        members = {'default': (Grasstile, ())}
+        # water across a row, and down a column between two chunks.
+        for x in range(BIG[0]):
+            members[(3, x)] = (Watertile, ())
+        for y in range(BIG[1]):
+            members[(y, CHUNK + 1)] = (Watertile, ())
+        members[(5, 5)] = (Coaltile, ())
+        members[(CHUNK, CHUNK)] = (Linetile, ())
+        members[(CHUNK - 1, CHUNK - 1)] = (Coaltile, ())
+        self.mesh = Mesh([], members, BIG, (0, 0), view=VIEW)
+
+        # chunk -> the rectangles of the map each draw changed.
+        self.drawn = {}
+        for chunk in self.mesh._chunks.values():
+            self.count(chunk)
+
+    def count(self, chunk):
+        draw = chunk.draw
+        drawn = self.drawn[chunk.cells] = []
+        def counted():
+            rects = draw()
+            drawn.append(rects)
+            return rects
+        chunk.draw = counted
+
+    def look(self, zoom, (x, y)):
+        """Show the map at zoom, from x, y on the map."""
+        mesh = self.mesh
+        mesh.zoom_by(zoom / mesh.zoom, about=mesh.pos)
+        mesh.scroll(((x - mesh.offset[0]) * zoom, 
+                        (y - mesh.offset[1]) * zoom))
+        mesh.update(AWAY)
+
+    def chunkimage(self, (cx, cy)):
+        """Return the tiles of a chunk, each drawn directly."""
+        mesh = self.mesh
+        surface = pygame.Surface(CHUNK_SIZE)
+        surface.fill(TRANSPARENT)
+        surface.set_colorkey(TRANSPARENT)
+        left, top = cx * CHUNK, cy * CHUNK
+        cells = [(x, y) for y in range(top, min(top + CHUNK, BIG[1]))
+                        for x in range(left, min(left + CHUNK, BIG[0]))]
+        origin = _layout((left, top))
+        # the terrain, then what is built, in place of the terrain.
+        built = [location for location in cells if location in mesh._tiles]
+        for location in cells:
+            if location in built:
+                continue
+            x, y = location
+            image = mesh._images[mesh.terrain[y, x]]
+            surface.blit(image, (_layout(location)[0] - origin[0],
+                                    _layout(location)[1] - origin[1]))
+        for location in built:
+            surface.blit(mesh._tiles[location].image,
+                            (_layout(location)[0] - origin[0],
+                                _layout(location)[1] - origin[1]))
+        return origin, surface
+
+    def expected(self):
+        """Return the view, from every chunk drawn tile by tile."""
+        mesh = self.mesh
+        zoom = mesh.zoom
+        x, y = mesh.offset
+        view = pygame.Surface(VIEW)
+        view.fill(GREY)
+        for cy in range((BIG[1] + CHUNK - 1) // CHUNK):
+            for cx in range((BIG[0] + CHUNK - 1) // CHUNK):
+                (left, top), image = self.chunkimage((cx, cy))
+                if zoom != 1:
+                    width, height = CHUNK_SIZE
+                    image = pygame.transform.scale(image, 
+                                (int(width * zoom + 0.5), 
+                                    int(height * zoom + 0.5)))
+                view.blit(image, (int((left - x) * zoom), 
+                                    int((top - y) * zoom)))
+        return view
+
+    def testCompose(self):
+        """Test the view is pixel for pixel the tiles drawn directly, at
+        each zoom and from across the map."""
+        mesh = self.mesh
+        for zoom in (1.0, 2.0, 0.5, 0.25):
+            for offset in ((0, 0), (250, 130), (340, 420), (600, 400)):
+                self.look(zoom, offset)
+                shown = pygame.Surface(VIEW)
+                shown.fill(GREY)
+                shown.blit(mesh.image, (0, 0))
+                self.assert_(pygame.image.tostring(shown, 'RGB') ==
+                                pygame.image.tostring(self.expected(), 'RGB'),
+                                (zoom, mesh.offset))
+
+    def testCulled(self):
+        """Test only the chunks in view are drawn."""
+        mesh = self.mesh
+        self.look(1.0, (0, 0))
+        self.assert_([chunk.cells for chunk in mesh._visible] == [(0, 0)])
+        for chunk in mesh._chunks.values():
+            drawn = self.drawn[chunk.cells]
+            self.assert_(bool(drawn) == (chunk in mesh._visible))
+            self.assert_((chunk.surface is None) == (not drawn))
+
+        # a change out of view waits for the chunk to come into view.
+        far = (BIG[0] - 1, BIG[1] - 1)
+        mesh.addtile(Coaltile(), far)
+        mesh.update(AWAY)
+        self.assert_(self.drawn[(32, 16)] == [])
+
+        # nor are chunks drawn once out of view again.
+        self.look(1.0, (600, 400))
+        self.assert_(self.drawn[(32, 16)])
+        drawn = len(self.drawn[(0, 0)])
+        self.look(1.0, (0, 0))
+        self.look(1.0, (600, 400))
+        mesh.update(AWAY)
+        self.assert_(len(self.drawn[(0, 0)]) == drawn + 1)
+
+    def testDirtyChunk(self):
+        """Test a changed tile redraws only its own chunk."""
+        mesh = self.mesh
+        self.look(1.0, (340, 420))
+        visible = [chunk.cells for chunk in mesh._visible]
+        self.assert_(len(visible) == 4)
+        mesh.update(AWAY)
+        for cells in visible:
+            self.assert_(self.drawn[cells][-1] == [])
+
+        location = (CHUNK + 3, CHUNK + 2)
+        coal = Coaltile()
+        mesh.addtile(coal, location)
+        mesh.update(AWAY)
+        for cells in visible:
+            rects = self.drawn[cells][-1]
+            if cells == (CHUNK, CHUNK):
+                # the tile, drawn over the terrain.
+                self.assert_(tilerect(location).collidelist(rects) != -1)
+            else:
+                self.assert_(rects == [], cells)
+
+        # and once drawn, nothing is.
+        mesh.update(AWAY)
+        for cells in visible:
+            self.assert_(self.drawn[cells][-1] == [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import json
+import os
+import tempfile
+import threading
+import time
+
+from tracing import Tracer
+from command import _OperationEditElement
+import powersystem
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.tracer = Tracer()
+        self.tracer.start(self.path)
+
+    def tearDown(self):
+        self.tracer.stop()
+        os.remove(self.path)
+
+    def testFlow(self):
+        """Test a trace followed across a thread is written as one flow."""
+        tracer = self.tracer
+        trace = tracer.begin()
+        tracer.span('click', time.time(), flow='s')
+
+        def worker(traces):
+            tracer.adopt(traces)
+            tracer.span('work', time.time())
+            tracer.redraw_due(tracer.current())
+        thread = threading.Thread(target=worker, args=(tracer.current(),))
+        thread.start()
+        thread.join()
+
+        traces = tracer.take_redraw()
+        self.assert_(traces == set([trace]))
+        tracer.span('redraw', time.time(), traces, flow='f')
+        tracer.stop()
+
+        events = json.load(open(self.path))['traceEvents']
+        spans = [e['name'] for e in events if e['ph'] == 'X']
+        flows = [e['ph'] for e in events if e['cat'] == 'flow']
+        self.assert_(spans == ['click', 'work', 'redraw'])
+        self.assert_(flows == ['s', 't', 'f'])
+        self.assert_(all(e['id'] == trace for e in events 
+                                            if e['cat'] == 'flow'))
+
+    def testCommand(self):
+        """Test a posted command carries the poster's traces."""
+        ps = powersystem.PowerSystem()
+        trace = self.tracer.begin()
+        ps.add_bus('john')
+        cmd = ps._queue.get_nowait()
+        self.assert_(cmd.traces == (trace,))
+
+        self.tracer.end()
+        ps.add_bus('mary')
+        self.assert_(ps._queue.get_nowait().traces == ())
+
+    def testDisabled(self):
+        """Test nothing is carried when tracing is off."""
+        self.tracer.stop()
+        self.tracer.begin()
+        ps = powersystem.PowerSystem()
+        ps.add_bus('john')
+        self.assert_(ps._queue.get_nowait().traces == ())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy
+
+from wind import WindField
+
+class TestWind(unittest.TestCase):
+    """Test the wind farm output model."""
+    def setUp(self):
+        self.field = WindField(tolerance=0, seed=1)
+        for farm in range(100):
+            self.field.add(farm, size=2.0)
+
+    def testStep(self):
+        """every farm moves on each step, and stays in range."""
+        changes = self.field.step()
+        self.assert_(sorted(changes) == range(100))
+        self.assert_(min(changes.values()) >= 0)
+
+    def testDistribution(self):
+        """the output averages scale * size, the Weibull mean for a
+        shape of 1."""
+        field = self.field
+        total = 0.0
+        for i in range(500):
+            field.step()
+            total += sum(field.output(farm) for farm in range(100))
+        self.assertAlmostEqual(total / (500 * 100), 0.6, 1)
+
+    def testCorrelation(self):
+        """the farms change together with a shared wind."""
+        def spread(correlation):
+            field = WindField(tolerance=0, correlation=correlation, seed=2)
+            for farm in range(50):
+                field.add(farm, size=1.0)
+            for i in range(100):
+                field.step()
+            return numpy.std(field._state[:50])
+        self.assert_(spread(0.95) < spread(0.0))
+
+    def testTolerance(self):
+        """only changes bigger than the tolerance are reported."""
+        field = WindField(tolerance=10, seed=1)
+        field.add('farm', size=1.0)
+        self.assert_(field.step() == {})
+
+    def testRemove(self):
+        field = self.field
+        last = field.output(99)
+        self.assert_(field.remove(0) == 2.0)
+        self.assert_(field.remove(0) is None)
+        self.assert_(len(field) == 99 and 0 not in field)
+        # the last farm was moved into the gap.
+        self.assert_(field.output(99) == last)
+        self.assert_(sorted(field.step()) == range(1, 100))
+
+if __name__ == '__main__':
+    unittest.main()
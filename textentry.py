@@ -5,13 +5,16 @@ from string import maketrans
 from constants import *
 from font import *
 from button import *
+from render import DirtyGroup, draw_children
 
 from textgrab import TextGrab
 
 __all__ = ['Textentry', 'PermaText']
 
 
-class Textentry(pygame.sprite.Sprite):
+class Textentry(pygame.sprite.DirtySprite):
+    # drawn above the panels and mesh.
+    _layer = 1
     def __init__(self, pos, containers, callback, heading='Enter Text..',
                                     num_chars=10, background=None):
         """ A text entry widget. 
@@ -29,7 +32,7 @@ class Textentry(pygame.sprite.Sprite):
         if background is None:
             background = BUTTON_INNER_BASE
 
-        pygame.sprite.Sprite.__init__(self, containers)
+        pygame.sprite.DirtySprite.__init__(self, containers)
 
         self._heading = small_font(heading, WHITE, background)
 
@@ -45,7 +48,7 @@ class Textentry(pygame.sprite.Sprite):
         self._containers = containers
 
         # make close\save button.
-        self._buttons = pygame.sprite.Group()
+        self._buttons = DirtyGroup()
 
         # set the button's position relative to this panel.
         button_posx = self._charwidth.get_width() + 2
@@ -116,6 +119,7 @@ class Textentry(pygame.sprite.Sprite):
     def set_pos(self, pos):
         self.pos = pos
         self.rect.topleft = pos
+        self.dirty = 1
 
     def get_char(self, keycode):
         char = pygame.key.name(keycode)
@@ -146,9 +150,8 @@ class Textentry(pygame.sprite.Sprite):
     def update(self, *args):
         mouse = self._mouseevent(args[0])
 
-        self._buttons.clear(self.image, self.panel)
         self._buttons.update(mouse)
-        self._buttons.draw(self.image)
+        draw_children(self, self._buttons, self.panel)
 
         if self.text == self.displayed_text:
             return
@@ -157,6 +160,7 @@ class Textentry(pygame.sprite.Sprite):
         self.textentry.blit(text, (1,0))
         self.image.blit(self.textentry, (2,self.textentry_posy))
         self.displayed_text = self.text
+        self.dirty = 1
 
     def _mouseevent(self, mouse):
         """
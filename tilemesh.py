@@ -1,54 +1,320 @@
 import pygame
+import numpy
+import time
+from collections import OrderedDict
 
 from constants import *
 from sprite import *
 from tiletypes import *
+from render import DirtyGroup, report
 
 from gamestate import GameState, DefaultTile
+from tracing import Tracer
 
 __all__ = ['Mesh']
 
-
-class Mesh(pygame.sprite.Sprite):
-    def __init__(self, containers, members, size, pos):
-        pygame.sprite.Sprite.__init__(self, containers)
-
-        #make groups
-        self.active = pygame.sprite.RenderUpdates()
-        self.hidden = pygame.sprite.Group()
+# the types of tile that are terrain, kept in the terrain grid rather 
+#  than as tiles. Only terrain can be built on.
+TERRAIN_TYPES = ('Water', 'Grass')
+
+# the offsets of a tile's six neighbours, for tiles in even and in odd 
+#  columns.
+NEIGHBOURS = (
+        ((-1, 0), (-1, -1), (0, -1), (0, 1), (1, 0), (1, -1)),
+        ((-1, 0), (-1, 1), (0, -1), (0, 1), (1, 0), (1, 1)),
+    )
+
+# the tile layout, tiles are placed COLUMN apart in x and ROW apart in
+#  y, with the odd columns ODD further down.
+COLUMN = int(TILE_WIDTH - TILE_B + 2)
+ROW = TILE_HEIGHT - 4
+ODD = TILE_HEIGHT / 2 - 3
+
+# half the height of a tile's hexagon, the hexagon's points are at this
+#  height and TILE_B in from the sides at the top and bottom.
+HEX_HALF = TILE_HEIGHT * HEX_A
+
+def _layout((x, y)):
+    """Return the position of the tile at location x, y."""
+    return x * COLUMN, y * ROW + (x % 2) * ODD
+
+def _inhex((u, v)):
+    """Return True if the position u, v relative to a tile's topleft is
+    inside its hexagon."""
+    rise = abs(v - HEX_HALF)
+    if rise > HEX_HALF:
+        return False
+    inset = TILE_B * rise / HEX_HALF
+    return inset <= u <= TILE_HEIGHT - 1 - inset
+
+# the map is drawn in square chunks of CHUNK tiles a side, each chunk 
+#  onto its own surface. CHUNK is even so every chunk starts on an even 
+#  column.
+CHUNK = 16
+CHUNK_STEP = (CHUNK * COLUMN, CHUNK * ROW)
+# a chunk's tiles overlap the next chunk's.
+CHUNK_SIZE = ((CHUNK - 1) * COLUMN + TILE_HEIGHT, 
+                (CHUNK - 1) * ROW + ODD + TILE_HEIGHT)
+
+# the least number of chunk surfaces kept when off screen.
+CHUNK_CACHE = 64
+
+# limits of the zoom, the scale the map is shown at.
+ZOOM_MIN = 0.25
+ZOOM_MAX = 2.0
+
+class _Chunk(object):
+    """A block of tiles, drawn onto a surface of its own while it is 
+    on screen. The terrain is painted onto a background surface, and the
+    tiles are drawn over it."""
+    def __init__(self, mesh, (cx, cy)):
+        self.mesh = mesh
+        # the location of the first tile, and the position of the chunk.
+        self.cells = (cx * CHUNK, cy * CHUNK)
+        self.origin = (cx * CHUNK_STEP[0], cy * CHUNK_STEP[1])
+        # the area of the map the chunk covers.
+        self.rect = pygame.Rect(self.origin, CHUNK_SIZE)
+        self.tiles = DirtyGroup()
+        self.back = None
+        self.surface = None
+        self._scaled = None
+
+    def draw(self):
+        """Bring the surface up to date, return the rectangles (of the 
+        map) changed."""
+        if self.surface is None:
+            self.back = pygame.Surface(CHUNK_SIZE)
+            self.__paint(self.back.get_rect())
+            self.surface = self.back.copy()
+            self.surface.set_colorkey(TRANSPARENT)
+            self.tiles.repaint()
+            self.tiles.draw(self.surface, self.back)
+            self._scaled = None
+            return [self.rect]
+        rects = self.tiles.draw(self.surface, self.back)
+        if rects:
+            self._scaled = None
+        return [rect.move(self.origin) for rect in rects]
+
+    def retile(self, (x, y)):
+        """Repaint the terrain under the tile at location x, y, after a 
+        tile is built or sold there."""
+        if self.surface is None:
+            # painted when the chunk is next drawn.
+            return
+        left, top = _layout((x, y))
+        area = pygame.Rect(left - self.origin[0], top - self.origin[1], 
+                            TILE_HEIGHT, TILE_HEIGHT)
+        self.__paint(area)
+        self.tiles.repaint_rect(area)
+
+    def __paint(self, area):
+        """Paint the terrain onto area of the background, from the 
+        terrain's shared images. Cells with a tile built on them are
+        left empty."""
+        mesh = self.mesh
+        back = self.back
+        back.set_clip(area)
+        back.fill(TRANSPARENT)
+        x0, y0 = self.cells
+        kinds = mesh.terrain[y0:y0 + CHUNK, x0:x0 + CHUNK].tolist()
+        images = mesh._images
+        tiles = mesh._tiles
+        for j, row in enumerate(kinds):
+            for i, kind in enumerate(row):
+                location = (x0 + i, y0 + j)
+                tile = tiles.get(location)
+                if tile is not None and tile.type not in TERRAIN_TYPES:
+                    continue
+                left, top = _layout(location)
+                back.blit(images[kind], 
+                            (left - self.origin[0], top - self.origin[1]))
+        back.set_clip(None)
+
+    def scaled(self, zoom):
+        """Return the surface at the zoom."""
+        if zoom == 1:
+            return self.surface
+        if self._scaled is None or self._scaled[0] != zoom:
+            width, height = CHUNK_SIZE
+            size = (int(width * zoom + 0.5), int(height * zoom + 0.5))
+            self._scaled = zoom, pygame.transform.scale(self.surface, size)
+        return self._scaled[1]
+
+    def release(self):
+        """Drop the surfaces, they are redrawn when next needed."""
+        self.back = None
+        self.surface = None
+        self._scaled = None
+
+
+class Mesh(pygame.sprite.DirtySprite):
+    """The map of tiles, seen through a viewport that can be scrolled 
+    and zoomed. Only the chunks of the map in view are drawn, and of 
+    those only the tiles that changed.
+
+    The grass and water that cover most of the map are kept as a grid of
+    terrain kinds, drawn from one image per kind. Tiles are only made
+    for what is built, and for the terrain under the mouse."""
+    def __init__(self, containers, members, size, pos, view=None):
+        """size - the number of tiles in x and y.
+        view - the size of the viewport, by default all of the map."""
+        pygame.sprite.DirtySprite.__init__(self, containers)
+
+        #make groups, only the tiles that change are redrawn.
+        self.active = pygame.sprite.Group()
+        # location -> tile, for the tiles on the map.
+        self._tiles = {}
 
         # store the maximum x and y dimensions.
         self._maximums = size
-        
-        #create an array to hold all tiles
-        self.__initarray(members, size)
 
-        mesh = self.__makeback(size)
-        self.background = mesh
-        self.image = pygame.Surface(mesh.get_size())
+        # the chunks of the map, the ones with surfaces in least 
+        #  recently seen order.
+        xdim, ydim = size
+        self._chunks = dict(((cx, cy), _Chunk(self, (cx, cy)))
+                                for cx in range((xdim + CHUNK - 1) // CHUNK)
+                                for cy in range((ydim + CHUNK - 1) // CHUNK))
+        self._drawn = OrderedDict()
+        self._visible = []
+        
+        # the terrain kind of each location, indexed by y then x.
+        self.__initterrain(members, size)
+
+        # the map in pixels.
+        self.mapsize = self.__mapsize(size)
+        if view is None:
+            view = self.mapsize
+        self.image = pygame.Surface(view)
         self.image.set_colorkey(TRANSPARENT)
-        self.image.fill(TRANSPARENT)
+        self.image.fill(GREY)
         self.rect = pygame.Rect(pos, self.image.get_size())
 
+        # the map position at the viewport's topleft, and the scale.
+        self.offset = (0, 0)
+        self.zoom = 1.0
+        self._moved = True
+
         self.pos = pos
         self.kill()
 
         self.replace_tile = None
 
+        # the tiles last hovered over and clicked on.
+        self._hover = None
+        self._bounded = None
+
     def set_panel(self, panel):
         self.panel = panel
 
     def show(self, containers):
         self.add(containers)
 
+    def scroll(self, (dx, dy)):
+        """Move the viewport by dx, dy screen pixels."""
+        x, y = self.offset
+        self.__look(x + dx / self.zoom, y + dy / self.zoom, self.zoom)
+
+    def zoom_by(self, factor, about=None):
+        """Scale the map by factor, keeping the map under about (a 
+        screen position, by default the middle of the viewport) still."""
+        if about is None:
+            about = self.rect.center
+        zoom = min(max(self.zoom * factor, ZOOM_MIN), ZOOM_MAX)
+        u, v = about[0] - self.pos[0], about[1] - self.pos[1]
+        x, y = self.__mappos(about)
+        self.__look(x - u / zoom, y - v / zoom, zoom)
+
+    def __look(self, x, y, zoom):
+        """Set the viewport, kept within the map."""
+        width, height = self.image.get_size()
+        mapwidth, mapheight = self.mapsize
+        x = max(min(x, mapwidth - width / zoom), 0)
+        y = max(min(y, mapheight - height / zoom), 0)
+        if (x, y) != self.offset or zoom != self.zoom:
+            self.offset = (x, y)
+            self.zoom = zoom
+            self._moved = True
+
+    def view(self):
+        """Return the area of the map in the viewport."""
+        width, height = self.image.get_size()
+        return pygame.Rect(self.offset, (int(width / self.zoom) + 1, 
+                                         int(height / self.zoom) + 1))
+
+    def __visible(self):
+        """Return the chunks in the viewport, in drawing order."""
+        view = self.view()
+        xdim, ydim = self._maximums
+        # a chunk's tiles reach into the next chunk's area.
+        left = max(view.left // CHUNK_STEP[0] - 1, 0)
+        top = max(view.top // CHUNK_STEP[1] - 1, 0)
+        right = min(view.right // CHUNK_STEP[0], (xdim - 1) // CHUNK)
+        bottom = min(view.bottom // CHUNK_STEP[1], (ydim - 1) // CHUNK)
+        chunks = []
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                chunk = self._chunks[(cx, cy)]
+                if chunk.rect.colliderect(view):
+                    chunks.append(chunk)
+        return chunks
+
     def update(self, *args):
         try:
             mouse = self.__mouseevent(args[0])
         except KeyError:
             pass
-        self.active.clear(self.image, self.background)
-        self.active.update(mouse)
-        self.active.draw(self.image)
+
+        # culled chunks are neither updated nor drawn, their tiles stay
+        #  dirty until they come into view.
+        visible = self._visible = self.__visible()
+        changed = []
+        for chunk in visible:
+            chunk.tiles.update(mouse)
+            changed.extend(chunk.draw())
+            self._drawn.pop(chunk, None)
+            self._drawn[chunk] = True
+
+        if self._moved:
+            self._moved = False
+            self.__compose(self.image.get_rect())
+            self.dirty = 1
+        else:
+            rects = [self.__viewrect(rect) for rect in changed]
+            rects = [rect for rect in rects if rect]
+            for rect in rects:
+                self.__compose(rect)
+            report(self, rects)
+
+        # drop the surfaces of chunks long out of view.
+        keep = max(CHUNK_CACHE, 2 * len(visible))
+        while len(self._drawn) > keep:
+            chunk, seen = self._drawn.popitem(last=False)
+            chunk.release()
+
+    def __viewrect(self, rect):
+        """Return the part of the viewport showing rect of the map."""
+        x, y = self.offset
+        zoom = self.zoom
+        left = int((rect.left - x) * zoom)
+        top = int((rect.top - y) * zoom)
+        right = int((rect.right - x) * zoom + 1)
+        bottom = int((rect.bottom - y) * zoom + 1)
+        view = pygame.Rect(left, top, right - left, bottom - top)
+        return view.clip(self.image.get_rect())
+
+    def __compose(self, area):
+        """Redraw area of the viewport from the chunk surfaces."""
+        image = self.image
+        x, y = self.offset
+        zoom = self.zoom
+        image.set_clip(area)
+        image.fill(GREY, area)
+        for chunk in self._visible:
+            left, top = chunk.origin
+            image.blit(chunk.scaled(zoom), (int((left - x) * zoom), 
+                                            int((top - y) * zoom)))
+        image.set_clip(None)
 
     def __mouseevent(self, mouse):
         rawpos, button_state = mouse
@@ -56,9 +322,8 @@ class Mesh(pygame.sprite.Sprite):
 
         pos = self.__relativepos(rawpos)
 
-        #Check if mouse cursor is on any tile (tl) when click occurs
-        if sum((pos in tl for tl in self.active)) == 0 and \
-                right == 1:
+        #Check if mouse cursor is on any tile when click occurs
+        if right == 1 and self.pick(pos) is None:
             self.replace_tile = None
 
         self.__mousedown(left, right, pos)
@@ -66,27 +331,103 @@ class Mesh(pygame.sprite.Sprite):
 
         return (pos, button_state)
 
+    def pick(self, pos):
+        """Return the tile at pos (on the map), or None. A tile is made 
+        for the terrain there if needs be.
+        The tile's location is worked out from the layout, only the
+        tiles that may overlap pos are looked at."""
+        px, py = pos
+        xdim, ydim = self._maximums
+        column = int(px // COLUMN)
+        nearest = None
+        for x in (column, column - 1):
+            if not 0 <= x < xdim:
+                continue
+            row = int((py - (x % 2) * ODD) // ROW)
+            for y in (row, row - 1):
+                if not 0 <= y < ydim:
+                    continue
+                left, top = _layout((x, y))
+                if _inhex((px - left, py - top)):
+                    return self.gettile((x, y))
+                # between hexagons, fall back to the closest tile 
+                #  whose image covers pos.
+                rect = pygame.Rect(left, top, TILE_HEIGHT, TILE_HEIGHT)
+                if rect.collidepoint(pos):
+                    distance = ((rect.centerx - px) ** 2 + 
+                                    (rect.centery - py) ** 2)
+                    if nearest is None or distance < nearest[0]:
+                        nearest = distance, (x, y)
+        if nearest is not None:
+            return self.gettile(nearest[1])
+        return None
+
+    def gettile(self, location):
+        """Return the tile at location, making one for the terrain there
+        if nothing is built on it."""
+        tile = self._tiles.get(location)
+        if tile is None:
+            x, y = location
+            tileobject, args = self._kinds[self.terrain[y, x]]
+            tile = tileobject(*args)
+            self.__place(tile, location)
+        return tile
+
+    def __release(self, tile):
+        """Drop a terrain tile once it is neither hovered over nor 
+        clicked on, the terrain grid draws it from then on."""
+        if tile is None or tile.type not in TERRAIN_TYPES:
+            return
+        if tile is self._hover or tile is self._bounded:
+            return
+        self.__remove(tile)
+
+    def __remove(self, tile):
+        """Take the tile off the map."""
+        tile.kill()
+        if self._tiles.get(tile.location) is tile:
+            del(self._tiles[tile.location])
+        if tile is self._hover:
+            self._hover = None
+        if tile is self._bounded:
+            self._bounded = None
+
     def build_tile(self, type):
         self.replace_tile = Tiledict[type]
 
     def sell_tile(self, soldtile):
-        for basetile in self.hidden:
-            if soldtile.location == basetile.location:
-                soldtile.kill()
-                basetile.add(self.active)
+        if self._tiles.get(soldtile.location) is soldtile:
+            # the terrain shows through again.
+            self.__remove(soldtile)
+            self.__chunk(soldtile.location).retile(soldtile.location)
 
         # notify the game state of the tile being removed.
-        gs = GameState()
-        gs.remove_tile(soldtile.name)
+        tracer = Tracer()
+        traced = tracer.enabled
+        if traced:
+            tracer.begin()
+            started = time.time()
+
+        try:
+            gs = GameState()
+            gs.remove_tile(soldtile.elemid)
+
+            if traced:
+                tracer.span('mesh.sell', started, flow='s')
+        finally:
+            # commands posted later are not part of this trace.
+            if traced:
+                tracer.end()
 
     def __mouseover(self, pos):
-        oneactive = False
-        for tile in self.active:
-            if pos in tile and not oneactive:
-                tile.mouse_over(1)
-                oneactive = True
-            else:
-                tile.mouse_over(0)
+        tile = self.pick(pos)
+        previous = self._hover
+        if previous is not None and previous is not tile:
+            previous.mouse_over(0)
+        if tile is not None:
+            tile.mouse_over(1)
+        self._hover = tile
+        self.__release(previous)
 
     def __mousedown(self, left, right, pos):
         if left: #if left click
@@ -101,173 +442,200 @@ class Mesh(pygame.sprite.Sprite):
                 #if not pos in panel and not self.showing_dynamic:
                     #panel.kill()
 
-        match_found = False
-        for tile in self.active:
-            if not match_found:
-                if pos in tile:
-                    match_found = True
-                    tile.set_bounding(True)
-                else:
-                    tile.set_bounding(False)
+        tile = self.pick(pos)
+        previous = self._bounded
+        if previous is not None and previous is not tile:
+            previous.set_bounding(False)
+        self._bounded = tile
+        self.__release(previous)
+        if tile is None:
+            return True
+
+        tile.set_bounding(True)
+        if tile.current_state == BUTTON_ON:
+            if self.replace_tile == None:
+                click = tile.click(index)
+                if click:
+                    self.panel.add_dynamic_panel((2,218), click, tile.name)
+                    self.panel.show_panel(tile.name)
             else:
-                tile.set_bounding(False)
-            if pos in tile and tile.current_state == BUTTON_ON:
-                if self.replace_tile == None:
-                    click = tile.click(index)
-                    if click:
-                        self.panel.add_dynamic_panel((2,218), click, tile.name)
-                        self.panel.show_panel(tile.name)
-                else:
+                # follow the new tile through to its first redraw.
+                tracer = Tracer()
+                traced = tracer.enabled
+                if traced:
+                    tracer.begin()
+                    started = time.time()
+
+                try:
                     location = tile.location
                     newtile = self.replace_tile()
                     newtile.set_xy(location)
                     self.addtile(newtile, location)
                     self.replace_tile = None
+
+                    if traced:
+                        tracer.span('mesh.click', started, flow='s')
+                finally:
+                    # commands posted later are not part of this trace.
+                    if traced:
+                        tracer.end()
         return True
 
     def __relativepos(self, pos):
-        pos_x = pos[0] - self.pos[0]
-        pos_y = pos[1] - self.pos[1]
-        return (pos_x, pos_y)
-
-    def __makeback(self, size):
-        xdim = size[0] * TILE_WIDTH
-        ydim = size[1] * TILE_HEIGHT + TILE_HEIGHT / 2
-        mesh = pygame.Surface((xdim, ydim))
-        mesh.fill(GREY)
-        mesh.set_colorkey(TRANSPARENT)
-        return mesh
+        """Return the map position under the screen position pos."""
+        return self.__mappos(pos)
+
+    def __mappos(self, pos):
+        x, y = self.offset
+        return (x + (pos[0] - self.pos[0]) / self.zoom, 
+                y + (pos[1] - self.pos[1]) / self.zoom)
+
+    def __mapsize(self, (xdim, ydim)):
+        """Return the size of the map in pixels."""
+        width = (xdim - 1) * COLUMN + TILE_HEIGHT
+        height = (ydim - 1) * ROW + TILE_HEIGHT
+        if xdim > 1:
+            # the odd columns reach further down.
+            height += ODD
+        return width, height
+
+    def __chunk(self, (x, y)):
+        """Return the chunk holding the tile at location x, y."""
+        return self._chunks[(x // CHUNK, y // CHUNK)]
+
+    def __activate(self, tile):
+        """Show the tile on the map."""
+        tile.add(self.active, self.__chunk(tile.location).tiles)
+
+    def __place(self, tile, location):
+        """Put the tile on the map at location."""
+        tile.set_xy(location)
+        self._tiles[location] = tile
+
+        # tiles are positioned within their chunk.
+        chunk = self.__chunk(location)
+        left, top = _layout(location)
+        tile.set_pos((left - chunk.origin[0], top - chunk.origin[1]))
+        tile.show(self.active)
+        self.__activate(tile)
+        tile.mesh = self
 
     def addtile(self, newtile, pos):
-        for tile in self.active:
-            if tile.location == pos:
-                if tile.type not in ['Water', 'Grass']:
+        self.addtiles({pos: newtile})
+
+    def addtiles(self, tiles):
+        """Add many tiles at once, tiles is a dictionary of location to 
+        tile. The tiles are put on the map first, then added to the game
+        state in order of location, each connected to the tiles next to 
+        it that are already in the game state."""
+        placed = []
+        for location in sorted(tiles):
+            newtile = tiles[location]
+            current = self._tiles.get(location)
+            if current is not None:
+                if current.type not in TERRAIN_TYPES:
                     # only allow creation of tiles on water or grass tiles.
-                    return
-                tile.kill()
-                dohide = True
-                for oldtile in self.hidden:
-                    if tile.location == oldtile.location:
-                        dohide = False
-                if dohide:
-                    tile.add(self.hidden)
-
-        x, y = pos
+                    continue
+                # the tile of the terrain under the mouse.
+                self.__remove(current)
 
-        # save this into the array.
-        self.array[y][x] = newtile
+            x, y = location
+            chunk = self.__chunk(location)
 
-        xpos = x * (TILE_WIDTH - TILE_B + 2)
-        if x % 2 == 0:
-            ypos = y * ((TILE_HEIGHT) - 4)
-        else:
-            ypos = y * ((TILE_HEIGHT) - 4)+ TILE_HEIGHT / 2 - 3 
+            if newtile.type in TERRAIN_TYPES:
+                # terrain is kept in the grid, not as a tile.
+                self.terrain[y, x] = self.__kind((newtile.__class__, ()))
+                chunk.retile(location)
+                continue
 
-        newtile.set_pos((xpos, ypos))
-        newtile.show(self.active)
-        newtile.mesh = self
+            self.__place(newtile, location)
+            # the terrain is no longer drawn under the tile.
+            chunk.retile(location)
+            placed.append(newtile)
 
         # now update the game state.
-        gs = GameState()
+        for newtile in placed:
+            self.__register(newtile)
 
-        if newtile.type in ['Water', 'Grass']:
-            # early exit if this is a default tile.
-            return
+    def __register(self, newtile):
+        """Add the tile's element to the game state."""
+        gs = GameState()
 
         # get the adjacent tiles to this tile.
-        adjacent = self._adjacent((x, y))
+        adjacent = self._adjacent(newtile.location)
 
-        # remove tiles that are of a grass or water kind.
+        # remove tiles that are of a grass or water kind, or not yet added.
         connect = [
-                    tile.name for tile in adjacent 
-                        if tile.type not in ['Water', 'Grass']
+                    tile.elemid for tile in adjacent 
+                        if tile.type not in TERRAIN_TYPES and 
+                            tile.elemid is not None
                 ]
 
-        # set the name if this is a user added tile.
+        # set the id and name if this is a user added tile.
         try:
-            newtile.name = gs.add_tile(newtile.type, newtile.info, connections=connect)
-            gs.register(newtile.name, newtile.set_info)
-            gs.register('rename', newtile.set_name)
+            newtile.elemid = gs.add_tile(newtile.type, newtile.info, connections=connect)
+            newtile.name = gs.name(newtile.elemid)
+            gs.register(newtile.elemid, newtile.set_info)
+            gs.register(('rename', newtile.elemid), newtile.set_name)
         except DefaultTile:
             # can't register default tile with game state.
             pass
 
-    def __initarray(self, members, size):
+    def __kind(self, member):
+        """Return the terrain kind of the member, a tileobject and its 
+        init arguments, or None if its tiles are not terrain. A tile is
+        only made for a new kind, it gives the image all of the kind are
+        drawn with."""
+        tileobject, args = member
+        if tileobject.type not in TERRAIN_TYPES:
+            return None
+        if member in self._kinds:
+            return self._kinds.index(member)
+        self._kinds.append(member)
+        self._images.append(tileobject(*args).image)
+        return len(self._kinds) - 1
+
+    def __initterrain(self, members, size):
         xdim = size[0]
         ydim = size[1]
-        #get the default tile
-        d_tile, args = members['default']
-        #create an xdim by ydim sized array of default tiles
-        self.array = [
-                        [d_tile(*args) for i in range(xdim)] 
-                        for j in range(ydim)
-                    ]
-
+        # the kinds of terrain, and the image of each.
+        self._kinds = []
+        self._images = []
+        #fill the grid with the default terrain
+        self.terrain = numpy.zeros((ydim, xdim), numpy.uint8)
+        self.terrain[:] = self.__kind(members['default'])
+
+        built = {}
         for location in members:
             if location == 'default':
                 continue #don't do the default tile again
             #members contains a tileobject and init arguments for it
-            tileobject, args = members[location]
-            #create the tile
-            tile = tileobject(*args)
-            #slot it into the array
-            self.array[location[0]][location[1]] = tile
+            kind = self.__kind(members[location])
+            if kind is None:
+                tileobject, args = members[location]
+                built[(location[1], location[0])] = tileobject(*args)
+                continue
+            #slot it into the grid
+            self.terrain[location[0], location[1]] = kind
 
-        for j in range(ydim):
-            for i in range(xdim):
-                self.array[j][i].set_xy((i,j))
-                self.addtile(self.array[j][i], (i,j))
+        self.addtiles(built)
 
     def __contains__(self, pos):
         return self.rect.collidepoint(pos)
 
     def _adjacent(self, pos):
-        """Find adjacent cells according to the formula:
+        """Find the tiles in the adjacent cells according to the formula:
         if x is odd -> get (x-1, y), (x-1, y+1), (x, y-1), (x, y+1)
                             (x+1, y), (x+1, y+1)
         if x is even -> get (x-1, y), (x-1, y-1), (x, y-1), (x, y+1)
-                            (x+1, y), (x+1, y-1)"""
+                            (x+1, y), (x+1, y-1)
+        Cells of plain terrain, or off the map, have no tile."""
         x, y = pos
-        # maximum x and y dimensions.
-        xdim, ydim = self._maximums
-
-        if x % 2 == 1:
-            # define adjacent cells for odd case.
-            cells = [   
-                        (max(x - 1, 0), y), 
-                        (max(x - 1, 0), min(y + 1, ydim)), 
-                        (x, max(y - 1, 0)), 
-                        (x, min(y + 1, ydim)),
-                        (min(x + 1, xdim), y), 
-                        (min(x + 1,xdim), min(y + 1, ydim))
-                    ]
-        else:
-            # define adjacent cells for even case.
-            cells = [
-                        (max(x - 1, 0), y), 
-                        (max(x - 1, 0), max(y - 1, 0)), 
-                        (x, max(y - 1, 0)), 
-                        (x, min(y + 1, ydim)),
-                        (min(x + 1, xdim), y), 
-                        (min(x + 1, xdim), max(y - 1, 0))
-                    ]
-
-        adjacent = []
-        for cell in cells:
-            # get the actual object in the cell, also ensure that cell != pos.
-            if cell == pos:
-                continue
-            x, y = cell
-
-            try:
-                adjacent.append(self.array[int(y)][int(x)])
-            except IndexError:
-                continue
-
-        # return the unique set of valid adjacent cells.
-        return set(adjacent)
-
-
-            
-
-
+        tiles = self._tiles
+
+        adjacent = set()
+        for dx, dy in NEIGHBOURS[x % 2]:
+            tile = tiles.get((x + dx, y + dy))
+            if tile is not None:
+                adjacent.add(tile)
+        return adjacent
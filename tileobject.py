@@ -1,4 +1,5 @@
 import pygame
+import time
 
 from constants import *
 from sprite import *
@@ -8,6 +9,8 @@ from textentry import PermaText
 from icontypes import Sellicon, Swingicon
 from panel import Panel
 from gamestate import GameState
+from tracing import Tracer
+from render import RenderCache
 
 __all__ = ['Tile']
 
@@ -22,6 +25,9 @@ class Tile(Sprite):
 
     h = s_prime + s + s_prime
     """
+    # the type of tile, given by each of the tile types.
+    type = None
+
     def __init__(self, pos, containers, height_width, image, num_pics = (1,1)): 
         self.containers = containers
         self.size = height_width, height_width
@@ -34,6 +40,8 @@ class Tile(Sprite):
         Sprite.__init__(self, pos, containers, image, num_pics)
 
         self.name = 'default'
+        # the id of the power system element behind this tile.
+        self.elemid = None
         self.redraw()
         self.kill()
 
@@ -47,8 +55,8 @@ class Tile(Sprite):
     def set_xy(self, location):
         self.location = location
 
-    def set_name(self, (from_name, to_name)):
-        if self.name == from_name:
+    def set_name(self, (elemid, to_name)):
+        if self.elemid == elemid:
             self.name = to_name
 
     def set_offline(self, offline):
@@ -67,6 +75,15 @@ class Tile(Sprite):
         """Accepts a record tuple for a line or bus, and updates info accordingly.
         Can accept a NoneType object, this signifies that the element is offline.
         Set the status to offline and change border colour to yellow."""
+        tracer = Tracer()
+        if tracer.enabled and tracer.current():
+            started = time.time()
+            self._set_info(info)
+            tracer.span('tile.set_info', started)
+        else:
+            self._set_info(info)
+
+    def _set_info(self, info):
         #TODO: can place this information in a BUS/LINE subclass ..
         # unpack the info record.
         if info is None:
@@ -76,7 +93,7 @@ class Tile(Sprite):
         # turn off any online/offline warnings that were present.
         self.set_offline(False)
 
-        mytype, name, payload = info
+        mytype, name, payload, elemid = info
 
         def unity(value, tol=0.02):
             return abs(value - 1) < tol
@@ -110,6 +127,15 @@ class Tile(Sprite):
                 self.setwarning(False)
 
     def redraw(self):
+        # tiles of a type in the same state share an image.
+        key = ('tile', self.source, self.img_index, self.colour, self.size)
+        self.image = RenderCache().get(key, self.__render)
+        self.rect = self.image.get_rect(topleft=self.pos)
+        self.dirty = 1
+
+    def __render(self):
+        """Return a new image of the tile, the content masked to the 
+        hexagon and bordered in the tile's colour."""
         #draw image onto a surface
         surf = pygame.Surface(self.size)
         surf.fill(TRANSPARENT)
@@ -117,8 +143,6 @@ class Tile(Sprite):
         
         #make a mask to cover the surface
         mask = self.__makemask()
-        maskrect = mask.get_rect()
-        maskrect.topleft = self.pos
 
         #blit the mask onto the image
         inner_img.blit(mask, (0,0))
@@ -126,8 +150,7 @@ class Tile(Sprite):
         
         #draw bounding box
         self.__drawpoly(inner_img, colour=self.colour, linewidth = 2)
-        self.image = inner_img
-        self.rect = maskrect
+        return inner_img
     
     def __makemask(self):
         #first make a soon-to-be transparent background
@@ -181,7 +204,7 @@ class BusTile(Tile):
         # make a text entry box.
         def renamer(txt):
             gs = GameState()
-            gs.rename(self.name, txt)
+            gs.rename(self.elemid, txt)
 
             # now rename the panel.
             p.clear_yrange(((5,10), (100, 25)))
@@ -215,7 +238,7 @@ class LineTile(Tile):
         # make a text entry box.
         def renamer(txt):
             gs = GameState()
-            gs.rename(self.name, txt)
+            gs.rename(self.elemid, txt)
 
             # now rename the panel.
             p.clear_yrange(((5,10), (100, 25)))
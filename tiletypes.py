@@ -7,10 +7,11 @@ __all__ = ['Grasstile', 'Linetile', 'Coaltile', 'Tiledict', 'Watertile',
         'Windfarmtile', 'Loadtile', 'SynconTile']
 
 class Windfarmtile(tileobject.BusTile):
+    type = 'Windfarm'
+
     def __init__(self, *args):
         tileobject.BusTile.__init__(self, (0,0), [], 
                 TILE_HEIGHT, 'windfarm.png', (1,1))
-        self.type = 'Windfarm'
         self.name = 'Wind Farm'
         self.paragraph = """
 With a massive installed
@@ -21,10 +22,11 @@ great on paper.
 
 
 class Watertile(tileobject.Tile):
+    type = 'Water'
+
     def __init__(self, *args):
         tileobject.Tile.__init__(self, (0,0), [], 
                 TILE_HEIGHT, 'water.png', (1,1))
-        self.type = 'Water'
         self.name = 'Mighty River'
         self.paragraph = """
 The mighty river may
@@ -33,10 +35,11 @@ Only 8 glasses per day allowed.
 """
 
 class Grasstile(tileobject.Tile):
+    type = 'Grass'
+
     def __init__(self, *args):
         tileobject.Tile.__init__(self, (0,0), [], 
                 TILE_HEIGHT, 'grass.png', (1,1))
-        self.type = 'Grass'
         self.name = 'Grassy Noll'
         self.paragraph = """
 The Grassy Noll,
@@ -44,10 +47,11 @@ The lawn of Australia's
 favourite son. Our Shannon"""
                
 class Linetile(tileobject.LineTile):
+    type = 'line'
+
     def __init__(self, *args):
         tileobject.LineTile.__init__(self, (0,0), [], 
                 TILE_HEIGHT, 'line.png', (1,1))
-        self.type = 'line'
         self.name = 'Power Line'
         self.paragraph = """
 It is a power line
@@ -56,10 +60,11 @@ Is it 330kV?."""
         self.info = dict(pflow=None, qflow=None)
 
 class Loadtile(tileobject.BusTile):
+    type = 'load'
+
     def __init__(self, *args):
         tileobject.BusTile.__init__(self, (0,0), [], 
                 TILE_HEIGHT, 'load.png', (1,1))
-        self.type = 'load'
         self.name = 'User Load'
         self.paragraph = """
 Someone is cookin'
@@ -68,10 +73,11 @@ Usin thair voltz."""
         self.info = dict(pload=1, qload=0.2)
 
 class SynconTile(tileobject.BusTile):
+    type = 'sync'
+
     def __init__(self, *args):
         tileobject.BusTile.__init__(self, (0,0), [], 
                         TILE_HEIGHT, 'syncon.png', (1,1))
-        self.type = 'sync'
         self.name = 'Synchronous Condensor'
         self.paragraph = """
 Synchronous Condenser
@@ -80,10 +86,11 @@ The poor man's SVC."""
 
 
 class Coaltile(tileobject.BusTile):
+    type = 'Coal'
+
     def __init__(self, *args):
         tileobject.BusTile.__init__(self, (0,0), [], 
                 TILE_HEIGHT, 'coal.png', (1,1))
-        self.type = 'Coal'
         self.name = 'Coal PS'
         self.paragraph = """
 The backbone of the power
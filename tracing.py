@@ -0,0 +1,131 @@
+"""
+Causality tracing of player actions, from the click to the redrawn tile.
+
+An action is given a trace id where it starts (a click on the mesh).
+The id follows the action through the threads it crosses:
+
+    - the UI thread keeps the current trace ids in a thread local.
+    - a posted command carries the ids of the thread that posted it.
+    - a solve carries the ids of every command it solved for, and the
+      solution callback runs with those ids current.
+    - the ids are handed back to the UI thread to finish on the next
+      redraw.
+
+Each stage is recorded as a span, and the stages of a trace are joined
+by flow arrows. The trace is written as Chrome trace-event JSON, which
+chrome://tracing or Perfetto will open.
+
+Tracing is off unless started, the stages check Tracer().enabled and
+skip all the work when it is off:
+
+    Tracer().start('trace.json')
+    ...
+    Tracer().stop()
+"""
+import itertools
+import json
+import os
+import threading
+import time
+
+__all__ = ['Tracer']
+
+class Tracer(object):
+    """Borg that collects spans for the running game."""
+    _shared_state = {}
+    enabled = False
+    path = None
+    _events = []
+    _ids = itertools.count(1)
+    _local = threading.local()
+    # trace ids waiting for the next redraw.
+    _redraw = set()
+    _mutex = threading.Lock()
+
+    def __init__(self):
+        """Borg singleton pattern."""
+        self.__dict__ = self._shared_state
+
+    def start(self, path):
+        """Start collecting spans, to be written to path."""
+        self.path = path
+        self._events = []
+        self._redraw = set()
+        self._origin = time.time()
+        self.enabled = True
+
+    def stop(self):
+        """Stop collecting and write the trace file."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        fileobj = open(self.path, 'w')
+        try:
+            json.dump(dict(traceEvents=self._events,
+                            displayTimeUnit='ms'), fileobj)
+        finally:
+            fileobj.close()
+
+    def begin(self):
+        """Start a new trace in this thread, return its id."""
+        trace = self._ids.next()
+        self._local.traces = (trace,)
+        return trace
+
+    def current(self):
+        """Return the trace ids current in this thread."""
+        return getattr(self._local, 'traces', ())
+
+    def adopt(self, traces):
+        """Make traces (from another thread) current in this thread."""
+        self._local.traces = tuple(traces)
+
+    def end(self):
+        """The current traces have left this thread."""
+        self._local.traces = ()
+
+    def span(self, name, started, traces=None, flow='t'):
+        """Record a span called name, from started until now, as part
+        of traces (by default the current traces).
+        flow - 's' if the span starts the traces, 't' if it is a step
+               along them and 'f' if it finishes them."""
+        if traces is None:
+            traces = self.current()
+        now = time.time()
+        ts = (started - self._origin) * 1e6
+        common = dict(pid=os.getpid(), tid=threading.currentThread().getName(),
+                        ts=ts)
+
+        events = [dict(common, name=name, cat='stage', ph='X',
+                        dur=(now - started) * 1e6,
+                        args=dict(traces=list(traces)))]
+        for trace in traces:
+            event = dict(common, name='action', cat='flow', ph=flow,
+                            id=trace)
+            if flow == 'f':
+                # bind to the enclosing span.
+                event['bp'] = 'e'
+            events.append(event)
+
+        self._mutex.acquire()
+        try:
+            self._events.extend(events)
+        finally:
+            self._mutex.release()
+
+    def redraw_due(self, traces):
+        """The traces are finished once the screen is next redrawn."""
+        self._mutex.acquire()
+        try:
+            self._redraw.update(traces)
+        finally:
+            self._mutex.release()
+
+    def take_redraw(self):
+        """Return the traces waiting for a redraw."""
+        self._mutex.acquire()
+        try:
+            traces, self._redraw = self._redraw, set()
+        finally:
+            self._mutex.release()
+        return traces
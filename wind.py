@@ -0,0 +1,121 @@
+"""
+A stochastic model of the output of a fleet of wind farms.
+
+Each farm's wind follows an AR(1) process in a standard normal state,
+mapped through the normal and Weibull distributions to the fraction of
+its size the farm produces:
+
+    z[t+1] = phi * z[t] + sqrt(1 - phi**2) * e[t+1]
+    output = size * scale * (-log(1 - Phi(z))) ** (1 / shape)
+
+phi = exp(-period / persistence) sets how long a gust lasts. The noise
+e is shared between farms in proportion to correlation, so the farms
+tend to rise and fall together as a single weather system passes.
+
+The whole fleet is advanced at once with NumPy:
+
+    field = WindField()
+    field.add(farmid, size=1.0)
+    changes = field.step()    # farm id -> new output
+"""
+import numpy
+from scipy.special import log_ndtr
+
+__all__ = ['WindField']
+
+class WindField(object):
+    """The wind at a fleet of farms."""
+    def __init__(self, period=1.0, persistence=20.0, correlation=0.5,
+                    scale=0.3, shape=1.0, tolerance=0.01, seed=None):
+        """period - seconds advanced by each step.
+        persistence - seconds for the wind at a farm to decorrelate.
+        correlation - fraction of each change shared by all the farms.
+        scale, shape - the Weibull distribution of the output, as a
+                fraction of the farm's size.
+        tolerance - fraction of its size a farm's output must change by
+                to be reported.
+        seed - seed for the random numbers."""
+        self.period = period
+        self.persistence = persistence
+        self.correlation = correlation
+        self.scale = scale
+        self.shape = shape
+        self.tolerance = tolerance
+        self._random = numpy.random.RandomState(seed)
+
+        # farm id -> row, the rows are packed into the first len(ids).
+        self._rows = {}
+        self._ids = []
+        self._size = numpy.zeros(0)
+        self._state = numpy.zeros(0)
+        self._output = numpy.zeros(0)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, farm):
+        return farm in self._rows
+
+    def add(self, farm, size):
+        """Add a farm of size, its wind starts at a random state."""
+        if farm in self._rows:
+            self.remove(farm)
+        row = len(self._ids)
+        if row == len(self._size):
+            grow = max(row, 16)
+            self._size = numpy.append(self._size, numpy.zeros(grow))
+            self._state = numpy.append(self._state, numpy.zeros(grow))
+            self._output = numpy.append(self._output, numpy.zeros(grow))
+        self._rows[farm] = row
+        self._ids.append(farm)
+        self._size[row] = size
+        self._state[row] = self._random.standard_normal()
+        # the farm produces its size until it is first stepped.
+        self._output[row] = size
+
+    def remove(self, farm):
+        """Remove a farm, return its size or None if it is unknown."""
+        try:
+            row = self._rows.pop(farm)
+        except KeyError:
+            return None
+        size = self._size[row]
+
+        # move the last farm into the gap.
+        last = len(self._ids) - 1
+        moved = self._ids.pop()
+        if row != last:
+            self._ids[row] = moved
+            self._rows[moved] = row
+            for column in (self._size, self._state, self._output):
+                column[row] = column[last]
+        return size
+
+    def output(self, farm):
+        return self._output[self._rows[farm]]
+
+    def step(self):
+        """Advance the wind at every farm by one period. Returns a dict
+        of farm id to new output for the farms whose output changed by
+        more than the tolerance."""
+        count = len(self._ids)
+        if not count:
+            return {}
+        size = self._size[:count]
+        state = self._state[:count]
+        output = self._output[:count]
+
+        phi = numpy.exp(-self.period / self.persistence)
+        shared = numpy.sqrt(self.correlation) * self._random.standard_normal()
+        local = (numpy.sqrt(1 - self.correlation) *
+                        self._random.standard_normal(count))
+        state *= phi
+        state += numpy.sqrt(1 - phi ** 2) * (shared + local)
+
+        # the Weibull quantile of the normal state, 1 - Phi(z) = Phi(-z).
+        new = size * self.scale * (-log_ndtr(-state)) ** (1.0 / self.shape)
+
+        changed = numpy.flatnonzero(abs(new - output) > self.tolerance * size)
+        output[changed] = new[changed]
+        ids = self._ids
+        return dict((ids[row], output[row]) for row in changed)